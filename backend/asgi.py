@@ -0,0 +1,252 @@
+"""
+ASGI entry point: the adaptive test endpoints as asyncio handlers (Quart).
+
+A request waiting on Ollama or on TTS only suspends a coroutine, so one
+worker process holds hundreds of children mid-test instead of one per
+thread. Every wait has its own timeout (LLM_TIMEOUT, TTS_WAIT_TIMEOUT) and
+a disconnected client cancels its handler, which cancels the LLM request;
+shared TTS jobs keep running for the other sessions waiting on them.
+
+    cd backend
+    hypercorn --bind 127.0.0.1:5000 --workers 2 asgi:app
+
+Routes: /baseline, /next-trial, /test2/baseline, /test2/adaptive,
+/audio-status, /prefetch/stats and /metrics, same request and response formats as
+server.py. Sessions, /predict, the model routes and /dysgraphia/screen stay
+on the WSGI app.
+"""
+import asyncio
+
+from quart import Blueprint, Quart, Response, abort, current_app, g, jsonify, request, send_from_directory
+
+from test1.generator import generate_pair
+from test2.generator import generate_pair_async as generate_pair_2_async
+
+import config
+from audio_store import DIGEST_RE
+from baseline_bundle import shuffle_baseline_1
+from prefetch import hints_key
+from server import (
+    analyze_responses_1, analyze_responses_2, adaptive_result_2,
+    build_trial_1, build_trial_2, history_error, log_history, next_trial_result,
+    profiling_options, speculate_next, tts_outcome
+)
+from services import Services
+from telemetry import begin_request, clear_request, configure_logging, end_request, span
+
+bp = Blueprint('earlymind_async', __name__)
+
+def create_app(overrides=None):
+    """Async counterpart of server.create_app(), built from the same config."""
+    app = Quart(__name__)
+    app.config.from_object(config)
+    app.config.update(overrides or {})
+    configure_logging(app.config['LOG_FORMAT'], app.config['LOG_LEVEL'])
+
+    services = app.extensions['earlymind'] = Services(app.config)
+    services.llm_clients['async'] = async_llm_stats
+    app.register_blueprint(bp)
+
+    @app.after_request
+    async def allow_cors(response):
+        # flask-cors only wraps Flask apps; same permissive policy as server.py
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        response.headers['Access-Control-Expose-Headers'] = 'Server-Timing, X-Request-ID'
+        return response
+
+    @app.after_serving
+    async def shutdown():
+        # Blocking drain, but the server has stopped taking requests by now
+        app.extensions['earlymind'].shutdown(timeout=app.config['GRACEFUL_TIMEOUT'])
+        from llm_client import close_async_client
+        await close_async_client()
+
+    return app
+
+def svc():
+    return current_app.extensions['earlymind']
+
+def async_llm_stats():
+    # Only called from /metrics, i.e. on the event loop
+    from llm_client import get_async_client
+
+    return get_async_client().stats()
+
+# ---------------- TELEMETRY ----------------
+# Same traces as server.py. The contextvar holding the trace is per task, so
+# concurrent requests on the loop keep their spans apart. A profiled request
+# samples the loop thread, so other requests running meanwhile show up too.
+
+@bp.before_app_request
+async def start_trace():
+    g.trace = begin_request(
+        svc().telemetry, request.method, request.path, request.headers,
+        profiling_options(current_app.config)
+    )
+
+@bp.after_app_request
+async def finish_trace(response):
+    trace = g.get('trace')
+    if trace is not None:
+        response.headers.update(end_request(trace, request.endpoint, response.status_code))
+    return response
+
+@bp.teardown_app_request
+async def clear_trace(exc):
+    clear_request(g.pop('trace', None))
+
+@bp.route('/metrics', methods=['GET'])
+async def metrics():
+    return Response(svc().telemetry.render(), mimetype='text/plain; version=0.0.4')
+
+def audio_url_for(filename):
+    return f'{request.host_url.rstrip("/")}/static/audio/{filename}'
+
+@bp.route('/static/audio/<filename>', methods=['GET'])
+async def audio_file(filename):
+    """See server.audio_file."""
+    m = DIGEST_RE.match(filename)
+    store = svc().audio_store
+    if m is None or store.lookup(m.group(1), m.group(2)) is None:
+        abort(404)
+    response = await send_from_directory(store.root, filename, conditional=True)
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config['AUDIO_MAX_AGE']}, immutable"
+    return response
+
+async def add_audio_urls(pairs):
+    """
+    Waits for the audio of all `pairs` at once: the slowest word, not the
+    sum of them, bounds the wait (and TTS_WAIT_TIMEOUT bounds that).
+    """
+    tts = svc().tts
+    timeout = current_app.config['TTS_WAIT_TIMEOUT']
+    words = [pair.get('audio', pair.get('audio_word')) for pair in pairs]
+    with span("tts") as s:
+        cached = [tts.is_ready(word) for word in words]
+        results = await asyncio.gather(*(tts.ensure_async(word, timeout=timeout) for word in words))
+        outcomes = {tts_outcome(c, status) for c, (_, status) in zip(cached, results)}
+        s.outcome = outcomes.pop() if len(outcomes) == 1 else "mixed"
+    for pair, (filename, status) in zip(pairs, results):
+        pair['audio_url'] = audio_url_for(filename)
+        pair['audio_status'] = status
+    return pairs
+
+def bundle_response(bundle):
+    status, body, headers = bundle.respond(
+        request.headers.get('If-None-Match'),
+        request.headers.get('Accept-Encoding')
+    )
+    return Response(body, status=status, headers=headers)
+
+@bp.route('/baseline', methods=['GET'])
+async def get_baseline():
+    """See server.get_baseline."""
+    with span("baseline") as s:
+        bundle = svc().baseline.get_test1(audio_url_for(''))
+        s.outcome = "bundle" if bundle is not None else "live"
+    if bundle is not None:
+        return bundle_response(bundle)
+
+    response = jsonify(await add_audio_urls(shuffle_baseline_1()))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@bp.route('/test2/baseline', methods=['GET'])
+async def test2_baseline():
+    return bundle_response(svc().baseline.test2)
+
+@bp.route('/next-trial', methods=['POST'])
+async def next_trial():
+    """See server.next_trial."""
+    data = await request.get_json(silent=True)
+    if not data or 'responses' not in data:
+        return jsonify({"error": "Missing 'responses' field"}), 400
+    error = history_error(data['responses'])
+    if error:
+        return jsonify({"error": error}), 400
+
+    with span("analyze"):
+        analyzer, analysis, used_words = analyze_responses_1(data['responses'])
+    prompt_hints = analysis["prompt_hints"]
+    session_id = data.get('session_id')
+    slot = f"test1:{session_id}"
+    services = svc()
+    log_history(services, "test1", session_id, data['responses'], analysis)
+
+    with span("generate") as s:
+        new_pair = None
+        if session_id:
+            new_pair = services.prefetch.take(slot, hints_key(prompt_hints), exclude=used_words)
+        if new_pair is None:
+            # Served from the in-memory pair index; the LLM only enriches it in the background
+            new_pair = generate_pair(prompt_hints, exclude_words=list(used_words))
+            s.outcome = new_pair.pop("source", None)
+        else:
+            s.outcome = "prefetch"
+            new_pair.pop("source", None)
+
+    await add_audio_urls([new_pair])
+
+    if session_id:
+        with span("speculate"):
+            speculate_next(services, slot, analyzer, new_pair["audio_word"], "audio", used_words, build_trial_1)
+    with span("serialize"):
+        return jsonify(next_trial_result(new_pair, analysis))
+
+@bp.route('/test2/adaptive', methods=['POST'])
+async def test2_adaptive():
+    """See server.test2_adaptive. The LLM call is awaited, not blocking a thread."""
+    data = await request.get_json(silent=True)
+    responses = data.get('responses', []) if data else []
+    error = history_error(responses)
+    if error:
+        return jsonify({"error": error}), 400
+    with span("analyze"):
+        analyzer, analysis, exclude = analyze_responses_2(responses)
+    prompt_hints = analysis["prompt_hints"]
+    session_id = data.get('session_id') if data else None
+    slot = f"test2:{session_id}"
+    services = svc()
+    log_history(services, "test2", session_id, responses, analysis)
+
+    with span("generate") as s:
+        pair = None
+        if session_id:
+            pair = services.prefetch.take(slot, hints_key(prompt_hints), exclude=exclude)
+        if pair is None:
+            pair = await generate_pair_2_async(
+                prompt_hints, exclude_words=list(exclude), timeout=current_app.config['LLM_TIMEOUT']
+            )
+            s.outcome = pair.pop("source", None)
+        else:
+            s.outcome = "prefetch"
+            pair.pop("source", None)
+
+    if session_id:
+        with span("speculate"):
+            speculate_next(services, slot, analyzer, pair["audio_word"], "text_word", exclude, build_trial_2)
+    with span("serialize"):
+        return jsonify(adaptive_result_2(pair, analysis))
+
+@bp.route('/audio-status', methods=['GET'])
+async def audio_status():
+    word = request.args.get('word')
+    if not word:
+        return jsonify({"error": "Missing 'word' parameter"}), 400
+    tts = svc().tts
+    return jsonify({
+        "word": word,
+        "status": tts.status(word),
+        "audio_url": audio_url_for(tts.filename(word))
+    })
+
+@bp.route('/prefetch/stats', methods=['GET'])
+async def prefetch_stats():
+    return jsonify(svc().prefetch.stats())
+
+app = create_app()
+
+if __name__ == '__main__':
+    app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+DIGEST_RE = re.compile(r'^([0-9a-f]{40})\.(\w+)$')
+
+
+def normalize_word(word):
+    """'Bed', ' bed ' and 'BED' all map to 'bed'."""
+    return " ".join(str(word).strip().lower().split())
+
+
+def cache_key(word, engine, voice, rate):
+    """Content address of a synthesized word: sha1 over every input that changes the audio."""
+    raw = f"{normalize_word(word)}|{engine}|{voice}|{rate}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def sprite_key(digests):
+    """Content address of an audio sprite: its members, in order."""
+    return hashlib.sha1(("sprite|" + "|".join(digests)).encode("utf-8")).hexdigest()
+
+
+class AudioStore:
+    """
+    Content-addressed audio cache on disk.
+
+    Files are named `<sha1>.<ext>` so the same (word, engine, voice, rate)
+    always lands on the same file. An in-memory index, loaded once at startup,
+    keeps LRU order for eviction once the directory exceeds `max_bytes`.
+
+    Several server processes can share one directory: a lookup that misses
+    the index checks the disk once, so a file synthesized by another worker
+    is adopted instead of being generated again. Each process evicts on its
+    own, so an index hit is confirmed with a stat; an entry whose file
+    another worker removed is dropped and the word is synthesized again.
+    """
+
+    def __init__(self, root, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()   # digest -> (filename, size)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.root):
+            m = DIGEST_RE.match(name)
+            if not m:
+                continue
+            st = os.stat(os.path.join(self.root, name))
+            entries.append((st.st_mtime, m.group(1), name, st.st_size))
+
+        # Oldest first, so the front of the OrderedDict is the LRU end
+        for _, digest, name, size in sorted(entries):
+            self._index[digest] = (name, size)
+            self._total_bytes += size
+
+    # ---------------- LOOKUPS ----------------
+
+    def filename(self, digest, extension):
+        return f"{digest}.{extension}"
+
+    def path(self, filename):
+        return os.path.join(self.root, filename)
+
+    def lookup(self, digest, extension=None):
+        """
+        Returns the cached filename and marks it recently used, or None.
+        With `extension`, an index miss falls back to the disk (see adopt).
+        """
+        filename = self._indexed(digest)
+        if filename is not None:
+            with self._lock:
+                if digest in self._index:
+                    self._index.move_to_end(digest)
+            return filename
+        if extension is None:
+            return None
+        return self.adopt(digest, extension)
+
+    def _indexed(self, digest):
+        """Filename of an index entry whose file still exists; stale entries are dropped."""
+        with self._lock:
+            entry = self._index.get(digest)
+        if entry is None:
+            return None
+        if os.path.exists(self.path(entry[0])):
+            return entry[0]
+        with self._lock:
+            # Unless a commit replaced the entry meanwhile
+            if self._index.get(digest) == entry:
+                del self._index[digest]
+                self._total_bytes -= entry[1]
+        return None
+
+    def adopt(self, digest, extension):
+        """Indexes a file another process committed. Returns its filename or None."""
+        filename = self.filename(digest, extension)
+        try:
+            size = os.path.getsize(self.path(filename))
+        except OSError:
+            return None
+        with self._lock:
+            if digest not in self._index:
+                self._index[digest] = (filename, size)
+                self._total_bytes += size
+        return filename
+
+    def __contains__(self, digest):
+        return self._indexed(digest) is not None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    # ---------------- WRITES ----------------
+
+    def temp_path(self, digest, extension):
+        return os.path.join(self.root, f".{digest}.{threading.get_ident()}.tmp.{extension}")
+
+    def commit(self, digest, extension, tmp_path):
+        """
+        Atomically publishes a fully written temp file under its content address.
+        Clients can never fetch a half-written file because the final name only
+        appears after os.replace().
+        """
+        filename = self.filename(digest, extension)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, self.path(filename))
+
+        with self._lock:
+            old = self._index.pop(digest, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._index[digest] = (filename, size)
+            self._total_bytes += size
+            evicted = self._evict_locked(keep=digest)
+
+        for name in evicted:
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+        return filename
+
+    def pack(self, digests, extension):
+        """
+        Audio sprite: the cached files for `digests` concatenated into one
+        content-addressed file, so a client fetches them in one request.
+        Returns (filename, [(offset, length)] per member), or None if a
+        member is not cached. Each byte range is the complete member file.
+        """
+        members = []
+        for digest in digests:
+            filename = self.lookup(digest, extension)
+            if filename is None:
+                return None
+            members.append(filename)
+
+        key = sprite_key(digests)
+        filename = self.lookup(key, extension)
+        if filename is None:
+            tmp_path = self.temp_path(key, extension)
+            try:
+                with open(tmp_path, "wb") as out:
+                    for name in members:
+                        with open(self.path(name), "rb") as f:
+                            shutil.copyfileobj(f, out)
+            except FileNotFoundError:
+                # A member was evicted meanwhile
+                os.remove(tmp_path)
+                return None
+            filename = self.commit(key, extension, tmp_path)
+
+        segments = []
+        offset = 0
+        for name in members:
+            try:
+                length = os.path.getsize(self.path(name))
+            except OSError:
+                return None
+            segments.append((offset, length))
+            offset += length
+        return filename, segments
+
+    def _evict_locked(self, keep=None):
+        evicted = []
+        if self.max_bytes is None:
+            return evicted
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            digest, (name, size) = next(iter(self._index.items()))
+            if digest == keep:
+                break
+            del self._index[digest]
+            self._total_bytes -= size
+            evicted.append(name)
+        return evicted
+
+
+# ---------------- WARM-CACHE CLI ----------------
+
+def default_warm_words():
+    """Every word the tests can serve without the LLM, including the pair index list."""
+    from test1.baseline import BASELINE_PAIRS
+    from test1.generator import FALLBACKS
+    from test1.pair_index import load_words
+    from test2.baseline import BASELINE_PAIRS as BASELINE_PAIRS_2
+    from test2.generator import FALLBACK_WORDS
+
+    words = [p["audio"] for p in BASELINE_PAIRS]
+    words += [p["audio"] for p in BASELINE_PAIRS_2]
+    words += [f["audio_word"] for f in FALLBACKS.values()]
+    words += load_words()
+    words += list(FALLBACK_WORDS)
+    return words
+
+
+def read_word_list(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def warm_cache(words, pipeline):
+    """Submits every word and waits for the pool to finish. Returns (ready, failed)."""
+    unique = list(OrderedDict.fromkeys(normalize_word(w) for w in words))
+    futures = [(w, pipeline.submit(w)) for w in unique]
+
+    ready, failed = 0, 0
+    for word, future in futures:
+        try:
+            future.result()
+            ready += 1
+        except Exception as e:
+            print(f"Error generating audio for {word}: {e}")
+            failed += 1
+    return ready, failed
+
+
+def main(argv=None):
+    import config
+    from tts import TTSPipeline, get_engine
+
+    parser = argparse.ArgumentParser(description="Audio cache tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    warm = sub.add_parser("warm-cache", help="Pre-synthesize baseline, fallback and listed words")
+    warm.add_argument("--words", help="Extra word list file, one word per line")
+    warm.add_argument("--engine", default=config.TTS_ENGINE)
+    warm.add_argument("--workers", type=int, default=config.TTS_WORKERS)
+
+    sub.add_parser("stats", help="Show cache size")
+
+    args = parser.parse_args(argv)
+    store = AudioStore(config.AUDIO_DIR, max_bytes=config.AUDIO_CACHE_MAX_BYTES)
+
+    if args.command == "stats":
+        print(store.stats())
+        return
+
+    words = default_warm_words()
+    if args.words:
+        words += read_word_list(args.words)
+
+    pipeline = TTSPipeline(store, get_engine(args.engine), workers=args.workers, max_queue=len(words) + 1)
+    ready, failed = warm_cache(words, pipeline)
+    pipeline.shutdown()
+
+    print(f"✓ Warmed {ready} words ({failed} failed)")
+    print(f"Cache: {store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
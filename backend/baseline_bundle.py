@@ -0,0 +1,245 @@
+import gzip
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+
+from test1.baseline import BASELINE_PAIRS
+from test2.baseline import BASELINE_PAIRS as BASELINE_PAIRS_2
+
+from audio_store import sprite_key
+
+# ---------------- SHUFFLING ----------------
+
+def shuffle_baseline_1(rng=random, order=None):
+    """
+    Baseline pairs for Test 1 in random order (or the given order of
+    indices into BASELINE_PAIRS), options shuffled.
+    """
+    # We copy the list to avoid modifying the original global constant
+    pairs = []
+    for p in BASELINE_PAIRS:
+        # Create a deep-ish copy of the dict and options list so we can shuffle safely
+        pair_copy = p.copy()
+        if "options" in pair_copy:
+            pair_copy["options"] = list(pair_copy["options"])
+            rng.shuffle(pair_copy["options"])
+
+            # Re-calculate correct_index because shuffling changed positions
+            # The baseline pairs in baseline.py use "audio" as the target word key
+            target = pair_copy["audio"]
+            if target in pair_copy["options"]:
+                pair_copy["correct_index"] = pair_copy["options"].index(target)
+
+        pairs.append(pair_copy)
+
+    # Shuffle the order of the pairs themselves so the first word isn't always the same
+    return reorder(pairs, rng, order)
+
+def shuffle_baseline_2(rng=random, order=None):
+    """Baseline pairs for Test 2 (text-only) in random order, options shuffled."""
+    pairs = []
+    for p in BASELINE_PAIRS_2:
+        options = list(p["options"])
+        rng.shuffle(options)
+
+        # Structure for client
+        pairs.append({
+            "text_word": p["audio"],
+            "options": options,
+            "correct_index": options.index(p["audio"]) if p["audio"] in options else p["correct_index"]
+        })
+
+    return reorder(pairs, rng, order)
+
+def reorder(pairs, rng, order):
+    if order is None:
+        rng.shuffle(pairs)
+        return pairs
+    return [pairs[i] for i in order]
+
+def pair_orders(n_pairs, n_variants, rng):
+    """
+    Every ordering of the pairs when there are at most `n_variants` of them
+    (so each word leads equally often), otherwise `n_variants` random ones.
+    """
+    if math.factorial(n_pairs) <= n_variants:
+        return list(itertools.permutations(range(n_pairs)))
+    return [rng.sample(range(n_pairs), n_pairs) for _ in range(n_variants)]
+
+# ---------------- BUNDLES ----------------
+
+def encode_json(payload):
+    # Same bytes as Flask's jsonify outside debug mode
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+def compressors():
+    """Content encodings we can precompute, best first. Brotli is optional."""
+    found = []
+    try:
+        import brotli
+        found.append(("br", lambda body: brotli.compress(body, quality=11)))
+    except ImportError:
+        pass
+    found.append(("gzip", lambda body: gzip.compress(body, compresslevel=9, mtime=0)))
+    return found
+
+def accepted_encodings(header):
+    """Encodings listed in an Accept-Encoding header (q=0 excluded)."""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+class BaselineBundle:
+    """
+    A fixed set of shuffled baseline payloads, serialized and compressed
+    once. Each variant/encoding has a strong ETag over its exact bytes, so
+    a conditional GET is a set lookup and a 200 is a random choice.
+
+    The variants come from a seeded RNG, so every worker process builds
+    the same bytes and ETags validate on any worker.
+    """
+
+    def __init__(self, payloads, max_age=300):
+        self.max_age = max_age
+        self.variants = []   # [{encoding: (etag, body)}]
+        self.etags = set()
+
+        encoders = [("identity", None)] + compressors()
+        for payload in payloads:
+            raw = encode_json(payload)
+            digest = hashlib.sha1(raw).hexdigest()[:20]
+            variant = {}
+            for encoding, compress in encoders:
+                body = raw if compress is None else compress(raw)
+                etag = f'"{digest}"' if compress is None else f'"{digest}-{encoding}"'
+                variant[encoding] = (etag, body)
+                self.etags.add(etag)
+            self.variants.append(variant)
+
+        self.encodings = [e for e, _ in encoders if e != "identity"]
+
+    def respond(self, if_none_match=None, accept_encoding=None, rng=random):
+        """
+        Returns (status, body, headers) for a GET with the given request
+        headers: 304 if the client holds any of our variants, else one
+        variant in the best encoding the client accepts.
+        """
+        headers = {
+            "Cache-Control": f"private, max-age={self.max_age}",
+            "Vary": "Accept-Encoding",
+        }
+
+        if if_none_match:
+            tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+            matched = tags & self.etags
+            if matched or "*" in tags:
+                headers["ETag"] = next(iter(matched)) if matched else next(iter(self.etags))
+                return 304, b"", headers
+
+        accepted = accepted_encodings(accept_encoding)
+        encoding = next((e for e in self.encodings if e in accepted), "identity")
+        etag, body = rng.choice(self.variants)[encoding]
+
+        headers["ETag"] = etag
+        headers["Content-Type"] = "application/json"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return 200, body, headers
+
+class BaselineCache:
+    """
+    Precomputed /baseline and /test2/baseline responses for a server process.
+
+    Test 2 is text-only and is built at startup. Test 1 embeds audio URLs,
+    which depend on the host the client used, so it is built on the first
+    request per URL prefix, once every baseline word is in the audio cache.
+    Until then (cold cache right after startup) get_test1() returns None and
+    the handler serves a live response with "pending" statuses. The bundle
+    also points every pair into one audio sprite holding all baseline words.
+    It is dropped if a baseline file or the sprite is ever evicted.
+    """
+
+    def __init__(self, tts, variants=24, seed=0, max_age=300):
+        self.tts = tts
+        self.n_variants = variants
+        self.seed = seed
+        self.max_age = max_age
+        self.words = [p["audio"] for p in BASELINE_PAIRS]
+        self._keys = [tts.key(w) for w in self.words]
+        self._test1 = {}   # audio URL prefix -> BaselineBundle
+        self._sprite = None
+        self._lock = threading.Lock()
+
+        self.test2 = BaselineBundle(self._payloads(shuffle_baseline_2, len(BASELINE_PAIRS_2)), max_age=max_age)
+        self.warm()
+
+    def _payloads(self, shuffle, n_pairs, finish=None):
+        rng = random.Random(self.seed)
+        payloads = []
+        for order in pair_orders(n_pairs, self.n_variants, rng):
+            pairs = shuffle(rng, order)
+            if finish:
+                finish(pairs)
+            payloads.append(pairs)
+        return payloads
+
+    def warm(self):
+        """Queues synthesis of every baseline word that isn't cached yet."""
+        for word in self.words:
+            self.tts.submit(word)
+
+    def audio_ready(self):
+        store = self.tts.store
+        if self._sprite is not None and sprite_key(self._keys) not in store:
+            return False
+        return all(key in store for key in self._keys)
+
+    def sprite(self):
+        """
+        (filename, {word: (offset, length)}) of the file packing every
+        baseline word, built once the words are cached.
+        """
+        if self._sprite is None:
+            packed = self.tts.store.pack(self._keys, self.tts.engine.extension)
+            if packed is not None:
+                filename, segments = packed
+                self._sprite = (filename, dict(zip(self.words, segments)))
+        return self._sprite
+
+    def get_test1(self, audio_prefix):
+        if not self.audio_ready():
+            with self._lock:
+                self._test1.clear()
+                self._sprite = None
+            self.warm()
+            return None
+
+        bundle = self._test1.get(audio_prefix)
+        if bundle is None:
+            sprite = self.sprite()
+
+            def finish(pairs):
+                for pair in pairs:
+                    pair["audio_url"] = audio_prefix + self.tts.filename(pair["audio"])
+                    pair["audio_status"] = "ready"
+                    if sprite is not None:
+                        filename, segments = sprite
+                        offset, length = segments[pair["audio"]]
+                        pair["sprite"] = {"url": audio_prefix + filename, "offset": offset, "length": length}
+
+            bundle = BaselineBundle(
+                self._payloads(shuffle_baseline_1, len(BASELINE_PAIRS), finish),
+                max_age=self.max_age
+            )
+            with self._lock:
+                # Bounded by the number of host names clients use
+                if len(self._test1) >= 16:
+                    self._test1.clear()
+                self._test1[audio_prefix] = bundle
+        return bundle
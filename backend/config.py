@@ -0,0 +1,101 @@
+import os
+
+# Server settings, overridable through the environment. create_app() copies
+# every upper-case name into app.config, where tests can override them.
+
+# ---------------- SERVING ----------------
+HOST = os.environ.get('HOST', '127.0.0.1')
+PORT = int(os.environ.get('PORT', '5000'))
+DEBUG = os.environ.get('DEBUG', '0') == '1'
+# gunicorn worker processes and threads per worker (see gunicorn.conf.py)
+WORKERS = int(os.environ.get('WORKERS', str(os.cpu_count() or 1)))
+THREADS = int(os.environ.get('THREADS', '4'))
+# Seconds a stopping worker gets to finish requests and queued TTS jobs
+GRACEFUL_TIMEOUT = float(os.environ.get('GRACEFUL_TIMEOUT', '30'))
+
+AUDIO_DIR = os.environ.get(
+    'AUDIO_DIR',
+    os.path.join(os.path.dirname(__file__), 'static', 'audio')
+)
+
+# ---------------- TTS ----------------
+TTS_ENGINE = os.environ.get('TTS_ENGINE', 'gtts')
+TTS_WORKERS = int(os.environ.get('TTS_WORKERS', '4'))
+TTS_MAX_QUEUE = int(os.environ.get('TTS_MAX_QUEUE', '256'))
+# How long a handler waits for a cold word before answering "pending"
+TTS_WAIT_TIMEOUT = float(os.environ.get('TTS_WAIT_TIMEOUT', '0.5'))
+
+# ---------------- ASYNC SERVER ----------------
+# Per-call limit on LLM word generation in asgi.py; the fallback word is used after it
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', '3'))
+
+# ---------------- TELEMETRY ----------------
+# "json" (one object per line) or "text"
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# Lets a request switch on the sampling profiler with an `X-Profile: 1` header.
+# Off by default: profiles are written to disk and cost CPU.
+PROFILING = os.environ.get('PROFILING', '0') == '1'
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', '1'))
+
+# ---------------- AUDIO CACHE ----------------
+# Audio files are content-addressed and never change, so clients may keep them
+AUDIO_MAX_AGE = int(os.environ.get('AUDIO_MAX_AGE', str(365 * 24 * 3600)))
+# Least recently used files are evicted once the cache exceeds this size
+AUDIO_CACHE_MAX_BYTES = int(float(os.environ.get('AUDIO_CACHE_MAX_MB', '200')) * 1024 * 1024)
+
+# ---------------- BASELINE ----------------
+# Shuffled baseline payloads precomputed per process (same set in every worker)
+BASELINE_VARIANTS = int(os.environ.get('BASELINE_VARIANTS', '24'))
+# Seconds clients may reuse a baseline response without revalidating
+BASELINE_MAX_AGE = int(os.environ.get('BASELINE_MAX_AGE', '300'))
+
+# ---------------- PREFETCH ----------------
+PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', '2'))
+
+# ---------------- SESSIONS ----------------
+# "memory" (single process) or "sqlite" (shared between worker processes)
+SESSION_STORE = os.environ.get('SESSION_STORE', 'memory')
+SESSION_DB = os.environ.get('SESSION_DB', os.path.join(os.path.dirname(__file__), 'sessions.db'))
+SESSION_TTL = int(os.environ.get('SESSION_TTL', '7200'))
+
+# ---------------- RESPONSE LOG ----------------
+# Every trial response is appended to JSONL segments in this directory ('' turns it off)
+RESPONSE_LOG_DIR = os.environ.get('RESPONSE_LOG_DIR', os.path.join(os.path.dirname(__file__), 'response_log'))
+# Closed segments are compacted into Parquet partitions by date here (needs pyarrow)
+RESPONSE_ARCHIVE_DIR = os.environ.get(
+    'RESPONSE_ARCHIVE_DIR',
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'responses')
+)
+# "batch" (fsync every write), "rotate" (when a segment is closed) or "never"
+RESPONSE_LOG_FSYNC = os.environ.get('RESPONSE_LOG_FSYNC', 'batch')
+# Rows per write, and how long the writer waits to fill a batch
+RESPONSE_LOG_BATCH = int(os.environ.get('RESPONSE_LOG_BATCH', '256'))
+RESPONSE_LOG_FLUSH_MS = float(os.environ.get('RESPONSE_LOG_FLUSH_MS', '200'))
+# A segment is closed (and compacted) at this size or age
+RESPONSE_LOG_SEGMENT_BYTES = int(float(os.environ.get('RESPONSE_LOG_SEGMENT_MB', '64')) * 1024 * 1024)
+RESPONSE_LOG_SEGMENT_SECONDS = int(os.environ.get('RESPONSE_LOG_SEGMENT_SECONDS', '3600'))
+
+# ---------------- DYSGRAPHIA ----------------
+# /dysgraphia/screen runs on this many threads; uploads beyond
+# DYSGRAPHIA_WORKERS + DYSGRAPHIA_MAX_QUEUE at once are answered 503.
+# Each admitted upload holds an HTTP thread while it waits, so the sum must
+# stay below THREADS (create_app checks) to keep a thread for the tests.
+DYSGRAPHIA_WORKERS = int(os.environ.get('DYSGRAPHIA_WORKERS', '2'))
+DYSGRAPHIA_MAX_QUEUE = int(os.environ.get('DYSGRAPHIA_MAX_QUEUE', '1'))
+# Larger uploads, or images with more pixels (checked before decoding), get 413
+DYSGRAPHIA_MAX_UPLOAD_BYTES = int(float(os.environ.get('DYSGRAPHIA_MAX_UPLOAD_MB', '20')) * 1024 * 1024)
+DYSGRAPHIA_MAX_PIXELS = int(float(os.environ.get('DYSGRAPHIA_MAX_MEGAPIXELS', '50')) * 1e6)
+# How long a request waits for its screen (queueing included)
+DYSGRAPHIA_TIMEOUT = float(os.environ.get('DYSGRAPHIA_TIMEOUT', '30'))
+
+# ---------------- PREDICTION ----------------
+# Holds registry/ (preferred) or the .pkl files
+MODEL_DIR = os.environ.get('MODEL_DIR', os.path.join(os.path.dirname(__file__), '..', 'models'))
+# Single-row /predict calls are grouped into batches of up to this size,
+# waiting at most PREDICT_MAX_WAIT_MS for more rows to arrive
+PREDICT_MAX_BATCH = int(os.environ.get('PREDICT_MAX_BATCH', '256'))
+PREDICT_MAX_WAIT_MS = float(os.environ.get('PREDICT_MAX_WAIT_MS', '2'))
+# Seconds between checks of the model registry's ACTIVE pointer
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', '5'))
@@ -0,0 +1,32 @@
+# gunicorn settings, read from the same environment variables as config.py:
+#
+#     cd backend
+#     gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+# Workers are separate processes, so sessions must live in SQLite to be
+# visible to all of them (unless SESSION_STORE is set explicitly).
+os.environ.setdefault('SESSION_STORE', 'sqlite')
+
+# (not `import config`: gunicorn reads every module-level name as a setting)
+import config as _config
+
+bind = f"{_config.HOST}:{_config.PORT}"
+workers = _config.WORKERS
+# Threads let a worker keep serving while requests wait on TTS or the LLM
+worker_class = 'gthread'
+threads = _config.THREADS
+graceful_timeout = int(_config.GRACEFUL_TIMEOUT)
+timeout = 60
+
+# Each worker builds its own app (thread pools, SQLite connections), so the
+# app must not be created in the master before forking.
+preload_app = False
+
+
+def worker_exit(server, worker):
+    """Called once the worker stopped taking requests: drain its TTS queue."""
+    app = getattr(worker, 'wsgi', None)
+    if app is not None and 'earlymind' in getattr(app, 'extensions', {}):
+        from server import shutdown_app
+        shutdown_app(app)
@@ -0,0 +1,268 @@
+"""
+Handwriting (dysgraphia) screening for /dysgraphia/screen.
+
+Uploads are decoded at roughly the resolution the screener measures at:
+the size comes from the PNG/JPEG header, and cv2.IMREAD_REDUCED_* lets the
+JPEG decoder scale by 1/2, 1/4 or 1/8 as it decodes, so a 12 MP phone photo
+never exists as a full-size pixel array. Only formats whose size can be
+read from the header (PNG, JPEG, WebP, BMP) are accepted, so images over
+the pixel limit are always refused before decoding.
+
+Decoding and screening run on a small thread pool (OpenCV releases the
+GIL) with a bounded number of waiting jobs, so a burst of uploads gets 503
+instead of tying up every HTTP thread. OpenCV and the screener are imported
+on the first upload.
+"""
+import base64
+import contextvars
+import logging
+import struct
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import span
+
+log = logging.getLogger(__name__)
+
+# Decoded images are at least this wide (the screener's working width)
+MIN_DECODE_SIDE = 1000
+OVERLAY_JPEG_QUALITY = 80
+# Uploads are buffered in memory up to this size, then in a temp file
+SPOOL_MEMORY_BYTES = 1024 * 1024
+
+# JPEG start-of-frame markers (all but DHT, JPG and DAC in C0-CF)
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class ScreenerBusy(Exception):
+    pass
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+class UploadTooLarge(ImageTooLarge):
+    pass
+
+
+class UnreadableImage(ValueError):
+    pass
+
+
+class UnsupportedImage(ValueError):
+    pass
+
+
+def spool_upload(stream, limit, chunk_size=64 * 1024):
+    """
+    Copies a request body stream into a SpooledTemporaryFile, rewound.
+    Raises UploadTooLarge as soon as more than `limit` bytes arrive.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    size = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > limit:
+            spooled.close()
+            raise UploadTooLarge(f"Upload is larger than {limit} bytes")
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+def _jpeg_size(data):
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:          # fill byte
+            i += 1
+        elif marker in _SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        elif marker == 0x01 or 0xD0 <= marker <= 0xD8:   # no length field
+            i += 2
+        else:
+            i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = struct.unpack("<I", data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return 1 + int.from_bytes(data[24:27], "little"), 1 + int.from_bytes(data[27:30], "little")
+    return None
+
+def _bmp_size(data):
+    if len(data) < 26:
+        return None
+    if struct.unpack("<I", data[14:18])[0] == 12:   # OS/2 BITMAPCOREHEADER
+        return struct.unpack("<HH", data[18:22])
+    width, height = struct.unpack("<ii", data[18:26])
+    return abs(width), abs(height)   # negative height: top-down rows
+
+def image_size(data):
+    """
+    (width, height) from the image header. Raises UnsupportedImage for
+    formats other than PNG, JPEG, WebP and BMP, and UnreadableImage when
+    the header is truncated or malformed.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        size = struct.unpack(">II", data[16:24]) if len(data) >= 24 else None
+    elif data[:2] == b"\xff\xd8":
+        size = _jpeg_size(data)
+    elif data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        size = _webp_size(data)
+    elif data[:2] == b"BM":
+        size = _bmp_size(data)
+    else:
+        raise UnsupportedImage("Unsupported image format; send PNG, JPEG, WebP or BMP")
+    if size is None or not all(size):
+        raise UnreadableImage("Could not read the image size")
+    return size
+
+def reduction(size, min_side=MIN_DECODE_SIDE):
+    """
+    Largest decode scale-down (1, 2, 4 or 8) that keeps both sides at least
+    `min_side`, so EXIF rotation can't leave the page narrower than that.
+    """
+    short = min(size)
+    for factor in (8, 4, 2):
+        if short // factor >= min_side:
+            return factor
+    return 1
+
+def decode_image(data, max_pixels):
+    """
+    (BGR image, original (width, height)) from encoded image bytes.
+    Raises ImageTooLarge, UnsupportedImage or UnreadableImage.
+    """
+    import cv2
+    import numpy as np
+
+    size = image_size(data)
+    if size[0] * size[1] > max_pixels:
+        raise ImageTooLarge(f"Image is {size[0]}x{size[1]}; the limit is {max_pixels / 1e6:g} megapixels")
+    flag = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8,
+    }[reduction(size)]
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    if image is None:
+        raise UnreadableImage("Could not decode image")
+    return image, size
+
+def overlay_data_url(image, boxes):
+    """The word boxes drawn on the screened image, as a JPEG data: URL."""
+    import cv2
+
+    from dysgraphia.screening import draw_boxes
+
+    ok, jpeg = cv2.imencode(".jpg", draw_boxes(image, boxes), [cv2.IMWRITE_JPEG_QUALITY, OVERLAY_JPEG_QUALITY])
+    if not ok:
+        return None
+    return "data:image/jpeg;base64," + base64.b64encode(jpeg.tobytes()).decode("ascii")
+
+
+class HandwritingScreener:
+    """
+    Runs screen_image() on uploads in a fixed pool of `workers` threads.
+    At most `workers + max_queue` uploads are accepted at once; submit()
+    raises ScreenerBusy beyond that.
+    """
+
+    def __init__(self, workers=2, max_queue=8, max_pixels=50_000_000):
+        self.max_pixels = max_pixels
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dysgraphia")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counters = {"ok": 0, "no_text": 0, "invalid": 0, "failed": 0, "busy": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def submit(self, upload, overlay=False):
+        """
+        Schedules a screen of the encoded image in the file object `upload`,
+        which is only read once a worker picks the job up. The job owns
+        `upload` and closes it when it finishes or is cancelled (or right
+        away if it is rejected), so the caller may return before it runs.
+        Returns a Future resolving to the response dict. Spans recorded
+        while it runs belong to the calling request.
+        """
+        if not self._slots.acquire(blocking=False):
+            self._count("busy")
+            upload.close()
+            raise ScreenerBusy("Too many handwriting screens in progress")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(contextvars.copy_context().run, self._screen, upload, overlay)
+        except RuntimeError:
+            self._release(None)
+            upload.close()
+            raise ScreenerBusy("Screener is shut down")
+        future.add_done_callback(self._release)
+        future.add_done_callback(lambda _: upload.close())
+        return future
+
+    def _release(self, future):
+        self._slots.release()
+        with self._lock:
+            self._pending -= 1
+
+    def _screen(self, upload, overlay):
+        from dysgraphia.screening import NoTextFound, screen_image
+
+        try:
+            with span("decode"):
+                data = upload.read()
+                if not data:
+                    raise UnreadableImage("Empty upload")
+                image, (width, height) = decode_image(data, self.max_pixels)
+                del data
+            with span("screen"):
+                metrics = screen_image(image)
+        except NoTextFound:
+            self._count("no_text")
+            raise
+        except (ImageTooLarge, UnreadableImage, UnsupportedImage):
+            self._count("invalid")
+            raise
+        except Exception:
+            self._count("failed")
+            log.exception("Handwriting screen failed")
+            raise
+
+        metrics["image"] = {
+            "width": width, "height": height,
+            "decoded_width": image.shape[1], "decoded_height": image.shape[0],
+        }
+        if overlay:
+            with span("overlay"):
+                metrics["overlay"] = overlay_data_url(image, metrics["word_boxes"])
+        self._count("ok")
+        return metrics
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["pending"] = self._pending
+        return counters
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,105 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+
+def hints_key(prompt_hints):
+    """Stable key for a prompt_hints dict; trials only depend on the hints."""
+    return json.dumps(prompt_hints, sort_keys=True)
+
+
+class PrefetchCache:
+    """
+    Per-session slots of speculatively generated next trials.
+
+    After serving a trial, the handler schedules one candidate per likely
+    outcome (correct / incorrect), keyed by the prompt_hints that outcome
+    would produce. When the next request arrives with the same hints the
+    trial is served from the slot instead of being generated again.
+    """
+
+    def __init__(self, workers=2, max_sessions=1000):
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._slots = OrderedDict()   # slot name -> {hints key: Future}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "not_ready": 0, "stale": 0, "scheduled": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def schedule(self, slot, candidates):
+        """
+        candidates: {hints key: zero-arg callable returning a trial}.
+        Replaces whatever was speculated for this slot before.
+        """
+        futures = {}
+        for key, build in candidates.items():
+            futures[key] = self._executor.submit(build)
+            self._count("scheduled")
+
+        with self._lock:
+            old = self._slots.pop(slot, None)
+            self._slots[slot] = futures
+            while len(self._slots) > self.max_sessions:
+                self._slots.popitem(last=False)
+
+        if old:
+            for f in old.values():
+                f.cancel()
+
+    def take(self, slot, key, exclude=(), word_key="audio_word"):
+        """
+        Returns the speculated trial for `key`, or None on a miss.
+        The slot is consumed either way since the session has moved on.
+        """
+        with self._lock:
+            futures = self._slots.pop(slot, None)
+
+        future = futures.get(key) if futures else None
+        if future is None:
+            self._count("misses")
+            return None
+        if not future.done():
+            # Still building; generating inline is faster than waiting
+            self._count("not_ready")
+            future.cancel()
+            return None
+
+        try:
+            trial = future.result()
+        except Exception as e:
+            log.warning("Prefetch failed for %s: %s", slot, e)
+            self._count("misses")
+            return None
+
+        if trial is None or trial.get(word_key) in exclude:
+            self._count("stale")
+            return None
+
+        self._count("hits")
+        return trial
+
+    def discard(self, slot):
+        with self._lock:
+            futures = self._slots.pop(slot, None)
+        if futures:
+            for f in futures.values():
+                f.cancel()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            sessions = len(self._slots)
+        lookups = counters["hits"] + counters["misses"] + counters["not_ready"] + counters["stale"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 3) if lookups else 0.0
+        counters["sessions"] = sessions
+        return counters
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,429 @@
+import argparse
+import datetime
+import heapq
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+
+log = logging.getLogger(__name__)
+
+FSYNC_MODES = ("batch", "rotate", "never")
+
+# Segment files: <utc start>-<pid>-<seq>.jsonl, suffixed .open while a process appends to them
+CLOSED_SUFFIX = ".jsonl"
+OPEN_SUFFIX = ".jsonl.open"
+
+# A failed compaction is retried after this many seconds, doubling each time up to the max
+COMPACT_RETRY_SECONDS = 30.0
+COMPACT_RETRY_MAX_SECONDS = 3600.0
+
+# ---------------- ROWS ----------------
+
+def _text(value):
+    return None if value is None else str(value)
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def response_rows(test, session_id, responses, first_trial, analysis, request_id=None):
+    """
+    Log rows for new responses of a session, the first being trial number
+    `first_trial`. `analysis` is the snapshot after the request
+    (assessment, prompt hints, stats).
+    """
+    now = time.time()
+    rows = []
+    for i, r in enumerate(responses, first_trial):
+        options = r.get("options")
+        rows.append({
+            "ts": now,
+            "session_id": _text(session_id),
+            "test": test,
+            "trial": i,
+            "word": _text(r.get("audio", r.get("text_word"))),
+            "options": [str(o) for o in options] if isinstance(options, list) else None,
+            "selected": _text(r.get("selected")),
+            "correct": bool(r.get("correct")),
+            "reaction_time": _float(r.get("reaction_time")),
+            "analysis": analysis,
+            "request_id": request_id,
+        })
+    return rows
+
+def new_responses_start(responses, baseline_words, word_field):
+    """
+    Index of the first response of a resent history that is not logged yet.
+    Stateless clients resend the whole history, one answer longer per call,
+    so only the last response is new, except on the first adaptive call,
+    whose history is all baseline answers.
+    """
+    if all(r.get(word_field, r.get("audio")) in baseline_words for r in responses):
+        return 0
+    return len(responses) - 1
+
+# ---------------- WRITER ----------------
+
+class ResponseLog:
+    """
+    Append-only log of trial responses, one JSON object per line.
+
+    record() only enqueues, so handlers never wait on the disk. A writer
+    thread appends whatever is queued in one write (up to `batch_size` rows,
+    lingering `flush_interval` seconds for more) to a segment owned by this
+    process, and closes it once it reaches `segment_bytes` or
+    `segment_seconds`. Closed segments go to a compactor thread that writes
+    them to the date-partitioned Parquet archive and deletes them; a failed
+    compaction keeps the segment and is retried with backoff. Segments still
+    in the directory at startup (left by a crash, a failed compaction or a
+    missing pyarrow) are compacted then.
+
+    fsync "batch" syncs every write, so a crash loses at most the rows still
+    queued; "rotate" syncs when a segment is closed; "never" leaves it to
+    the OS. A full queue drops rows (counted in stats) rather than block.
+    """
+
+    def __init__(self, directory, archive_dir=None, batch_size=256, flush_interval=0.2, fsync="batch",
+                 segment_bytes=64 * 1024 * 1024, segment_seconds=3600, max_queue=10000):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"Unknown fsync mode: {fsync}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.archive_dir = archive_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+
+        self._rows = queue.Queue(maxsize=max_queue)
+        self._closed_segments = queue.Queue()
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._counters = {"written": 0, "dropped": 0, "batches": 0, "segments": 0, "compacted": 0,
+                          "compact_failed": 0, "bad_lines": 0}
+
+        # Segments left open by processes that died are closed, and every
+        # closed segment not archived yet is compacted here
+        close_orphans(self.directory)
+        for path in closed_segments(self.directory):
+            self._closed_segments.put(path)
+
+        self._writer = threading.Thread(target=self._write_loop, name="response-log-writer", daemon=True)
+        self._writer.start()
+        self._compactor = threading.Thread(target=self._compact_loop, name="response-log-compactor", daemon=True)
+        self._compactor.start()
+
+    def record(self, rows):
+        for row in rows:
+            try:
+                self._rows.put_nowait(row)
+            except queue.Full:
+                with self._lock:
+                    self._counters["dropped"] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        counters["queued"] = self._rows.qsize()
+        return counters
+
+    def close(self, timeout=None):
+        """Writes out queued rows, closes the segment and waits for its compaction."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._rows.put(None)
+        self._writer.join(timeout)
+        self._closed_segments.put(None)
+        self._compactor.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    # ---------------- writer thread ----------------
+
+    def _next_batch(self):
+        """(rows, stop): blocks for the first row, then takes what arrives within flush_interval."""
+        try:
+            first = self._rows.get(timeout=1.0)
+        except queue.Empty:
+            return [], False
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                row = self._rows.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if row is None:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    def _write_loop(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            try:
+                if batch:
+                    self._write(batch)
+                if self._file is not None and (
+                    self._file.tell() >= self.segment_bytes
+                    or time.time() - self._opened_at >= self.segment_seconds
+                ):
+                    self._rotate()
+            except Exception:
+                # Keep the writer alive whatever the batch did; later rows still get written
+                log.exception("Response log write failed")
+                with self._lock:
+                    self._counters["dropped"] += len(batch)
+        self._rotate()
+
+    def _write(self, batch):
+        if self._file is None:
+            self._open_segment()
+        data = b"".join(json.dumps(row, separators=(",", ":")).encode("utf-8") + b"\n" for row in batch)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync == "batch":
+            os.fsync(self._file.fileno())
+        with self._lock:
+            self._counters["written"] += len(batch)
+            self._counters["batches"] += 1
+
+    def _open_segment(self):
+        self._opened_at = time.time()
+        self._seq += 1
+        started = datetime.datetime.fromtimestamp(self._opened_at, datetime.timezone.utc)
+        self._path = self.directory / f"{started:%Y%m%dT%H%M%S}-{os.getpid()}-{self._seq}{OPEN_SUFFIX}"
+        self._file = open(self._path, "ab")
+
+    def _rotate(self):
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            closed = close_segment(self._path)
+        finally:
+            # After a failure the next batch starts a new segment; this one
+            # is closed by the next process to start
+            self._file.close()
+            self._file = self._path = None
+        with self._lock:
+            self._counters["segments"] += 1
+        self._closed_segments.put(closed)
+
+    # ---------------- compactor thread ----------------
+
+    def _compact_loop(self):
+        retries = []   # heap of (due, path, last delay)
+        while True:
+            timeout = max(0.0, retries[0][0] - time.monotonic()) if retries else None
+            try:
+                path = self._closed_segments.get(timeout=timeout)
+                delay = 0.0
+            except queue.Empty:
+                _, path, delay = heapq.heappop(retries)
+            if path is None:
+                break
+            if self.archive_dir is None:
+                continue
+            try:
+                written, bad = compact_segment(path, self.archive_dir)
+            except ImportError:
+                log.warning("pyarrow is not installed; closed response log segments stay in %s", self.directory)
+                self.archive_dir = None
+                continue
+            except FileNotFoundError:
+                continue   # another worker compacted it first
+            except Exception as e:
+                delay = min(max(2 * delay, COMPACT_RETRY_SECONDS), COMPACT_RETRY_MAX_SECONDS)
+                log.error("Compacting %s failed, retrying in %gs: %s", path, delay, e)
+                heapq.heappush(retries, (time.monotonic() + delay, path, delay))
+                with self._lock:
+                    self._counters["compact_failed"] += 1
+                continue
+            with self._lock:
+                self._counters["compacted"] += 1
+                self._counters["bad_lines"] += bad
+
+# ---------------- SEGMENTS ----------------
+
+def close_segment(path):
+    """Renames an open segment to its closed name; returns the new path."""
+    path = Path(path)
+    closed = path.with_name(path.name[:-len(OPEN_SUFFIX)] + CLOSED_SUFFIX)
+    os.replace(path, closed)
+    return closed
+
+def segment_pid(path):
+    try:
+        return int(Path(path).name.split("-")[1])
+    except (IndexError, ValueError):
+        return None
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def close_orphans(directory):
+    """Closes open segments whose writing process is gone. Returns their closed paths."""
+    closed = []
+    for path in sorted(Path(directory).glob("*" + OPEN_SUFFIX)):
+        pid = segment_pid(path)
+        if pid is None or pid == os.getpid() or pid_alive(pid):
+            continue
+        try:
+            closed.append(close_segment(path))
+        except FileNotFoundError:
+            pass   # another worker closed it first
+    return closed
+
+def closed_segments(directory):
+    return sorted(Path(directory).glob("*" + CLOSED_SUFFIX))
+
+def read_segment(path):
+    """(rows, bad line count); a crash can leave the last line torn."""
+    rows, bad = [], 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                bad += 1
+    return rows, bad
+
+# ---------------- COMPACTION ----------------
+
+def arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("ts", pa.timestamp("ms", tz="UTC")),
+        ("session_id", pa.string()),
+        ("test", pa.string()),
+        ("trial", pa.int32()),
+        ("word", pa.string()),
+        ("options", pa.list_(pa.string())),
+        ("selected", pa.string()),
+        ("correct", pa.bool_()),
+        ("reaction_time", pa.float64()),
+        ("assessment", pa.string()),
+        ("analysis", pa.string()),   # JSON snapshot
+        ("request_id", pa.string()),
+    ])
+
+def to_table(rows):
+    import pyarrow as pa
+
+    schema = arrow_schema()
+    columns = {
+        "ts": [int(r["ts"] * 1000) for r in rows],
+        "assessment": [(r.get("analysis") or {}).get("assessment") for r in rows],
+        "analysis": [None if r.get("analysis") is None else json.dumps(r["analysis"], sort_keys=True) for r in rows],
+    }
+    for field in schema.names:
+        if field not in columns:
+            columns[field] = [r.get(field) for r in rows]
+    return pa.table({f.name: pa.array(columns[f.name], type=f.type) for f in schema}, schema=schema)
+
+def utc_date(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime("%Y-%m-%d")
+
+def compact_segment(path, archive_dir, delete=True):
+    """
+    Writes a closed segment to archive_dir/date=YYYY-MM-DD/part-<segment>.parquet
+    (one file per UTC day it spans) and deletes it. Part files are named after
+    the segment, so compacting it again overwrites rather than duplicates.
+    Returns (written paths, bad line count).
+    """
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    rows, bad = read_segment(path)
+    by_date = {}
+    for row in rows:
+        by_date.setdefault(utc_date(row["ts"]), []).append(row)
+
+    stem = path.name[:-len(CLOSED_SUFFIX)]
+    written = []
+    for date, day_rows in sorted(by_date.items()):
+        out_dir = Path(archive_dir) / f"date={date}"
+        out_dir.mkdir(parents=True, exist_ok=True)
+        target = out_dir / f"part-{stem}.parquet"
+        # Dot-prefixed, so readers of the dataset skip it while it is written
+        tmp = out_dir / f".{target.name}.{os.getpid()}.tmp"
+        pq.write_table(to_table(day_rows), tmp, compression="zstd")
+        os.replace(tmp, target)
+        written.append(target)
+
+    if delete:
+        path.unlink(missing_ok=True)
+    return written, bad
+
+def compact_all(directory, archive_dir, delete=True):
+    """Compacts every closed segment (and orphaned open one). Returns (segments, rows written)."""
+    close_orphans(directory)
+    segments = rows = 0
+    for path in closed_segments(directory):
+        written, _ = compact_segment(path, archive_dir, delete=delete)
+        segments += 1
+        rows += sum(pq_rows(p) for p in written)
+    return segments, rows
+
+def pq_rows(path):
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(path).metadata.num_rows
+
+# ---------------- CLI ----------------
+
+def main(argv=None):
+    import config
+
+    parser = argparse.ArgumentParser(description="Response log tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    compact = sub.add_parser("compact", help="Write closed segments to the Parquet archive")
+    compact.add_argument("--log-dir", default=config.RESPONSE_LOG_DIR)
+    compact.add_argument("--archive", default=config.RESPONSE_ARCHIVE_DIR)
+    compact.add_argument("--keep", action="store_true", help="keep segments after compacting")
+
+    stats = sub.add_parser("stats", help="Show segment and archive sizes")
+    stats.add_argument("--log-dir", default=config.RESPONSE_LOG_DIR)
+    stats.add_argument("--archive", default=config.RESPONSE_ARCHIVE_DIR)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        log_dir, archive = Path(args.log_dir), Path(args.archive)
+        print({
+            "open_segments": len(list(log_dir.glob("*" + OPEN_SUFFIX))),
+            "closed_segments": len(list(log_dir.glob("*" + CLOSED_SUFFIX))),
+            "archive_days": len(list(archive.glob("date=*"))),
+            "archive_rows": sum(pq_rows(p) for p in archive.glob("date=*/*.parquet")),
+        })
+        return
+
+    segments, rows = compact_all(args.log_dir, args.archive, delete=not args.keep)
+    print(f"✓ Compacted {segments} segments ({rows} rows) into {args.archive}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,118 +1,358 @@
-import sys
-import os
+import atexit
+import math
 import time
-from gtts import gTTS
-from flask import Flask, jsonify, request, url_for
+from concurrent.futures import TimeoutError as FutureTimeout
+from flask import Blueprint, Flask, Response, abort, current_app, g, jsonify, request, send_from_directory, url_for
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 
-# Add the src directory to sys.path so we can import from test1
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
-
+# test1/test2 and the model modules come from the installed package
+# (`pip install -e .` at the repo root)
 from test1.baseline import BASELINE_PAIRS
-from test1.logic import analyze_responses
+from test1.logic import IncrementalAnalyzer
 from test1.generator import generate_pair
 
 from test2.baseline import BASELINE_PAIRS as BASELINE_PAIRS_2
-from test2.logic import analyze_responses as analyze_responses_2
+from test2.logic import IncrementalAnalyzer as IncrementalAnalyzer_2
 from test2.generator import generate_pair as generate_pair_2
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+import config
+from audio_store import DIGEST_RE
+from baseline_bundle import shuffle_baseline_1
+from handwriting import ImageTooLarge, ScreenerBusy, UnreadableImage, UnsupportedImage, spool_upload
+from prefetch import hints_key
+from response_log import new_responses_start, response_rows
+from services import Services
+from sessions import SessionConflict, SessionNotFound
+from telemetry import begin_request, clear_request, configure_logging, current_trace, end_request, span
 
-AUDIO_DIR = os.path.join(os.path.dirname(__file__), 'static', 'audio')
-os.makedirs(AUDIO_DIR, exist_ok=True)
+bp = Blueprint('earlymind', __name__)
 
-def generate_audio_file(word):
+def create_app(overrides=None):
     """
-    Generates an audio file for the given word using gTTS if it doesn't exist.
-    Returns the filename.
+    Builds the Flask app and its services (TTS pool, caches, session store,
+    model) from config.py / the environment, plus `overrides`.
     """
-    # gTTS saves as mp3 usually, but we can name it whatever. mp3 is standard.
-    filename = f"{word}.mp3" 
-    filepath = os.path.join(AUDIO_DIR, filename)
-    
-    if not os.path.exists(filepath):
-        try:
-            tts = gTTS(text=word, lang='en')
-            tts.save(filepath)
-            print(f"Generated audio for: {word}")
-        except Exception as e:
-            print(f"Error generating audio for {word}: {e}")
-            
-    return filename
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config.update(overrides or {})
+    check_config(app.config)
+    CORS(app, expose_headers=['Server-Timing', 'X-Request-ID'])  # Enable CORS for all routes
+    configure_logging(app.config['LOG_FORMAT'], app.config['LOG_LEVEL'])
+
+    app.extensions['earlymind'] = Services(app.config)
+    app.register_blueprint(bp)
+    return app
+
+def check_config(cfg):
+    """Rejects settings that would let one endpoint take every HTTP thread."""
+    in_flight = cfg['DYSGRAPHIA_WORKERS'] + cfg['DYSGRAPHIA_MAX_QUEUE']
+    if in_flight >= cfg['THREADS']:
+        raise ValueError(
+            f"DYSGRAPHIA_WORKERS + DYSGRAPHIA_MAX_QUEUE ({in_flight}) must be less than "
+            f"THREADS ({cfg['THREADS']}): waiting screens hold HTTP threads"
+        )
+
+def svc(app=None):
+    """The Services of the current (or given) app."""
+    return (app or current_app).extensions['earlymind']
+
+def shutdown_app(app, timeout=None):
+    svc(app).shutdown(timeout=app.config['GRACEFUL_TIMEOUT'] if timeout is None else timeout)
+
+# ---------------- TELEMETRY ----------------
+# Every request gets a trace: spans recorded with telemetry.span() show up
+# in its JSON log line, a Server-Timing header and the /metrics histograms.
+
+def profiling_options(cfg):
+    """(directory, sample interval) when requests may ask for the profiler."""
+    if not cfg['PROFILING']:
+        return None
+    return cfg['PROFILE_DIR'], cfg['PROFILE_INTERVAL_MS'] / 1000
+
+@bp.before_app_request
+def start_trace():
+    g.trace = begin_request(
+        svc().telemetry, request.method, request.path, request.headers,
+        profiling_options(current_app.config)
+    )
 
-def add_audio_url(pair):
+@bp.after_app_request
+def finish_trace(response):
+    trace = g.get('trace')
+    if trace is not None:
+        response.headers.update(end_request(trace, request.endpoint, response.status_code))
+    return response
+
+@bp.teardown_app_request
+def clear_trace(exc):
+    clear_request(g.pop('trace', None))
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text format; counters are per worker process."""
+    return Response(svc().telemetry.render(), mimetype='text/plain; version=0.0.4')
+
+# ---------------- PREFETCH ----------------
+
+def speculate_next(services, slot, analyzer, trial_word, word_field, exclude, build):
+    """
+    Schedules the trial that would follow `trial_word` for each outcome
+    (correct / incorrect). The hypothetical response reuses the session's
+    mean reaction time, which is what the next analysis will mostly see.
+    `services` is passed in since the builds run on prefetch threads,
+    outside the app context.
+    """
+    assumed_rt = analyzer.mean() if analyzer.n else 1.0
+    next_exclude = set(exclude) | {trial_word}
+
+    candidates = {}
+    for correct in (True, False):
+        hypothetical = {word_field: trial_word, "correct": correct, "reaction_time": assumed_rt}
+        hints = analyzer.copy().update(hypothetical)["prompt_hints"]
+        key = hints_key(hints)
+        if key not in candidates:
+            candidates[key] = (lambda h=hints: build(services, h, next_exclude))
+
+    services.prefetch.schedule(slot, candidates)
+
+def build_trial_1(services, prompt_hints, exclude):
+    pair = generate_pair(prompt_hints, exclude_words=list(exclude))
+    # Start synthesis now so the audio is cached when the trial is served
+    services.tts.submit(pair["audio_word"])
+    return pair
+
+def build_trial_2(services, prompt_hints, exclude):
+    return generate_pair_2(prompt_hints, exclude_words=list(exclude))
+
+@bp.route('/prefetch/stats', methods=['GET'])
+def prefetch_stats():
+    """Hit/miss counters showing how often speculation pays off."""
+    return jsonify(svc().prefetch.stats())
+
+def generate_audio_file(word, timeout=0.0):
+    """
+    Schedules audio generation for the given word if it doesn't exist.
+    Returns (filename, status) without waiting longer than `timeout`.
+    """
+    return svc().tts.ensure(word, timeout=timeout)
+
+def audio_url_for(filename):
+    # Construct full URL or relative path.
+    try:
+        return url_for('earlymind.audio_file', filename=filename, _external=True)
+    except RuntimeError:
+        return f'/static/audio/{filename}'
+
+@bp.route('/static/audio/<filename>', methods=['GET'])
+def audio_file(filename):
+    """
+    Serves a cached audio file or sprite from AUDIO_DIR. Names are content
+    addresses, so responses are immutable; Range requests get 206 partial
+    content (e.g. one word out of a sprite). mp3/wav are sent as stored,
+    never re-compressed, so byte offsets stay valid.
+    """
+    m = DIGEST_RE.match(filename)
+    store = svc().audio_store
+    # Marks the file recently used, adopts files other workers wrote and
+    # drops entries whose file another worker evicted (the next trial or
+    # /audio-status request for the word synthesizes it again)
+    if m is None or store.lookup(m.group(1), m.group(2)) is None:
+        abort(404)
+    response = send_from_directory(store.root, filename, conditional=True)
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config['AUDIO_MAX_AGE']}, immutable"
+    return response
+
+def add_audio_url(pair, timeout=None):
     """
     Helper to add audio URL to a pair.
+    `audio_status` is "ready" once the file can be fetched, "pending" while
+    it is still being synthesized (poll /audio-status), or "error".
     """
+    if timeout is None:
+        timeout = current_app.config['TTS_WAIT_TIMEOUT']
     word = pair.get('audio', pair.get('audio_word'))
     if word:
-        filename = generate_audio_file(word)
-        # Construct full URL or relative path.
-        try:
-            pair['audio_url'] = url_for('static', filename=f'audio/{filename}', _external=True)
-        except RuntimeError:
-            pair['audio_url'] = f'/static/audio/{filename}'
+        with span("tts") as s:
+            cached = svc().tts.is_ready(word)
+            filename, status = generate_audio_file(word, timeout=timeout)
+            s.outcome = tts_outcome(cached, status)
+        pair['audio_url'] = audio_url_for(filename)
+        pair['audio_status'] = status
     return pair
 
-@app.route('/baseline', methods=['GET'])
+def tts_outcome(cached, status):
+    """Span label: "hit" (cached), "synth" (synthesized in time), "pending" or "error"."""
+    if cached:
+        return "hit"
+    return "synth" if status == "ready" else status
+
+@bp.route('/audio-status', methods=['GET'])
+def audio_status():
+    """
+    Lets clients poll for audio that was still pending when a trial was served.
+    Query: ?word=bed
+    """
+    word = request.args.get('word')
+    if not word:
+        return jsonify({"error": "Missing 'word' parameter"}), 400
+    return jsonify({
+        "word": word,
+        "status": svc().tts.status(word),
+        "audio_url": audio_url_for(svc().tts.filename(word))
+    })
+
+def serve_trial_1(session_id, analyzer, prompt_hints, used_words):
+    """
+    Returns the next Test 1 pair (with audio URL), from the prefetch slot when
+    possible, and speculates the one after it.
+    """
+    slot = f"test1:{session_id}"
+
+    with span("generate") as s:
+        # Serve the speculated trial if one was built for these hints
+        new_pair = None
+        if session_id:
+            new_pair = svc().prefetch.take(slot, hints_key(prompt_hints), exclude=used_words)
+
+        if new_pair is None:
+            # Generate the next pair using the logic from generator.py
+            # We pass the prompt hints derived from the analysis and the exclusion list
+            new_pair = generate_pair(prompt_hints, exclude_words=list(used_words))
+            s.outcome = new_pair.pop("source", None)
+        else:
+            s.outcome = "prefetch"
+            new_pair.pop("source", None)
+
+    # Add audio URL
+    add_audio_url(new_pair)
+
+    if session_id:
+        with span("speculate"):
+            speculate_next(
+                svc(), slot, analyzer, new_pair["audio_word"], "audio",
+                used_words, build_trial_1
+            )
+    return new_pair
+
+def serve_trial_2(session_id, analyzer, prompt_hints, exclude):
+    """Test 2 counterpart of serve_trial_1 (text-only)."""
+    slot = f"test2:{session_id}"
+
+    with span("generate") as s:
+        pair = None
+        if session_id:
+            pair = svc().prefetch.take(slot, hints_key(prompt_hints), exclude=exclude)
+
+        if pair is None:
+            # Generate new pair
+            pair = generate_pair_2(prompt_hints, exclude_words=list(exclude))
+            s.outcome = pair.pop("source", None)
+        else:
+            s.outcome = "prefetch"
+            pair.pop("source", None)
+
+    if session_id:
+        with span("speculate"):
+            speculate_next(
+                svc(), slot, analyzer, pair["audio_word"], "text_word",
+                exclude, build_trial_2
+            )
+    return pair
+
+def bundle_response(bundle):
+    """Serves a precomputed BaselineBundle, honouring If-None-Match and Accept-Encoding."""
+    status, body, headers = bundle.respond(
+        request.headers.get('If-None-Match'),
+        request.headers.get('Accept-Encoding')
+    )
+    return Response(body, status=status, headers=headers)
+
+@bp.route('/baseline', methods=['GET'])
 def get_baseline():
-    """Returns the baseline pairs for the initial phase."""
-    # We copy the list to avoid modifying the original global constant if we were holding it in memory statefully
-    # (though imports usually cache, modifying dicts inside list is side-effecty).
-    pairs = []
-    for p in BASELINE_PAIRS:
-        # Create a deep-ish copy of the dict and options list so we can shuffle safely
-        pair_copy = p.copy()
-        if "options" in pair_copy:
-            pair_copy["options"] = list(pair_copy["options"]) # Copy list
-            
-            # Shuffle options
-            import random
-            random.shuffle(pair_copy["options"])
-            
-            # Re-calculate correct_index because shuffling changed positions
-            # The baseline pairs in baseline.py use "audio" as the target word key
-            target = pair_copy["audio"]
-            if target in pair_copy["options"]:
-                pair_copy["correct_index"] = pair_copy["options"].index(target)
-            else:
-                # Fallback if audio word not in options (shouldn't happen with well-formed data)
-                # But looking at baseline.py: "audio": "bed", "options": ["bed", "ded"]
-                pass 
-        
-        pairs.append(pair_copy)
-        
-    # Shuffle the order of the pairs themselves so the first word isn't always the same
-    import random
-    random.shuffle(pairs)
-        
+    """
+    Returns the baseline pairs for the initial phase: one of the
+    precomputed shuffles, or a live response while the audio is still
+    being synthesized after startup.
+    """
+    with span("baseline") as s:
+        bundle = svc().baseline.get_test1(audio_url_for(''))
+        s.outcome = "bundle" if bundle is not None else "live"
+    if bundle is not None:
+        return bundle_response(bundle)
+
+    pairs = shuffle_baseline_1()
+
+    # Queue every baseline word first so they synthesize in parallel,
+    # then attach URLs (waiting at most TTS_WAIT_TIMEOUT per word).
+    for pair in pairs:
+        svc().tts.submit(pair['audio'])
     for pair in pairs:
         add_audio_url(pair)
-    return jsonify(pairs)
+    response = jsonify(pairs)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
-@app.route('/next-trial', methods=['POST'])
+@bp.route('/next-trial', methods=['POST'])
 def next_trial():
     """
     Expects JSON body:
     {
+        "session_id": "optional-client-id",
         "responses": [
             { "audio": "bed", "selected": "ded", "correct": false, "reaction_time": 1.2 },
             ...
         ]
     }
-    Returns a new pair based on analysis.
+    Returns a new pair based on analysis. With a session_id the following
+    trial is prefetched while the child answers.
     """
     data = request.json
     if not data or 'responses' not in data:
         return jsonify({"error": "Missing 'responses' field"}), 400
+    error = history_error(data['responses'])
+    if error:
+        return jsonify({"error": error}), 400
 
-    responses = data['responses']
-    
+    with span("analyze"):
+        analyzer, analysis, used_words = analyze_responses_1(data['responses'])
+    log_history(svc(), "test1", data.get('session_id'), data['responses'], analysis)
+    new_pair = serve_trial_1(data.get('session_id'), analyzer, analysis["prompt_hints"], used_words)
+    with span("serialize"):
+        return jsonify(next_trial_result(new_pair, analysis))
+
+def response_error(response):
+    """Why a trial response can't be analyzed, or None if it can."""
+    if not isinstance(response, dict) or 'correct' not in response or 'reaction_time' not in response:
+        return "Response needs 'correct' and 'reaction_time' fields"
+    rt = response['reaction_time']
+    if isinstance(rt, bool) or not isinstance(rt, (int, float)):
+        return "'reaction_time' must be a number"
+    try:
+        finite = math.isfinite(rt)
+    except OverflowError:   # an int too large for a float
+        finite = False
+    if not finite:
+        return "'reaction_time' must be a finite number"
+    return None
+
+def history_error(responses):
+    """response_error() of the first invalid response of a resent history, or None."""
+    if not isinstance(responses, list):
+        return "'responses' must be a list"
+    for r in responses:
+        error = response_error(r)
+        if error:
+            return error
+    return None
+
+def analyze_responses_1(responses):
+    """Analysis of a Test 1 history, plus the words it must not repeat."""
     # Analyze the responses so far
-    analysis = analyze_responses(responses)
-    prompt_hints = analysis["prompt_hints"]
-    assessment = analysis["assessment"]
+    analyzer = IncrementalAnalyzer()
+    for r in responses:
+        analyzer.add(r)
+    analysis = analyzer.result()
     
     # Collect used words (baseline + history)
     # 1. From baseline
@@ -121,74 +361,50 @@ def next_trial():
     for r in responses:
         if "audio" in r:
             used_words.add(r["audio"])
-    
-    # Generate the next pair using the logic from generator.py
-    # We pass the prompt hints derived from the analysis and the exclusion list
-    new_pair = generate_pair(prompt_hints, exclude_words=list(used_words))
-    
-    # Add audio URL
-    add_audio_url(new_pair)
-    
+    return analyzer, analysis, used_words
+
+def next_trial_result(new_pair, analysis):
     # We include the assessment in the response for debugging/frontend info if needed
-    result = {
+    return {
         "next_trial": new_pair,
-        "analysis": {
-            "assessment": assessment,
-            "prompt_hints": prompt_hints,
-            "stats": {
-                "accuracy": analysis["accuracy"],
-                "avg_rt": analysis["avg_rt"]
-            }
-        }
+        "analysis": analysis_summary(analysis)
     }
-    
-    return jsonify(result)
 
-@app.route('/test2/baseline', methods=['GET'])
+@bp.route('/test2/baseline', methods=['GET'])
 def test2_baseline():
     """
     Returns all baseline pairs for Test 2.
     Response format: JSON list of pairs (text-only).
     """
-    pairs = []
-    # We copy info from BASELINE_PAIRS_2
-    for p in BASELINE_PAIRS_2:
-        pair = p.copy()
-        # Shuffle options
-        import random
-        options = list(pair["options"])
-        random.shuffle(options)
-        pair["options"] = options
-        
-        # Re-calc correct index
-        if pair["audio"] in options:
-            pair["correct_index"] = options.index(pair["audio"])
-            
-        # Structure for client
-        pairs.append({
-            "text_word": pair["audio"], 
-            "options": pair["options"],
-            "correct_index": pair["correct_index"]
-        })
-    
-    # Shuffle the pairs order? Or keep order? 
-    # Test 1 shuffled pairs. Let's shuffle pairs.
-    import random
-    random.shuffle(pairs)
-    
-    return jsonify(pairs)
+    return bundle_response(svc().baseline.test2)
 
-@app.route('/test2/adaptive', methods=['POST'])
+@bp.route('/test2/adaptive', methods=['POST'])
 def test2_adaptive():
     """
     Generates ONE adaptive trial for Test 2 based on history.
     Response format: JSON object (text-only).
+    An optional "session_id" enables prefetching of the following trial.
     """
     data = request.json
     responses = data.get('responses', []) if data else []
-    
-    analysis = analyze_responses_2(responses)
-    prompt_hints = analysis["prompt_hints"]
+    error = history_error(responses)
+    if error:
+        return jsonify({"error": error}), 400
+    with span("analyze"):
+        analyzer, analysis, exclude = analyze_responses_2(responses)
+
+    session_id = data.get('session_id') if data else None
+    log_history(svc(), "test2", session_id, responses, analysis)
+    pair = serve_trial_2(session_id, analyzer, analysis["prompt_hints"], exclude)
+    with span("serialize"):
+        return jsonify(adaptive_result_2(pair, analysis))
+
+def analyze_responses_2(responses):
+    """Analysis of a Test 2 history, plus the words it must not repeat."""
+    analyzer = IncrementalAnalyzer_2()
+    for r in responses:
+        analyzer.add(r)
+    analysis = analyzer.result()
     
     # Exclude words already used
     exclude = set()
@@ -196,16 +412,312 @@ def test2_adaptive():
          word = r.get("text_word", r.get("audio"))
          if word:
              exclude.add(word)
-    
-    # Generate new pair
-    pair = generate_pair_2(prompt_hints, exclude_words=list(exclude))
-    
-    return jsonify({
+    return analyzer, analysis, exclude
+
+def adaptive_result_2(pair, analysis):
+    return {
         "text_word": pair["audio_word"], 
         "options": pair["options"],
         "correct_index": pair["correct_index"],
         "analysis": analysis["assessment"]
+    }
+
+# ---------------- SESSIONS ----------------
+# Server-side session state, so clients send one response per call instead
+# of the full history.
+
+SESSION_TESTS = {
+    "test1": {"baseline": BASELINE_PAIRS, "analyzer": IncrementalAnalyzer, "word_field": "audio"},
+    "test2": {"baseline": BASELINE_PAIRS_2, "analyzer": IncrementalAnalyzer_2, "word_field": "text_word"},
+}
+
+def load_session(session_id):
+    try:
+        return svc().sessions.get(session_id)
+    except SessionNotFound:
+        return None
+
+def analysis_summary(analysis):
+    return {
+        "assessment": analysis["assessment"],
+        "prompt_hints": analysis["prompt_hints"],
+        "stats": {
+            "accuracy": analysis["accuracy"],
+            "avg_rt": analysis["avg_rt"]
+        }
+    }
+
+@bp.route('/sessions', methods=['POST'])
+def create_session():
+    """
+    Expects JSON body: { "test": "test1" | "test2" }
+    Returns the new session id.
+    """
+    data = request.json or {}
+    test = data.get('test', 'test1')
+    if test not in SESSION_TESTS:
+        return jsonify({"error": f"Unknown test '{test}'"}), 400
+
+    baseline_words = [p["audio"] for p in SESSION_TESTS[test]["baseline"]]
+    state = {
+        "test": test,
+        # Running statistics only; the history itself is never resent or rescanned
+        "analyzer": SESSION_TESTS[test]["analyzer"]().to_state(),
+        # test1 never repeats baseline words; test2 only excludes words already seen
+        "used_words": baseline_words if test == "test1" else [],
+        "analysis": None
+    }
+    session_id = svc().sessions.create(state)
+    return jsonify({"session_id": session_id, "test": test}), 201
+
+@bp.route('/sessions/<session_id>/responses', methods=['POST'])
+def append_response(session_id):
+    """
+    Appends ONE response to the session.
+    Expects JSON body:
+    { "audio" (test1) or "text_word" (test2): "bed", "selected": "ded", "correct": false, "reaction_time": 1.2 }
+    """
+    state = load_session(session_id)
+    if state is None:
+        return jsonify({"error": "Unknown or expired session"}), 404
+
+    response = request.json
+    error = response_error(response)
+    if error:
+        return jsonify({"error": error}), 400
+
+    test = SESSION_TESTS[state["test"]]
+    word = response.get(test["word_field"], response.get("audio"))
+
+    def apply(state):
+        analyzer = test["analyzer"].from_state(state["analyzer"])
+        state["analysis"] = analyzer.update(response)
+        state["analyzer"] = analyzer.to_state()
+        if word and word not in state["used_words"]:
+            state["used_words"].append(word)
+        return state
+
+    # Read-modify-write under the store's lock, so concurrent appends to
+    # one session can't overwrite each other
+    try:
+        state = svc().sessions.update(session_id, apply)
+    except SessionNotFound:
+        return jsonify({"error": "Unknown or expired session"}), 404
+    except SessionConflict:
+        return jsonify({"error": "Session is being updated by another request; retry"}), 409
+    analyzer = test["analyzer"].from_state(state["analyzer"])
+    analysis = state["analysis"]
+    log_responses(svc(), state["test"], session_id, [response], analyzer.n - 1, analysis)
+
+    return jsonify({
+        "trials": analyzer.n,
+        "analysis": analysis_summary(analysis)
+    })
+
+@bp.route('/sessions/<session_id>/next-trial', methods=['GET'])
+def session_next_trial(session_id):
+    """Returns the next adaptive trial for the session's current state."""
+    state = load_session(session_id)
+    if state is None:
+        return jsonify({"error": "Unknown or expired session"}), 404
+    if state["analysis"] is None:
+        return jsonify({"error": "Submit baseline responses first"}), 400
+
+    test = SESSION_TESTS[state["test"]]
+    analyzer = test["analyzer"].from_state(state["analyzer"])
+    analysis = state["analysis"]
+    used_words = set(state["used_words"])
+
+    if state["test"] == "test1":
+        trial = serve_trial_1(session_id, analyzer, analysis["prompt_hints"], used_words)
+    else:
+        pair = serve_trial_2(session_id, analyzer, analysis["prompt_hints"], used_words)
+        trial = {
+            "text_word": pair["audio_word"],
+            "options": pair["options"],
+            "correct_index": pair["correct_index"]
+        }
+
+    return jsonify({
+        "next_trial": trial,
+        "analysis": analysis_summary(analysis)
     })
 
+@bp.route('/sessions/<session_id>/report', methods=['GET'])
+def session_report(session_id):
+    """Final analysis of the session."""
+    state = load_session(session_id)
+    if state is None:
+        return jsonify({"error": "Unknown or expired session"}), 404
+
+    # None until the first response has been appended
+    analysis = state["analysis"]
+    return jsonify({
+        "session_id": session_id,
+        "test": state["test"],
+        "trials": state["analyzer"]["n"],
+        "analysis": analysis
+    })
+
+# ---------------- RESPONSE LOG ----------------
+# Every answered trial is queued for the append-only response log; the
+# writer thread and Parquet compaction are in response_log.py. `services`
+# is passed in so asgi.py can share these.
+
+def log_responses(services, test, session_id, responses, first_trial, analysis):
+    response_log = services.response_log
+    if response_log is None or not responses:
+        return
+    trace = current_trace()
+    response_log.record(response_rows(
+        test, session_id, responses, first_trial, analysis_summary(analysis),
+        trace.request_id if trace is not None else None
+    ))
+
+def log_history(services, test, session_id, responses, analysis):
+    """Logs the answers a stateless /next-trial or /test2/adaptive history adds."""
+    spec = SESSION_TESTS[test]
+    start = new_responses_start(responses, {p["audio"] for p in spec["baseline"]}, spec["word_field"])
+    log_responses(services, test, session_id, responses[start:], start, analysis)
+
+# ---------------- PREDICTION ----------------
+# The model (and NumPy) is loaded on the first /predict call, not at import
+# time, from the registry's active version. Activating another version (here
+# or from the registry CLI) swaps it in without a restart.
+
+@bp.route('/model', methods=['GET'])
+def model_info():
+    predictor = svc().predictor
+    model = predictor.model
+    return jsonify({
+        "version": model.version,
+        "features": model.features,
+        "available_versions": predictor.registry.versions()
+    })
+
+@bp.route('/model/activate', methods=['POST'])
+def activate_model():
+    """
+    Expects JSON body: { "version": "v2" }
+    Makes the version active for every server process.
+    """
+    version = (request.json or {}).get('version')
+    if not version:
+        return jsonify({"error": "Expected 'version'"}), 400
+
+    from model_registry import ArtifactError
+
+    try:
+        model = svc().predictor.activate(version)
+    except ArtifactError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"version": model.version})
+
+def risk_label(pred_class):
+    return "High Risk" if pred_class == 1 else "Low Risk"
+
+@bp.route('/predict', methods=['POST'])
+def predict():
+    """
+    Expects JSON body:
+    { "features": { "avg_word_time_ms": 1380.0, ... } }
+    or, to score many rows in one call:
+    { "rows": [ { ... }, { ... } ] }
+    """
+    data = request.json or {}
+    batcher = svc().predictor.batcher()
+    model = batcher.model
+
+    if 'rows' in data:
+        try:
+            X = model.to_matrix(data['rows'])
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid features: {e}"}), 400
+        probs = model.predict_proba(X) if len(X) else []
+        predictions = []
+        for p in probs:
+            pred_class = int(p > model.threshold)
+            predictions.append({"pred_class": pred_class, "pred_prob": float(p), "label": risk_label(pred_class)})
+        return jsonify({"predictions": predictions})
+
+    if 'features' not in data:
+        return jsonify({"error": "Expected 'features' or 'rows'"}), 400
+
+    try:
+        pred_class, pred_prob = batcher.predict(data['features'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FutureTimeout:
+        # The batcher is backed up; the row is still scored, just too late
+        return jsonify({"error": "Prediction timed out"}), 503, {'Retry-After': '1'}
+
+    return jsonify({
+        "pred_class": pred_class,
+        "pred_prob": pred_prob,
+        "label": risk_label(pred_class)
+    })
+
+# ---------------- DYSGRAPHIA ----------------
+# Handwriting uploads are spooled, decoded at reduced size and screened on
+# the handwriting screener's bounded thread pool (see handwriting.py).
+
+@bp.route('/dysgraphia/screen', methods=['POST'])
+def dysgraphia_screen():
+    """
+    Screens a photo or scan of handwriting for dysgraphia risk. Send the
+    image as the request body (Content-Type image/jpeg, image/png, ...) or
+    as the `image` field of a multipart form. `?overlay=1` adds the image
+    with the word boxes drawn on it, as a JPEG data URL.
+    """
+    try:
+        from dysgraphia.screening import NoTextFound
+    except ImportError:
+        return jsonify({"error": "Handwriting screening is not installed (the 'dysgraphia' extra)"}), 501
+
+    cfg = current_app.config
+    limit = cfg['DYSGRAPHIA_MAX_UPLOAD_BYTES']
+    if request.content_length is not None and request.content_length > limit:
+        return jsonify({"error": f"Upload is larger than {limit} bytes"}), 413
+
+    with span("upload"):
+        try:
+            if request.mimetype == 'multipart/form-data':
+                request.max_content_length = limit
+                upload = request.files.get('image')
+                if upload is None:
+                    return jsonify({"error": "Expected an 'image' file field"}), 400
+                # Werkzeug closes form files when the request ends, and the
+                # screen may outlive a timed-out request: hand it a copy
+                upload = spool_upload(upload.stream, limit)
+            else:
+                upload = spool_upload(request.stream, limit)
+        except (ImageTooLarge, RequestEntityTooLarge):
+            return jsonify({"error": f"Upload is larger than {limit} bytes"}), 413
+
+    overlay = request.args.get('overlay', '0').lower() in ('1', 'true', 'yes')
+    try:
+        future = svc().handwriting.submit(upload, overlay=overlay)
+    except ScreenerBusy as e:
+        return jsonify({"error": str(e)}), 503, {'Retry-After': '1'}
+
+    try:
+        return jsonify(future.result(timeout=cfg['DYSGRAPHIA_TIMEOUT']))
+    except FutureTimeout:
+        future.cancel()
+        return jsonify({"error": "Screening timed out"}), 503, {'Retry-After': '5'}
+    except ImageTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except UnreadableImage as e:
+        return jsonify({"error": str(e)}), 400
+    except UnsupportedImage as e:
+        return jsonify({"error": str(e)}), 415
+    except NoTextFound as e:
+        return jsonify({"error": str(e)}), 422
+    except Exception:
+        return jsonify({"error": "Screening failed"}), 500
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    # Development server. In production run gunicorn (see gunicorn.conf.py).
+    app = create_app()
+    atexit.register(shutdown_app, app)
+    app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
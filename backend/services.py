@@ -0,0 +1,247 @@
+import logging
+import threading
+from pathlib import Path
+
+from audio_store import AudioStore
+from baseline_bundle import BaselineCache
+from handwriting import HandwritingScreener
+from prefetch import PrefetchCache
+from response_log import ResponseLog
+from sessions import create_store
+from telemetry import Telemetry, counter_lines, gauge_lines, snapshot_histogram_lines
+from tts import TTSPipeline, get_engine
+
+log = logging.getLogger(__name__)
+
+
+class Predictor:
+    """
+    Risk model for /predict: loaded on first use (NumPy is only imported
+    then), scored through a micro-batcher and kept in step with the model
+    registry's ACTIVE pointer.
+    """
+
+    def __init__(self, model_dir, max_batch=256, max_wait=0.002, reload_interval=5.0):
+        self.model_dir = Path(model_dir)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.reload_interval = reload_interval
+        self._batcher = None
+        self._watcher = None
+        self._lock = threading.Lock()
+
+    @property
+    def registry(self):
+        from model_registry import ModelRegistry
+
+        return ModelRegistry(self.model_dir / "registry")
+
+    def _load(self):
+        from risk_model import RiskModel
+
+        registry = self.registry
+        if registry.active_version() is not None:
+            return registry.load()
+        return RiskModel.load(
+            self.model_dir / "logistic_dyslexia.pkl",
+            self.model_dir / "scaler.pkl",
+            self.model_dir / "model_metadata.json"
+        )
+
+    def batcher(self):
+        if self._batcher is None:
+            with self._lock:
+                if self._batcher is None:
+                    from model_registry import ActiveModelWatcher
+                    from risk_model import MicroBatcher
+
+                    model = self._load()
+                    batcher = MicroBatcher(model, max_batch=self.max_batch, max_wait=self.max_wait)
+                    self._watcher = ActiveModelWatcher(
+                        self.registry, model,
+                        interval=self.reload_interval,
+                        on_swap=lambda m: setattr(batcher, "model", m)
+                    )
+                    self._batcher = batcher
+        self._watcher.current()
+        return self._batcher
+
+    @property
+    def model(self):
+        return self.batcher().model
+
+    def activate(self, version):
+        """Activates a registry version for every process and swaps it in here."""
+        registry = self.registry
+        self.batcher()
+        registry.activate(version)
+        model = registry.load(version)
+        self._watcher.swap(model)
+        return model
+
+
+def sync_llm_stats():
+    from llm_client import get_client
+
+    return get_client().stats()
+
+
+class Services:
+    """
+    Everything a server process holds between requests, built from the app
+    config by create_app(): audio cache and TTS pool, prefetch pool, session
+    store, baseline bundles, response log, handwriting screener and risk
+    model. Nothing here lives in module globals, so each app (and each
+    gunicorn worker) gets its own pools, while the audio directory, SQLite
+    session store and model registry are shared between processes.
+    """
+
+    def __init__(self, cfg):
+        # ---------------- TTS ----------------
+        # Synthesis runs on a background worker pool so a cold word never blocks
+        # a request for a full gTTS round-trip. Finished files live in a
+        # content-addressed cache indexed in memory at startup.
+        self.audio_store = AudioStore(cfg["AUDIO_DIR"], max_bytes=cfg["AUDIO_CACHE_MAX_BYTES"])
+        self.tts = TTSPipeline(
+            self.audio_store,
+            get_engine(cfg["TTS_ENGINE"]),
+            workers=cfg["TTS_WORKERS"],
+            max_queue=cfg["TTS_MAX_QUEUE"]
+        )
+
+        # ---------------- BASELINE ----------------
+        # Identical content for every child: serialized and compressed once
+        self.baseline = BaselineCache(
+            self.tts,
+            variants=cfg["BASELINE_VARIANTS"],
+            max_age=cfg["BASELINE_MAX_AGE"]
+        )
+
+        # ---------------- PREFETCH ----------------
+        # Next adaptive trials are built speculatively while the child answers.
+        self.prefetch = PrefetchCache(workers=cfg["PREFETCH_WORKERS"])
+
+        # ---------------- SESSIONS ----------------
+        self.sessions = create_store(cfg["SESSION_STORE"], ttl=cfg["SESSION_TTL"], path=cfg["SESSION_DB"])
+
+        # ---------------- RESPONSE LOG ----------------
+        # Trial responses are written (and compacted to Parquet) off the request path
+        self.response_log = None
+        if cfg["RESPONSE_LOG_DIR"]:
+            self.response_log = ResponseLog(
+                cfg["RESPONSE_LOG_DIR"],
+                archive_dir=cfg["RESPONSE_ARCHIVE_DIR"] or None,
+                batch_size=cfg["RESPONSE_LOG_BATCH"],
+                flush_interval=cfg["RESPONSE_LOG_FLUSH_MS"] / 1000,
+                fsync=cfg["RESPONSE_LOG_FSYNC"],
+                segment_bytes=cfg["RESPONSE_LOG_SEGMENT_BYTES"],
+                segment_seconds=cfg["RESPONSE_LOG_SEGMENT_SECONDS"]
+            )
+
+        # ---------------- DYSGRAPHIA ----------------
+        # Handwriting screens are CPU-bound OpenCV work, kept to a few threads
+        self.handwriting = HandwritingScreener(
+            workers=cfg["DYSGRAPHIA_WORKERS"],
+            max_queue=cfg["DYSGRAPHIA_MAX_QUEUE"],
+            max_pixels=cfg["DYSGRAPHIA_MAX_PIXELS"]
+        )
+
+        # ---------------- PREDICTION ----------------
+        self.predictor = Predictor(
+            cfg["MODEL_DIR"],
+            max_batch=cfg["PREDICT_MAX_BATCH"],
+            max_wait=cfg["PREDICT_MAX_WAIT_MS"] / 1000,
+            reload_interval=cfg["MODEL_RELOAD_INTERVAL"]
+        )
+
+        # ---------------- TELEMETRY ----------------
+        self.telemetry = Telemetry()
+        self.telemetry.add_collector(self.metrics)
+        # label -> zero-arg callable returning an LLM client's stats(); asgi.py adds its async client
+        self.llm_clients = {"sync": sync_llm_stats}
+
+        self._closed = False
+
+    def shutdown(self, timeout=None):
+        """
+        Graceful stop: drops speculative work, then lets queued TTS jobs
+        finish (up to `timeout` seconds) so no half-synthesized word is lost,
+        and writes out the response log.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self.prefetch.shutdown(wait=False)
+        self.handwriting.shutdown(wait=False)
+        pending = self.tts.pending_count()
+        left = self.tts.shutdown(wait=True, timeout=timeout)
+        log.info("Drained TTS queue: %d finished, %d abandoned", pending - left, left,
+                 extra={"finished": pending - left, "abandoned": left})
+        if self.response_log is not None:
+            self.response_log.close(timeout=timeout)
+
+    def metrics(self):
+        """Prometheus lines for the state of the services, read at scrape time."""
+        tts = self.tts.stats()
+        lines = counter_lines(
+            "earlymind_tts_jobs_total", "Finished TTS jobs by outcome.",
+            {(k,): tts[k] for k in ("synthesized", "failed", "dropped")}, ("outcome",)
+        )
+        lines += counter_lines(
+            "earlymind_tts_synth_seconds_total", "Time spent synthesizing audio.", {(): tts["synth_seconds"]}
+        )
+        lines += gauge_lines("earlymind_tts_pending", "TTS jobs queued or running.", {(): tts["pending"]})
+
+        audio = self.audio_store.stats()
+        lines += gauge_lines("earlymind_audio_cache_files", "Files in the audio cache.", {(): audio["files"]})
+        lines += gauge_lines("earlymind_audio_cache_bytes", "Size of the audio cache.", {(): audio["bytes"]})
+
+        prefetch = self.prefetch.stats()
+        lines += counter_lines(
+            "earlymind_prefetch_lookups_total", "Prefetch slot lookups by result.",
+            {(k,): prefetch[k] for k in ("hits", "misses", "not_ready", "stale")}, ("result",)
+        )
+        lines += counter_lines(
+            "earlymind_prefetch_scheduled_total", "Speculative trial builds scheduled.", {(): prefetch["scheduled"]}
+        )
+
+        if self.response_log is not None:
+            responses = self.response_log.stats()
+            lines += counter_lines(
+                "earlymind_response_log_rows_total", "Trial responses written to or dropped from the response log.",
+                {(k,): responses[k] for k in ("written", "dropped")}, ("result",)
+            )
+            lines += counter_lines(
+                "earlymind_response_log_segments_total", "Response log segments closed, compacted and failed compactions.",
+                {(k,): responses[k] for k in ("segments", "compacted", "compact_failed")}, ("stage",)
+            )
+            lines += gauge_lines(
+                "earlymind_response_log_queued", "Responses waiting for the writer.", {(): responses["queued"]}
+            )
+
+        screens = self.handwriting.stats()
+        lines += counter_lines(
+            "earlymind_dysgraphia_screens_total", "Handwriting screens by outcome.",
+            {(k,): screens[k] for k in ("ok", "no_text", "invalid", "failed", "busy")}, ("outcome",)
+        )
+        lines += gauge_lines(
+            "earlymind_dysgraphia_pending", "Handwriting screens queued or running.", {(): screens["pending"]}
+        )
+
+        llm = self.llm_stats()
+        lines += counter_lines(
+            "earlymind_llm_events_total", "LLM client calls, failures, retries, short circuits and busy rejections.",
+            {(client, k): v for client, stats in llm for k, v in stats["counters"].items()}, ("client", "event")
+        )
+        lines += gauge_lines(
+            "earlymind_llm_circuit_open", "1 while the LLM circuit breaker is open.",
+            {(client,): int(stats["circuit"] == "open") for client, stats in llm}, ("client",)
+        )
+        lines += snapshot_histogram_lines(
+            "earlymind_llm_request_duration_seconds", "LLM call latency.",
+            {client: stats["latency_seconds"] for client, stats in llm}, "client"
+        )
+        return lines
+
+    def llm_stats(self):
+        return [(label, get()) for label, get in self.llm_clients.items()]
@@ -0,0 +1,209 @@
+import copy
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class SessionNotFound(KeyError):
+    pass
+
+
+class SessionConflict(Exception):
+    """Another writer held or changed the session during update()."""
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+class MemorySessionStore:
+    """
+    In-process session store with TTL eviction.
+
+    Sessions are kept in access order, so expired ones are always at the
+    front and purging is amortized O(1) per request. update() serializes
+    read-modify-write cycles with a lock per session.
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._sessions = OrderedDict()   # id -> (expires_at, state)
+        self._session_locks = {}         # id -> Lock, for update()
+        self._lock = threading.Lock()
+
+    def _purge_locked(self, now):
+        while self._sessions:
+            sid, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[sid]
+            self._session_locks.pop(sid, None)
+
+    def create(self, state):
+        sid = new_session_id()
+        self.put(sid, dict(state, id=sid))
+        return sid
+
+    def get(self, sid):
+        now = time.time()
+        with self._lock:
+            self._purge_locked(now)
+            entry = self._sessions.get(sid)
+            if entry is None:
+                raise SessionNotFound(sid)
+            return entry[1]
+
+    def put(self, sid, state):
+        now = time.time()
+        with self._lock:
+            self._sessions.pop(sid, None)
+            self._sessions[sid] = (now + self.ttl, state)
+            self._purge_locked(now)
+
+    def update(self, sid, fn):
+        """
+        Replaces the state with `fn(state)` and returns it. Concurrent
+        updates of one session run one after the other, each on the state
+        the previous one wrote. `fn` gets a copy, so readers never see a
+        half-applied change.
+        """
+        with self._lock:
+            lock = self._session_locks.setdefault(sid, threading.Lock())
+        with lock:
+            state = fn(copy.deepcopy(self.get(sid)))
+            self.put(sid, state)
+            return state
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+            self._session_locks.pop(sid, None)
+
+    def __len__(self):
+        with self._lock:
+            self._purge_locked(time.time())
+            return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """
+    SQLite-backed session store, so several server processes can share
+    sessions. States are stored as JSON; expired rows are purged lazily.
+    Every write bumps the row's version, which update() checks.
+    """
+
+    PURGE_EVERY = 100
+
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+        if "version" not in columns:
+            # Databases created before update() existed
+            conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)")
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, state):
+        sid = new_session_id()
+        self.put(sid, dict(state, id=sid))
+        return sid
+
+    def get(self, sid):
+        row = self._conn().execute(
+            "SELECT state FROM sessions WHERE id = ? AND expires_at > ?",
+            (sid, time.time())
+        ).fetchone()
+        if row is None:
+            raise SessionNotFound(sid)
+        return json.loads(row[0])
+
+    def put(self, sid, state):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO sessions (id, state, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET"
+            " state = excluded.state, expires_at = excluded.expires_at, version = version + 1",
+            (sid, json.dumps(state), now + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        conn.commit()
+
+    def update(self, sid, fn):
+        """
+        Replaces the state with `fn(state)` and returns it, reading and
+        writing in one BEGIN IMMEDIATE transaction so writers in other
+        threads and processes wait their turn. Raises SessionConflict if the
+        write lock can't be had within the connection timeout, or if the
+        row's version changed anyway.
+        """
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            raise SessionConflict(sid) from e
+        try:
+            row = conn.execute(
+                "SELECT state, version FROM sessions WHERE id = ? AND expires_at > ?",
+                (sid, time.time())
+            ).fetchone()
+            if row is None:
+                raise SessionNotFound(sid)
+            state = fn(json.loads(row[0]))
+            cursor = conn.execute(
+                "UPDATE sessions SET state = ?, expires_at = ?, version = version + 1"
+                " WHERE id = ? AND version = ?",
+                (json.dumps(state), time.time() + self.ttl, sid, row[1])
+            )
+            if cursor.rowcount != 1:
+                raise SessionConflict(sid)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return state
+
+    def delete(self, sid):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE id = ?", (sid,))
+        conn.commit()
+
+    def __len__(self):
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return row[0]
+
+
+def create_store(kind, ttl=3600, path=None):
+    if kind == "memory":
+        return MemorySessionStore(ttl=ttl)
+    if kind == "sqlite":
+        return SQLiteSessionStore(path, ttl=ttl)
+    raise ValueError(f"Unknown session store: {kind}")
@@ -0,0 +1,379 @@
+"""
+Request tracing, metrics and structured logging for the backend.
+
+- span("tts") times one step of the current request. Spans end up in the
+  request's log line, in a Server-Timing response header and in the
+  earlymind_span_duration_seconds histogram.
+- Telemetry holds the counters/histograms of one app and renders them,
+  plus gauges read from other components, in the Prometheus text format.
+- JsonFormatter turns every log record into one JSON line.
+- SamplingProfiler samples one thread's stack; a request can switch it on
+  with `X-Profile: 1` when PROFILING is enabled.
+
+Nothing here depends on Flask, so server.py and asgi.py share it.
+"""
+import contextvars
+import json
+import logging
+import math
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+_current_trace = contextvars.ContextVar("earlymind_trace", default=None)
+
+# ---------------- METRICS ----------------
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{format_labels(self.labels, key)} {format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = format_labels(self.labels + ("le",), key + (format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labels + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_value(series[-2])}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+class Telemetry:
+    """
+    Metrics of one app. Request and span metrics are recorded here; other
+    components are read at scrape time through collectors registered with
+    add_collector(fn), where fn returns Prometheus text lines.
+    """
+
+    def __init__(self):
+        self.requests = Counter(
+            "earlymind_http_requests_total", "HTTP requests by endpoint and status.",
+            ("endpoint", "method", "status")
+        )
+        self.request_seconds = Histogram(
+            "earlymind_http_request_duration_seconds", "HTTP request latency.", ("endpoint",)
+        )
+        self.span_seconds = Histogram(
+            "earlymind_span_duration_seconds",
+            "Time spent per request step (analyze, generate, tts, serialize, ...) by outcome.",
+            ("span", "outcome")
+        )
+        self._collectors = []
+
+    def add_collector(self, fn):
+        self._collectors.append(fn)
+
+    def render(self):
+        lines = []
+        for metric in (self.requests, self.request_seconds, self.span_seconds):
+            lines += metric.render()
+        for collect in self._collectors:
+            try:
+                lines += collect()
+            except Exception:
+                log.exception("Metrics collector failed")
+        return "\n".join(lines) + "\n"
+
+def gauge_lines(name, help, values, labels=()):
+    """Text lines of a gauge; `values` maps label-value tuples (or ()) to numbers."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+    for key, value in values.items():
+        lines.append(f"{name}{format_labels(labels, key)} {format_value(value)}")
+    return lines
+
+def counter_lines(name, help, values, labels=()):
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} counter"]
+    for key, value in values.items():
+        lines.append(f"{name}{format_labels(labels, key)} {format_value(value)}")
+    return lines
+
+def snapshot_histogram_lines(name, help, snapshots, label):
+    """
+    Prometheus lines for llm_client.LatencyHistogram snapshots (per-bucket
+    counts), one series per {label value: snapshot}.
+    """
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+    for value, snapshot in snapshots.items():
+        cumulative = 0
+        for bound, count in snapshot["buckets"].items():
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels((label, 'le'), (value, bound))} {cumulative}")
+        lines.append(f"{name}_sum{format_labels((label,), (value,))} {snapshot['sum']}")
+        lines.append(f"{name}_count{format_labels((label,), (value,))} {snapshot['count']}")
+    return lines
+
+# ---------------- TRACING ----------------
+
+class Trace:
+    """Spans of one request."""
+
+    def __init__(self, telemetry, method, path, request_id=None):
+        self.telemetry = telemetry
+        self.method = method
+        self.path = path
+        # A client-supplied id is echoed back and names profile files, so it is checked
+        self.request_id = request_id if request_id and REQUEST_ID_RE.match(request_id) else uuid.uuid4().hex[:16]
+        self.spans = []   # (name, outcome, seconds)
+        self.start = time.perf_counter()
+        self.profiler = None
+        self._token = None
+
+    def add(self, name, outcome, seconds):
+        self.spans.append((name, outcome, seconds))
+        self.telemetry.span_seconds.observe(seconds, span=name, outcome=outcome or "")
+
+    def server_timing(self, total):
+        """Server-Timing header value (durations in ms), shown by browser dev tools."""
+        parts = []
+        for name, outcome, seconds in self.spans:
+            desc = f';desc="{outcome}"' if outcome else ""
+            parts.append(f"{name}{desc};dur={seconds * 1000:.2f}")
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+class SpanHandle:
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+@contextmanager
+def span(name, outcome=None):
+    """
+    Times the enclosed block as a span of the current request (a no-op
+    outside one). Set `.outcome` on the yielded handle to label it, e.g.
+    "hit" or "synth".
+    """
+    trace = _current_trace.get()
+    handle = SpanHandle(outcome)
+    start = time.perf_counter()
+    try:
+        yield handle
+    finally:
+        if trace is not None:
+            trace.add(name, handle.outcome, time.perf_counter() - start)
+
+def current_trace():
+    return _current_trace.get()
+
+def begin_request(telemetry, method, path, headers, profiling=None):
+    """
+    Starts the trace of a request. `headers` is the request's header
+    mapping; `profiling` is (directory, interval seconds) when the
+    per-request profiler may be switched on.
+    """
+    trace = Trace(telemetry, method, path, headers.get("X-Request-ID"))
+    trace._token = _current_trace.set(trace)
+    if profiling and headers.get("X-Profile") == "1":
+        trace.profiler = SamplingProfiler(threading.get_ident(), interval=profiling[1])
+        trace.profiler.profile_dir = profiling[0]
+        trace.profiler.start()
+    return trace
+
+def end_request(trace, endpoint, status):
+    """
+    Records the request's metrics and log line. Returns the headers to add
+    to the response.
+    """
+    total = time.perf_counter() - trace.start
+    endpoint = endpoint or "unmatched"
+    trace.telemetry.requests.inc(endpoint=endpoint, method=trace.method, status=str(status))
+    trace.telemetry.request_seconds.observe(total, endpoint=endpoint)
+
+    headers = {
+        "X-Request-ID": trace.request_id,
+        "Server-Timing": trace.server_timing(total),
+    }
+
+    fields = {
+        "method": trace.method,
+        "path": trace.path,
+        "endpoint": endpoint,
+        "status": status,
+        "duration_ms": round(total * 1000, 2),
+        "spans": [
+            {"name": name, "outcome": outcome, "ms": round(seconds * 1000, 3)}
+            for name, outcome, seconds in trace.spans
+        ],
+    }
+
+    if trace.profiler is not None:
+        path = trace.profiler.stop_and_save(trace.request_id)
+        headers["X-Profile"] = path
+        fields["profile"] = path
+
+    log.info("request", extra=fields)
+    return headers
+
+def clear_request(trace):
+    if trace is not None and trace._token is not None:
+        if trace.profiler is not None:
+            trace.profiler.stop()
+        _current_trace.reset(trace._token)
+        trace._token = None
+
+# ---------------- LOGGING ----------------
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id and any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        trace = _current_trace.get()
+        if trace is not None:
+            entry["request_id"] = trace.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(fmt="json", level="INFO"):
+    """
+    Sends every logger's records to stderr as JSON lines (or plain text).
+    Replaces the handler a previous call installed, so calling it per app
+    is safe.
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if getattr(handler, "_earlymind", False):
+            root.removeHandler(handler)
+
+    handler = logging.StreamHandler()
+    handler._earlymind = True
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(level)
+
+# ---------------- PROFILING ----------------
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every `interval` seconds from a helper
+    thread and counts identical stacks. Output is the "folded" format read
+    by flamegraph.pl and speedscope. Overhead is one stack walk per sample,
+    and only while switched on.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.profile_dir = None
+        self.stacks = StackCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def stop_and_save(self, name):
+        self.stop()
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}.folded")
+        with open(path, "w") as f:
+            f.write(self.folded())
+        return path
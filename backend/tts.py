@@ -0,0 +1,288 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from audio_store import cache_key, normalize_word
+
+log = logging.getLogger(__name__)
+
+# ---------------- ENGINES ----------------
+
+class TTSEngine:
+    """
+    Base class for text-to-speech engines.
+    Subclasses write the spoken form of `text` to `filepath`.
+    """
+    name = "base"
+    extension = "mp3"
+
+    def voice(self, lang="en"):
+        """Identifies the voice used for `lang`; part of the audio cache key."""
+        return lang
+
+    @property
+    def rate(self):
+        return "default"
+
+    def synthesize(self, text, filepath, lang="en"):
+        raise NotImplementedError
+
+
+class GTTSEngine(TTSEngine):
+    """Google TTS (network). Same call the server used inline before."""
+    name = "gtts"
+    extension = "mp3"
+
+    def synthesize(self, text, filepath, lang="en"):
+        from gtts import gTTS
+        tts = gTTS(text=text, lang=lang)
+        tts.save(filepath)
+
+
+class Pyttsx3Engine(TTSEngine):
+    """
+    Offline engine, same settings as src/tts_word_reading.py.
+    pyttsx3 drivers write wav, so files get a .wav extension.
+    """
+    name = "pyttsx3"
+    extension = "wav"
+
+    def __init__(self, rate=150):
+        self._rate = rate
+        # pyttsx3 engines are not thread-safe; serialize the run loop
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def synthesize(self, text, filepath, lang="en"):
+        import pyttsx3
+        with self._lock:
+            engine = pyttsx3.init()
+            engine.setProperty("rate", self._rate)
+            engine.save_to_file(text, filepath)
+            engine.runAndWait()
+            engine.stop()
+
+
+class StubEngine(TTSEngine):
+    """
+    Local stub for offline tests. Writes a single silent MPEG frame
+    after an optional artificial delay.
+    """
+    name = "stub"
+    extension = "mp3"
+
+    # MPEG-1 Layer III, 32 kbps, 44.1 kHz frame header padded with silence
+    SILENT_FRAME = b"\xff\xfb\x10\xc4" + b"\x00" * 100
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def synthesize(self, text, filepath, lang="en"):
+        if self.delay:
+            time.sleep(self.delay)
+        with open(filepath, "wb") as f:
+            f.write(self.SILENT_FRAME)
+
+
+ENGINES = {
+    "gtts": GTTSEngine,
+    "pyttsx3": Pyttsx3Engine,
+    "stub": StubEngine,
+}
+
+
+def get_engine(name):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS engine: {name}")
+    return ENGINES[name]()
+
+
+# ---------------- PIPELINE ----------------
+
+# Idle workers check this often whether the pipeline was shut down
+STOP_POLL_SECONDS = 0.5
+
+class TTSQueueFull(Exception):
+    pass
+
+
+class TTSPipeline:
+    """
+    Background synthesis subsystem.
+
+    - A fixed pool of worker threads consumes a bounded job queue.
+    - Concurrent requests for the same word share one job.
+    - Finished audio is published through the content-addressed AudioStore.
+    - Callers get a Future and decide whether to wait or answer "pending".
+    """
+
+    def __init__(self, store, engine, workers=4, max_queue=256):
+        self.store = store
+        self.engine = engine
+        self._jobs = queue.Queue(maxsize=max_queue)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._counters = {"synthesized": 0, "failed": 0, "dropped": 0, "synth_seconds": 0.0}
+
+        self._workers = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"tts-worker-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def key(self, word, lang="en"):
+        return cache_key(word, self.engine.name, self.engine.voice(lang), self.engine.rate)
+
+    def filename(self, word, lang="en"):
+        return self.store.filename(self.key(word, lang), self.engine.extension)
+
+    def is_ready(self, word, lang="en"):
+        return self.key(word, lang) in self.store
+
+    def submit(self, word, lang="en"):
+        """
+        Schedules synthesis of `word` unless it is already cached.
+        Returns a Future resolving to the filename.
+        """
+        word = normalize_word(word)
+        key = self.key(word, lang)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+
+            future = Future()
+            filename = self.store.lookup(key, self.engine.extension)
+            if filename is not None:
+                future.set_result(filename)
+                return future
+
+            if self._stopped:
+                future.set_exception(TTSQueueFull("TTS pipeline is shut down"))
+                return future
+
+            try:
+                self._jobs.put_nowait((key, word, lang, future))
+            except queue.Full:
+                self._counters["dropped"] += 1
+                future.set_exception(TTSQueueFull(f"TTS queue full, dropped: {word}"))
+                return future
+
+            self._inflight[key] = future
+
+        return future
+
+    def ensure(self, word, lang="en", timeout=0.0):
+        """
+        Submits `word` and waits up to `timeout` seconds.
+        Returns (filename, status) where status is "ready", "pending" or "error".
+        """
+        future = self.submit(word, lang)
+        filename = self.filename(word, lang)
+        try:
+            future.result(timeout=timeout)
+            return filename, "ready"
+        except FutureTimeout:
+            return filename, "pending"
+        except Exception as e:
+            log.warning("Error generating audio for %s: %s", word, e, extra={"word": word})
+            return filename, "error"
+
+    async def ensure_async(self, word, lang="en", timeout=0.0):
+        """
+        ensure() for asyncio handlers: waits without holding a thread.
+        Cancelling the caller (timeout or client disconnect) only stops the
+        wait; the shared synthesis job keeps running for other requests.
+        """
+        import asyncio
+
+        future = self.submit(word, lang)
+        filename = self.filename(word, lang)
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            return filename, "ready"
+        except asyncio.TimeoutError:
+            return filename, "pending"
+        except Exception as e:
+            log.warning("Error generating audio for %s: %s", word, e, extra={"word": word})
+            return filename, "error"
+
+    def status(self, word, lang="en"):
+        key = self.key(word, lang)
+        with self._lock:
+            if key in self._inflight:
+                return "pending"
+        return "ready" if self.store.lookup(key, self.engine.extension) else "missing"
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["pending"] = len(self._inflight)
+        return counters
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self, wait=True, timeout=None):
+        """
+        Stops accepting jobs; optionally waits (up to `timeout` seconds) for
+        queued jobs to drain. Returns the number of jobs still unfinished.
+        Never blocks past `timeout`, even with a full queue.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._stopped = True
+        # Wakes idle workers at once; with a full queue they stop on their
+        # own once it is drained and a poll finds it empty
+        for _ in self._workers:
+            try:
+                self._jobs.put_nowait((None, None, None, None))
+            except queue.Full:
+                break
+        if wait:
+            for t in self._workers:
+                t.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return self.pending_count()
+
+    def _worker(self):
+        while True:
+            try:
+                key, word, lang, future = self._jobs.get(timeout=STOP_POLL_SECONDS)
+            except queue.Empty:
+                if self._stopped:
+                    break
+                continue
+            if key is None:
+                break
+
+            extension = self.engine.extension
+            tmp_path = self.store.temp_path(key, extension)
+            start = time.perf_counter()
+            outcome = "failed"
+            try:
+                self.engine.synthesize(word, tmp_path, lang=lang)
+                filename = self.store.commit(key, extension, tmp_path)
+                elapsed = time.perf_counter() - start
+                log.info("Generated audio for: %s", word,
+                         extra={"word": word, "engine": self.engine.name, "synth_ms": round(elapsed * 1000, 1)})
+                outcome = "synthesized"
+                future.set_result(filename)
+            except Exception as e:
+                log.warning("Synthesis failed for %s: %s", word, e, extra={"word": word})
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                    self._counters[outcome] += 1
+                    self._counters["synth_seconds"] += time.perf_counter() - start
@@ -0,0 +1,9 @@
+"""
+WSGI entry point for production servers:
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from server import create_app
+
+app = create_app()
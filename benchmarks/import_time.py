@@ -0,0 +1,136 @@
+"""
+Cold-start time per entry point.
+
+Each entry point is imported in a fresh interpreter several times; the
+median wall time minus a bare `python -c pass` is the cost we pay when a
+new server worker or CLI starts. `-X importtime` output is parsed to show
+the slowest top-level imports of each.
+
+    python benchmarks/import_time.py --runs 7
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# name -> (code, working directory)
+ENTRY_POINTS = {
+    "backend server": ("import server", ROOT / "backend"),
+    "backend worker (create_app)": ("import wsgi", ROOT / "backend"),
+    "backend async worker": ("import asgi", ROOT / "backend"),
+    "llm_client": ("import llm_client", ROOT),
+    "test1.generator": ("import test1.generator", ROOT),
+    "test2.generator": ("import test2.generator", ROOT),
+    "risk_model": ("import risk_model", ROOT),
+    "risk_model (load active)": ("import risk_model; risk_model.get_model()", ROOT),
+    "risk_model (load pickles)": ("import risk_model; risk_model.RiskModel.load()", ROOT),
+    "bulk_scoring": ("import bulk_scoring", ROOT),
+    "generate_data": ("import generate_data", ROOT),
+    "train_model": ("import train_model", ROOT),
+}
+
+# Heavy optional dependencies that should only load on first use
+HEAVY = ("gtts", "pyttsx3", "pandas", "sklearn", "cv2", "requests", "numpy")
+
+ENV = dict(os.environ, TTS_ENGINE="stub", PYTHONWARNINGS="ignore")
+
+
+def isolate(tmp):
+    """Points every directory the backend writes to at `tmp`, so importing wsgi/asgi leaves the tree clean."""
+    ENV.update({
+        "AUDIO_DIR": os.path.join(tmp, "audio"),
+        "RESPONSE_LOG_DIR": os.path.join(tmp, "responses"),
+        "RESPONSE_ARCHIVE_DIR": os.path.join(tmp, "archive"),
+        "SESSION_DB": os.path.join(tmp, "sessions.db"),
+        "PROFILE_DIR": os.path.join(tmp, "profiles"),
+    })
+
+
+def wall_time(code, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=cwd, env=ENV, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def import_times(code, cwd):
+    """[(depth, cumulative_us, module)] from -X importtime, plus the loaded top-level modules."""
+    probe = code + "; import sys; print(','.join(sorted(m for m in sys.modules if '.' not in m)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=cwd, env=ENV,
+                            capture_output=True, text=True, check=True)
+    loaded = set(result.stdout.strip().splitlines()[-1].split(","))
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, int(cumulative), name.strip()))
+    return rows, loaded
+
+
+def import_profile(code, cwd, startup, top=3):
+    """Slowest imports of an entry point (its own module's direct imports and top-level ones)."""
+    rows, loaded = import_times(code, cwd)
+    entry = set(re.findall(r"import ([\w.]+)", code))
+    slowest = sorted(
+        ((us, mod) for depth, us, mod in rows if depth <= 1 and mod not in entry and mod not in startup),
+        reverse=True
+    )
+    return slowest[:top], [m for m in HEAVY if m in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark per entry point")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", type=Path, default=None, help="also write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        isolate(tmp)
+        run(args)
+
+
+def run(args):
+    baseline = statistics.median(wall_time("pass", ROOT) for _ in range(args.runs))
+    # Modules every interpreter imports at startup (site, .pth hooks)
+    startup = {mod for _, _, mod in import_times("pass", ROOT)[0]}
+    print(f"Interpreter start: {baseline * 1000:.0f} ms (subtracted below)\n")
+    print(f"{'entry point':<28} {'median ms':>10} {'min ms':>8}  heavy modules loaded / slowest imports")
+
+    results = {}
+    for name, (code, cwd) in ENTRY_POINTS.items():
+        try:
+            times = [wall_time(code, cwd) - baseline for _ in range(args.runs)]
+            slowest, heavy = import_profile(code, cwd, startup)
+        except subprocess.CalledProcessError:
+            print(f"{name:<28} {'failed (missing dependency?)':>10}")
+            continue
+        results[name] = {
+            "median_ms": statistics.median(times) * 1000,
+            "min_ms": min(times) * 1000,
+            "heavy_modules": heavy,
+            "slowest_imports": {mod: us / 1000 for us, mod in slowest},
+        }
+        slow = ", ".join(f"{mod} {us / 1000:.0f}ms" for us, mod in slowest)
+        print(f"{name:<28} {results[name]['median_ms']:10.0f} {results[name]['min_ms']:8.0f}  "
+              f"[{', '.join(heavy) or '-'}] {slow}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"runs": args.runs, "interpreter_ms": baseline * 1000, "entry_points": results}, f, indent=2)
+        print(f"\nSaved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
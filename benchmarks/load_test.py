@@ -0,0 +1,148 @@
+"""
+Local load test for the backend.
+
+Each simulated client plays a session: GET /baseline, then alternates
+POST /next-trial and POST /test2/adaptive with a growing response history
+(and a session id, so prefetching is exercised). Latencies are reported
+per endpoint as p50/p95/p99 with overall requests per second.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app     # or: python server.py
+    cd backend && hypercorn --bind 127.0.0.1:5000 asgi:app  # async endpoints
+    python benchmarks/load_test.py --clients 32 --duration 30
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+
+import requests
+
+ENDPOINTS = ("/baseline", "/next-trial", "/test2/adaptive")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    i = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[i]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {e: [] for e in ENDPOINTS}
+        self.errors = {e: 0 for e in ENDPOINTS}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, ok):
+        with self._lock:
+            if ok:
+                self.latencies[endpoint].append(seconds)
+            else:
+                self.errors[endpoint] += 1
+
+
+def client(base_url, deadline, recorder, trials, rng):
+    http = requests.Session()
+
+    def call(endpoint, method, body=None):
+        start = time.perf_counter()
+        try:
+            response = http.request(method, base_url + endpoint, json=body, timeout=30)
+            ok = response.status_code == 200
+            data = response.json() if ok else None
+        except (requests.RequestException, ValueError):
+            ok, data = False, None
+        recorder.record(endpoint, time.perf_counter() - start, ok)
+        return data
+
+    while time.monotonic() < deadline:
+        session_id = uuid.uuid4().hex
+        baseline = call("/baseline", "GET") or []
+        responses_1 = [
+            {"audio": p["audio"], "correct": rng.random() < 0.8, "reaction_time": rng.uniform(0.6, 2.4)}
+            for p in baseline
+        ]
+        responses_2 = []
+
+        for _ in range(trials):
+            if time.monotonic() >= deadline:
+                break
+            data = call("/next-trial", "POST", {"session_id": session_id, "responses": responses_1})
+            if data:
+                responses_1.append({
+                    "audio": data["next_trial"]["audio_word"],
+                    "correct": rng.random() < 0.8,
+                    "reaction_time": rng.uniform(0.6, 2.4)
+                })
+
+            data = call("/test2/adaptive", "POST", {"session_id": session_id, "responses": responses_2})
+            if data:
+                responses_2.append({
+                    "text_word": data["text_word"],
+                    "correct": rng.random() < 0.8,
+                    "reaction_time": rng.uniform(0.6, 2.4)
+                })
+
+
+def run(base_url, clients, duration, trials, seed):
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=client, args=(base_url, deadline, recorder, trials, random.Random(seed + i)))
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    report = {"clients": clients, "duration_s": elapsed, "endpoints": {}}
+    total = 0
+    for endpoint in ENDPOINTS:
+        values = sorted(recorder.latencies[endpoint])
+        total += len(values)
+        report["endpoints"][endpoint] = {
+            "requests": len(values),
+            "errors": recorder.errors[endpoint],
+            "rps": len(values) / elapsed,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    report["total_rps"] = total / elapsed
+    return report
+
+
+def print_report(report):
+    print(f"{report['clients']} clients, {report['duration_s']:.1f}s\n")
+    print(f"{'endpoint':<16} {'requests':>8} {'errors':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, r in report["endpoints"].items():
+        print(f"{endpoint:<16} {r['requests']:8d} {r['errors']:6d} {r['rps']:8.1f} "
+              f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f}")
+    print(f"\nTotal: {report['total_rps']:.1f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend load test")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--trials", type=int, default=10, help="adaptive trials per session")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args.url.rstrip("/"), args.clients, args.duration, args.trials, args.seed)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
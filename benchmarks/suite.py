@@ -0,0 +1,447 @@
+"""
+Reproducible benchmark suite for the adaptive testing engine.
+
+Every benchmark runs in-process with fixed seeds and no network: the LLM
+is a local stub Ollama server, TTS uses the stub engine and audio goes to
+a temporary directory. Results are written to JSON together with the
+commit they were measured on, and --compare prints the change against an
+earlier run:
+
+    python benchmarks/suite.py --json bench/HEAD.json
+    python benchmarks/suite.py --quick --only analyze,model
+    python benchmarks/suite.py --json bench/new.json --compare bench/HEAD.json
+
+Timings are the median (and min) over --repeat runs of a loop, after one
+warm-up call. Only compare runs made on the same machine.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "backend"), str(ROOT / "src")]
+
+SEED = 42
+
+
+def measure(fn, number, repeat):
+    """Median and min seconds per call of `fn` over `repeat` loops of `number` calls."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {"median_us": statistics.median(times) * 1e6, "min_us": min(times) * 1e6, "number": number}
+
+
+def percentile(sorted_values, q):
+    i = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[i]
+
+
+# ---------------- STUB LLM ----------------
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Answers /api/generate instantly with the next word of a fixed cycle."""
+
+    protocol_version = "HTTP/1.1"   # keep-alive, like Ollama
+    # Headers and body are separate writes; without this, delayed ACKs add ~40 ms per call
+    disable_nagle_algorithm = True
+    words = ("bat", "dig", "pod", "bud", "nap", "dot", "bin", "pat")
+    counter = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            word = self.words[StubOllama.counter % len(self.words)]
+            StubOllama.counter += 1
+        body = json.dumps({"response": word}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_llm():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---------------- INPUTS ----------------
+
+def history_1(rng, n):
+    from test1.logic import PHONEME_CLASS_WORDS
+
+    words = sorted(PHONEME_CLASS_WORDS["b/d"]) + ["cat", "pen", "map", "sun"]
+    return [
+        {"audio": rng.choice(words), "correct": rng.random() < 0.75, "reaction_time": round(rng.uniform(0.4, 3.0), 2)}
+        for _ in range(n)
+    ]
+
+
+def history_2(rng, n):
+    words = ("bear", "pear", "deal", "real", "fan", "van", "quip", "bold")
+    return [
+        {"text_word": rng.choice(words), "correct": rng.random() < 0.75, "reaction_time": round(rng.uniform(0.4, 3.0), 2)}
+        for _ in range(n)
+    ]
+
+
+# ---------------- BENCHMARKS ----------------
+# Each takes (scale, repeat) and returns {case: result}; scale is 1 for a
+# full run and smaller with --quick.
+
+def bench_analyze(scale, repeat):
+    """analyze_responses over whole histories, and one incremental update (session API)."""
+    from test1.logic import IncrementalAnalyzer, analyze_responses
+    from test2.logic import IncrementalAnalyzer as IncrementalAnalyzer_2
+    from test2.logic import analyze_responses as analyze_responses_2
+
+    rng = random.Random(SEED)
+    results = {}
+    for test, analyze, make, analyzer_cls in (
+        ("test1", analyze_responses, history_1, IncrementalAnalyzer),
+        ("test2", analyze_responses_2, history_2, IncrementalAnalyzer_2),
+    ):
+        for n in (10, 100, 1000):
+            responses = make(rng, n)
+            results[f"{test} history={n}"] = measure(lambda: analyze(responses), max(1, int(20000 * scale) // n), repeat)
+
+        state = analyzer_cls()
+        for r in make(rng, 20):
+            state.add(r)
+        response = make(rng, 1)[0]
+        results[f"{test} update"] = measure(lambda: state.copy().update(response), int(5000 * scale), repeat)
+    return results
+
+
+def bench_generate(scale, repeat):
+    """Next-pair generation: test1 from the pair index, test2 through the LLM client (stub server)."""
+    import test1.generator as generator_1
+    from test2.generator import generate_pair as generate_pair_2
+
+    # Enrichment grows the index from a background thread; off, so runs are repeatable
+    generator_1.LLM_ENRICHMENT = False
+    random.seed(SEED)
+    hints = {"target_phonemes": ["b", "d"], "task_length": "normal", "difficulty": "normal"}
+    exclude = ["bed", "dog", "cat", "pen", "bad"]
+
+    results = {
+        "test1 index": measure(lambda: generator_1.generate_pair(hints, exclude_words=exclude), int(5000 * scale), repeat),
+        "test2 llm stub": measure(lambda: generate_pair_2(hints, exclude_words=exclude), int(500 * scale), repeat),
+    }
+    generator_1.LLM_ENRICHMENT = True
+    return results
+
+
+def bench_audio_cache(scale, repeat):
+    """Hot-path audio cache operations against an index of 2000 files."""
+    from audio_store import AudioStore, cache_key
+    from tts import TTSPipeline, get_engine
+
+    rng = random.Random(SEED)
+    with tempfile.TemporaryDirectory() as root:
+        store = AudioStore(root)
+        pipeline = TTSPipeline(store, get_engine("stub"), workers=1)
+        words = [f"w{i:04d}" for i in range(2000)]
+        for word in words:
+            pipeline.submit(word).result()
+        sample = [rng.choice(words) for _ in range(64)]
+        keys = [pipeline.key(w) for w in sample]
+        ext = pipeline.engine.extension
+        number = int(20000 * scale)
+
+        def cycle(fn, items):
+            it = iter(())
+
+            def call():
+                nonlocal it
+                try:
+                    fn(next(it))
+                except StopIteration:
+                    it = iter(items)
+                    fn(next(it))
+            return call
+
+        results = {
+            "cache_key": measure(cycle(lambda w: cache_key(w, "stub", "en", 150), sample), number, repeat),
+            "lookup hit": measure(cycle(lambda k: store.lookup(k, ext), keys), number, repeat),
+            "lookup miss": measure(cycle(lambda k: store.lookup(k[::-1], ext), keys), number, repeat),
+            "is_ready": measure(cycle(pipeline.is_ready, sample), number, repeat),
+            "ensure cached": measure(cycle(pipeline.ensure, sample), number, repeat),
+        }
+        pipeline.shutdown()
+    return results
+
+
+def bench_model(scale, repeat):
+    """RiskModel inference per row, from single feature dicts up to 1e6-row batches."""
+    import numpy as np
+
+    from generate_data import COLUMNS
+    from risk_model import RiskModel
+
+    rng = np.random.default_rng(SEED)
+    model = RiskModel(rng.normal(0, 0.01, len(COLUMNS)), -0.5, COLUMNS)
+    row = dict(zip(COLUMNS, np.abs(rng.normal(800, 300, len(COLUMNS))).tolist()))
+
+    results = {"score dict": measure(lambda: model.score(row), int(10000 * scale), repeat)}
+    max_rows = 10 ** 6 if scale >= 1 else 10 ** 5
+    batch = 1
+    while batch <= max_rows:
+        X = np.abs(rng.normal(800, 300, (batch, len(COLUMNS))))
+        number = max(1, int(10 ** 5 * scale) // batch)
+        result = measure(lambda: model.predict_proba(X), number, repeat)
+        result["ns_per_row"] = result["median_us"] * 1000 / batch
+        results[f"batch={batch}"] = result
+        batch *= 10
+    return results
+
+
+def bench_data_generation(scale, repeat):
+    """Synthetic training data: rows generated per second (one process)."""
+    from generate_data import generate_chunks
+
+    n_rows = int(500_000 * scale)
+    result = measure(lambda: sum(len(c) for c in generate_chunks(n_rows, seed=SEED)), 1, repeat)
+    result["rows"] = n_rows
+    result["rows_per_s"] = n_rows / (result["median_us"] / 1e6)
+    return {f"rows={n_rows}": result}
+
+
+def handwriting_page(rng, lines=12, words=10):
+    """A synthetic ruled page of blob 'letters' (BGR, 1400 x 1000)."""
+    import cv2
+    import numpy as np
+
+    page = np.full((1400, 1000, 3), 245, np.uint8)
+    for line in range(lines):
+        baseline = 120 + line * 100
+        cv2.line(page, (0, baseline + 4), (999, baseline + 4), (200, 180, 160), 1)
+        x = 40
+        for _ in range(words):
+            for _ in range(int(rng.integers(2, 7))):
+                h = int(rng.integers(14, 26))
+                cv2.ellipse(page, (x, baseline - h // 2), (5, h // 2), 0, 0, 360, (30, 30, 30), 2)
+                x += 14
+            x += int(rng.integers(20, 45))
+            if x > 940:
+                break
+    return page
+
+
+def bench_dysgraphia(scale, repeat):
+    """Dysgraphia screening stages (no OCR) on a synthetic page and on a dense speckled one."""
+    import cv2
+    import numpy as np
+
+    from dysgraphia.screening import group_lines, letter_components, preprocess, screen_image, word_boxes
+
+    rng = np.random.default_rng(SEED)
+    page = handwriting_page(rng)
+    dense = np.full((1400, 1000), 255, np.uint8)
+    for x, y, r in zip(rng.integers(10, 990, 30000), rng.integers(10, 1390, 30000), rng.integers(1, 4, 30000)):
+        cv2.circle(dense, (int(x), int(y)), int(r), 0, -1)
+
+    number = max(1, int(20 * scale))
+    results = {}
+    for name, image in (("page", page), ("dense", dense)):
+        _, thresh = preprocess(image)
+        heights, areas = letter_components(thresh)
+        median_h, median_area = float(np.median(heights)), float(np.median(areas))
+        boxes = word_boxes(thresh, median_h, median_area)
+        results[f"{name} letter_components"] = measure(lambda: letter_components(thresh), number, repeat)
+        results[f"{name} group_lines"] = measure(lambda: group_lines(boxes, median_h), number * 10, repeat)
+        results[f"{name} screen_image"] = measure(lambda: screen_image(image, ocr=False), number, repeat)
+    return results
+
+
+def bench_http_sessions(scale, repeat):
+    """
+    Full sessions through the Flask test client: GET /baseline, adaptive
+    /next-trial calls, GET /test2/baseline and /test2/adaptive calls, with
+    a session id so prefetching and the response log are exercised.
+    """
+    from server import create_app, shutdown_app
+
+    trials = 8
+    n_sessions = max(2, int(40 * scale))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            "TTS_ENGINE": "stub",
+            "AUDIO_DIR": os.path.join(tmp, "audio"),
+            "RESPONSE_LOG_DIR": os.path.join(tmp, "responses"),
+            "RESPONSE_ARCHIVE_DIR": "",
+            "SESSION_STORE": "memory",
+            "LOG_LEVEL": "ERROR",
+        })
+        client = app.test_client()
+        services = app.extensions["earlymind"]
+        # Baseline audio synthesized, so /baseline serves the precomputed bundle
+        for word in services.baseline.words:
+            services.tts.submit(word).result()
+
+        latencies = {}
+
+        def call(endpoint, method, body=None):
+            start = time.perf_counter()
+            response = client.open(endpoint, method=method, json=body)
+            latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+            assert response.status_code == 200, (endpoint, response.status_code)
+            return response.get_json()
+
+        def session(i):
+            rng = random.Random(SEED + i)
+            sid = f"bench-{i}"
+            history = [
+                {"audio": p["audio"], "correct": rng.random() < 0.8, "reaction_time": round(rng.uniform(0.6, 2.4), 2)}
+                for p in call("/baseline", "GET")
+            ]
+            for _ in range(trials):
+                trial = call("/next-trial", "POST", {"session_id": sid, "responses": history})["next_trial"]
+                history.append({"audio": trial["audio_word"], "correct": rng.random() < 0.8,
+                                "reaction_time": round(rng.uniform(0.6, 2.4), 2)})
+
+            history = [
+                {"text_word": p["text_word"], "correct": rng.random() < 0.8, "reaction_time": round(rng.uniform(0.6, 2.4), 2)}
+                for p in call("/test2/baseline", "GET")
+            ]
+            for _ in range(trials):
+                trial = call("/test2/adaptive", "POST", {"session_id": sid, "responses": history})
+                history.append({"text_word": trial["text_word"], "correct": rng.random() < 0.8,
+                                "reaction_time": round(rng.uniform(0.6, 2.4), 2)})
+
+        counter = iter(range(10 ** 9))
+        results["session"] = measure(lambda: session(next(counter)), n_sessions, repeat)
+        for endpoint, values in latencies.items():
+            values.sort()
+            results[endpoint] = {
+                "median_us": percentile(values, 50) * 1e6,
+                "p95_us": percentile(values, 95) * 1e6,
+                "number": len(values),
+            }
+        shutdown_app(app, timeout=5)
+    return results
+
+
+BENCHMARKS = {
+    "analyze": bench_analyze,
+    "generate": bench_generate,
+    "audio_cache": bench_audio_cache,
+    "model": bench_model,
+    "data_generation": bench_data_generation,
+    "http_sessions": bench_http_sessions,
+    "dysgraphia": bench_dysgraphia,
+}
+
+
+# ---------------- REPORT ----------------
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(name, results, previous=None, threshold=1.2):
+    """Prints one benchmark's cases; returns the cases slower than `threshold` x the previous run."""
+    regressions = []
+    print(f"\n{name}")
+    for case, r in results.items():
+        line = f"  {case:<28} {r['median_us']:12.2f} us"
+        if "ns_per_row" in r:
+            line += f"  {r['ns_per_row']:10.2f} ns/row"
+        if "rows_per_s" in r:
+            line += f"  {r['rows_per_s']:12.0f} rows/s"
+        if "p95_us" in r:
+            line += f"  p95 {r['p95_us']:10.2f} us"
+        old = (previous or {}).get(case)
+        if old:
+            ratio = r["median_us"] / old["median_us"]
+            line += f"  {ratio:5.2f}x"
+            if ratio > threshold:
+                line += "  SLOWER"
+                regressions.append(f"{name}/{case}")
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite for the adaptive testing engine")
+    parser.add_argument("--only", default=None, help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs (about a tenth of the work)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", type=Path, default=None, help="write results to this file")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="with --compare, exit 1 if a median is this many times slower")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    # Fallback warnings would drown the report
+    logging.basicConfig(level=logging.ERROR)
+    # Before anything imports llm_client, which reads OLLAMA_URL once
+    llm = start_stub_llm()
+    os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{llm.server_address[1]}/api/generate"
+    os.environ.setdefault("TTS_ENGINE", "stub")
+
+    previous = json.loads(args.compare.read_text())["benchmarks"] if args.compare else {}
+    scale = 0.1 if args.quick else 1.0
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": SEED,
+        "quick": args.quick,
+        "repeat": args.repeat,
+        "benchmarks": {},
+    }
+    regressions = []
+    for name in names:
+        start = time.perf_counter()
+        results = BENCHMARKS[name](scale, args.repeat)
+        report["benchmarks"][name] = results
+        regressions += print_results(name, results, previous.get(name), args.threshold)
+        print(f"  ({time.perf_counter() - start:.1f}s)")
+
+    llm.shutdown()
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(report, indent=2))
+        print(f"\nSaved to {args.json}")
+    if regressions:
+        print(f"\n{len(regressions)} regressions (> {args.threshold}x): {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from test1 import logic as logic1
+from test2 import logic as logic2
+
+LOGIC = {"test1": logic1, "test2": logic2}
+
+RISKS = ("phonological", "fluency", "attention")
+
+# Sessions whose statistics sit this close to a threshold or to a 2-decimal
+# rounding tie are recomputed exactly, so results match analyze_responses.
+THRESHOLD_TOL = 1e-9
+ROUNDING_TOL = 1e-6
+
+# ---------------- LABEL / HINT TABLES ----------------
+# Assessments and prompt hints only take a few values, so they are
+# returned as small integer codes into these tables.
+
+TEST1_ISSUES = ("phonological (b/d risk)", "reading fluency risk", "attention instability")
+TEST1_LABELS = (
+    ["no significant issue detected"]
+    + [f"suspected {issue}" for issue in TEST1_ISSUES]
+    + ["multiple suspected issues detected"]
+)
+
+def test1_hints(code):
+    # bit 0: phonological, bit 1: attention, bit 2: fluency
+    return {
+        "target_phonemes": ["b", "d"] if code & 1 else [],
+        "task_length": "short" if code & 2 else "normal",
+        "difficulty": "easy" if code & 4 else "normal"
+    }
+
+TEST2_LABELS = ["no significant issue detected"] + [f"suspected {r}" for r in RISKS]
+
+def test2_hints(code):
+    # 0: no primary risk, 1..3: index into RISKS + 1
+    hints = {"target_phonemes": [], "difficulty": "normal"}
+    if code == 1:
+        hints["target_phonemes"] = ["b", "d", "p", "q"]
+    elif code == 2:
+        hints["difficulty"] = "hard"
+    elif code == 3:
+        hints["difficulty"] = "variable"
+    return hints
+
+LABELS = {"test1": TEST1_LABELS, "test2": TEST2_LABELS}
+HINTS = {"test1": test1_hints, "test2": test2_hints}
+
+# ---------------- AGGREGATION ----------------
+
+def _near(values, targets, tol):
+    mask = np.zeros(len(values), dtype=bool)
+    for t in targets:
+        mask |= np.abs(values - t) <= tol * max(1.0, abs(t))
+    return mask
+
+def _near_rounding_tie(values):
+    scaled = values * 100
+    return np.abs(scaled - np.floor(scaled) - 0.5) <= ROUNDING_TOL
+
+def aggregate(session_id, audio, correct, reaction_time, test="test1"):
+    """
+    Grouped reductions over a columnar archive (one row per response).
+    Returns per-session n, accuracy, mean / population variance of reaction
+    time and phoneme errors, plus the session index of every row.
+    """
+    logic = LOGIC[test]
+    session_id = np.asarray(session_id)
+    correct = np.asarray(correct, dtype=bool)
+    rt = np.asarray(reaction_time, dtype=np.float64)
+
+    sessions, inverse = np.unique(session_id, return_inverse=True)
+    g = len(sessions)
+
+    n = np.bincount(inverse, minlength=g)
+    n_correct = np.bincount(inverse, weights=correct, minlength=g)
+    mean = np.bincount(inverse, weights=rt, minlength=g) / n
+    # Two-pass variance: sum of squared deviations from the group mean
+    dev = rt - mean[inverse]
+    var = np.bincount(inverse, weights=dev * dev, minlength=g) / n
+
+    if test == "test1":
+        words = list(logic.PHONEME_CLASS_WORDS["b/d"])
+        is_phoneme_error = ~correct & np.isin(np.asarray(audio), words)
+        phoneme_errors = np.bincount(inverse, weights=is_phoneme_error, minlength=g)
+    else:
+        phoneme_errors = n - n_correct
+
+    return {
+        "session_id": sessions,
+        "inverse": inverse,
+        "n": n,
+        "accuracy": n_correct / n,
+        "mean": mean,
+        "var": var,
+        "phoneme_errors": phoneme_errors,
+    }
+
+def _flag_inexact(agg, test):
+    """Sessions whose float statistics could round or compare differently."""
+    logic = LOGIC[test]
+    if test == "test1":
+        rt_cuts = (logic.SLOW_RT, logic.VERY_SLOW_RT)
+        var_cuts = (logic.HIGH_VAR_RT, logic.VERY_HIGH_VAR_RT)
+    else:
+        rt_cuts = (logic.SLOW_RT, logic.VERY_SLOW_RT)
+        var_cuts = (logic.HIGH_VAR_RT,)
+
+    return (
+        _near(agg["mean"], rt_cuts, THRESHOLD_TOL)
+        | _near(agg["var"], var_cuts, THRESHOLD_TOL)
+        | _near_rounding_tie(agg["mean"])
+        | _near_rounding_tie(agg["var"])
+        | _near_rounding_tie(agg["accuracy"])
+    )
+
+def _exact_mean_pvariance(values):
+    """
+    Correctly rounded mean and population variance of a list of floats,
+    the same values statistics.mean / pvariance and IncrementalAnalyzer give.
+    Float denominators are powers of two, so the largest one is common.
+    """
+    ratios = [v.as_integer_ratio() for v in values]
+    den = max(d for _, d in ratios)
+    nums = [num * (den // d) for num, d in ratios]
+    n = len(nums)
+    s = sum(nums)
+    sq = sum(x * x for x in nums)
+    # int / int true division is correctly rounded
+    return s / (n * den), (n * sq - s * s) / (n * n * den * den)
+
+def _recompute_exact(agg, flagged, reaction_time):
+    """Replaces the float mean / variance of the flagged sessions with exact values."""
+    if not len(flagged):
+        return
+    rt = np.asarray(reaction_time, dtype=np.float64)
+    order = np.argsort(agg["inverse"], kind="stable")
+    starts = np.cumsum(agg["n"]) - agg["n"]
+
+    for g in flagged:
+        values = rt[order[starts[g]:starts[g] + agg["n"][g]]].tolist()
+        agg["mean"][g], agg["var"][g] = _exact_mean_pvariance(values)
+
+# ---------------- SCORING ----------------
+
+def _score_test1(acc, mean, var, pe):
+    logic = logic1
+    phon = np.zeros(len(acc))
+    phon += np.where(pe >= logic.PHONEME_ERRORS_MIN, 0.5, 0.0)
+    phon += np.where(acc < logic.LOW_ACCURACY, 0.3, 0.0)
+
+    flu = np.zeros(len(acc))
+    flu += np.where(mean > logic.SLOW_RT, 0.4, 0.0)
+    flu += np.where((acc >= logic.HIGH_ACCURACY) & (mean > logic.VERY_SLOW_RT), 0.3, 0.0)
+
+    att = np.zeros(len(acc))
+    att += np.where(var > logic.HIGH_VAR_RT, 0.5, 0.0)
+    att += np.where(var > logic.VERY_HIGH_VAR_RT, 0.2, 0.0)
+
+    suspect = np.stack([phon, flu, att], axis=1) >= logic.SUSPECT_THRESHOLD
+    n_issues = suspect.sum(axis=1)
+    max_risk = np.maximum(np.maximum(phon, flu), att)
+
+    label = np.full(len(acc), len(TEST1_LABELS) - 1)   # multiple
+    single = n_issues == 1
+    label[single] = 1 + np.argmax(suspect[single], axis=1)
+    label[max_risk < logic.LOW_RISK_THRESHOLD] = 0
+
+    hints = (phon >= 0.5) * 1 + (att >= 0.5) * 2 + (flu >= 0.5) * 4
+    return phon, flu, att, label, hints
+
+def _score_test2(acc, mean, var, pe):
+    logic = logic2
+    phon = np.where(pe >= 1, 0.5 * pe, 0.0)
+
+    flu = np.zeros(len(acc))
+    flu += np.where(mean > logic.SLOW_RT, 0.4, 0.0)
+    flu += np.where((acc >= logic.HIGH_ACCURACY) & (mean > logic.VERY_SLOW_RT), 0.3, 0.0)
+
+    att = np.where(var > logic.HIGH_VAR_RT, 0.5, 0.0)
+
+    phon, flu, att = (np.minimum(s, 1.0) for s in (phon, flu, att))
+
+    stacked = np.stack([phon, flu, att], axis=1)
+    max_risk = stacked.max(axis=1)
+    # argmax picks the first maximum, like max(scores, key=scores.get)
+    primary = np.where(max_risk > 0, 1 + np.argmax(stacked, axis=1), 0)
+
+    label = np.where(max_risk < logic.LOW_RISK_THRESHOLD, 0, primary)
+    return phon, flu, att, label, primary
+
+def score_sessions(session_id, audio, correct, reaction_time, test="test1"):
+    """
+    Scores every session in a columnar archive at once.
+
+    Columns are parallel arrays with one entry per response. Returns a dict
+    of per-session arrays; `to_records` turns it into analyze_responses dicts.
+    """
+    agg = aggregate(session_id, audio, correct, reaction_time, test)
+
+    flagged = np.flatnonzero(_flag_inexact(agg, test))
+    _recompute_exact(agg, flagged, reaction_time)
+
+    acc, mean, var, pe = agg["accuracy"], agg["mean"], agg["var"], agg["phoneme_errors"]
+    scorer = _score_test1 if test == "test1" else _score_test2
+    phon, flu, att, label, hints = scorer(acc, mean, var, pe)
+
+    rounded = {name: np.round(v, 2) for name, v in (("accuracy", acc), ("avg_rt", mean), ("var_rt", var))}
+    # np.round and round() can disagree only at ties; those sessions use round()
+    for g in flagged:
+        rounded["accuracy"][g] = round(float(acc[g]), 2)
+        rounded["avg_rt"][g] = round(float(mean[g]), 2)
+        rounded["var_rt"][g] = round(float(var[g]), 2)
+
+    return {
+        "session_id": agg["session_id"],
+        "n": agg["n"],
+        "accuracy": rounded["accuracy"],
+        "avg_rt": rounded["avg_rt"],
+        "var_rt": rounded["var_rt"],
+        "phoneme_errors": pe.astype(np.int64),
+        "phonological": phon,
+        "fluency": flu,
+        "attention": att,
+        "assessment_code": label,
+        "assessment": np.asarray(LABELS[test], dtype=object)[label],
+        "hints_code": hints,
+        "exact_recomputed": len(flagged),
+    }
+
+def to_records(result, test="test1"):
+    """Per-session dicts in the same shape as analyze_responses."""
+    hints_for = HINTS[test]
+    records = {}
+    for g, sid in enumerate(result["session_id"]):
+        records[sid] = {
+            "accuracy": float(result["accuracy"][g]),
+            "avg_rt": float(result["avg_rt"][g]),
+            "var_rt": float(result["var_rt"][g]),
+            "risk_scores": {
+                "phonological": float(result["phonological"][g]),
+                "fluency": float(result["fluency"][g]),
+                "attention": float(result["attention"][g])
+            },
+            "assessment": result["assessment"][g],
+            "prompt_hints": hints_for(int(result["hints_code"][g]))
+        }
+    return records
+
+# ---------------- CLI ----------------
+
+def load_columns(path, test="test1"):
+    """
+    Reads a CSV or Parquet archive with session_id, audio/text_word, correct,
+    reaction_time, or the server's response log archive (a directory of
+    date=YYYY-MM-DD Parquet partitions, see backend/response_log.py).
+    """
+    import pandas as pd
+    if Path(path).is_dir():
+        return load_response_log(path, test)
+    df = pd.read_parquet(path) if str(path).endswith(".parquet") else pd.read_csv(path)
+    word_col = "audio" if "audio" in df.columns else "text_word"
+    return df["session_id"].to_numpy(), df[word_col].to_numpy(), df["correct"].to_numpy(), df["reaction_time"].to_numpy()
+
+def load_response_log(path, test="test1"):
+    """Columns of one test from the response log archive; each trial counts once per session."""
+    import pandas as pd
+    df = pd.read_parquet(
+        path,
+        columns=["ts", "session_id", "test", "trial", "word", "correct", "reaction_time"],
+        filters=[("test", "==", test)]
+    )
+    # Rows without a session can't be grouped; a retried request logs its trial twice
+    df = df.dropna(subset=["session_id", "reaction_time"])
+    df = df.sort_values("ts", kind="stable").drop_duplicates(["session_id", "trial"])
+    return df["session_id"].to_numpy(), df["word"].to_numpy(), df["correct"].to_numpy(), df["reaction_time"].to_numpy()
+
+def synthetic_archive(n_sessions, trials, seed=42):
+    """Random archive for benchmarking: `trials` responses per session."""
+    rng = np.random.default_rng(seed)
+    words = np.array(["bed", "bad", "dad", "dog", "cat", "pen", "bug", "map"])
+    n = n_sessions * trials
+    session_id = np.repeat(np.arange(n_sessions), trials)
+    audio = words[rng.integers(0, len(words), n)]
+    correct = rng.random(n) < 0.75
+    # Reaction times rounded to 2 decimals, like the clients send them
+    reaction_time = np.round(rng.uniform(0.4, 3.0, n), 2)
+    return session_id, audio, correct, reaction_time
+
+def benchmark(n_sessions, trials, test):
+    columns = synthetic_archive(n_sessions, trials)
+    session_id, audio, correct, reaction_time = columns
+    word_field = "audio" if test == "test1" else "text_word"
+
+    # Per-session lists, built outside the timed region
+    sessions = {}
+    for sid, w, c, rt in zip(session_id.tolist(), audio.tolist(), correct.tolist(), reaction_time.tolist()):
+        sessions.setdefault(sid, []).append({word_field: w, "correct": c, "reaction_time": rt})
+
+    analyze = LOGIC[test].analyze_responses
+    start = time.perf_counter()
+    expected = {sid: analyze(rs) for sid, rs in sessions.items()}
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = score_sessions(*columns, test=test)
+    vector_time = time.perf_counter() - start
+
+    records = to_records(result, test)
+    mismatches = [sid for sid, exp in expected.items() if records[sid] != exp]
+
+    print(f"{test}: {n_sessions} sessions x {trials} trials")
+    print(f"  per-session loop: {loop_time:.3f}s")
+    print(f"  vectorized:       {vector_time:.3f}s ({loop_time / vector_time:.1f}x)")
+    print(f"  recomputed exactly: {result['exact_recomputed']} sessions")
+    print(f"  parity: {'OK' if not mismatches else f'{len(mismatches)} MISMATCHES'}")
+    return not mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk re-scoring of archived sessions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    score = sub.add_parser("score", help="Score an archive (CSV or Parquet)")
+    score.add_argument("archive")
+    score.add_argument("--test", choices=LOGIC, default="test1")
+    score.add_argument("--out", default="data/session_scores.csv")
+
+    bench = sub.add_parser("benchmark", help="Compare against per-session analyze_responses and check parity")
+    bench.add_argument("--sessions", type=int, default=100000)
+    bench.add_argument("--trials", type=int, default=10)
+    bench.add_argument("--test", choices=LOGIC, default=None)
+
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        tests = [args.test] if args.test else list(LOGIC)
+        ok = all([benchmark(args.sessions, args.trials, t) for t in tests])
+        raise SystemExit(0 if ok else 1)
+
+    import pandas as pd
+    result = score_sessions(*load_columns(args.archive, args.test), test=args.test)
+    hints_for = HINTS[args.test]
+    out = pd.DataFrame({
+        "session_id": result["session_id"],
+        "n": result["n"],
+        "accuracy": result["accuracy"],
+        "avg_rt": result["avg_rt"],
+        "var_rt": result["var_rt"],
+        "phoneme_errors": result["phoneme_errors"],
+        "phonological": result["phonological"],
+        "fluency": result["fluency"],
+        "attention": result["attention"],
+        "assessment": result["assessment"],
+        "prompt_hints": [hints_for(int(c)) for c in result["hints_code"]],
+    })
+    out.to_csv(args.out, index=False)
+    print(f"✓ Scored {len(out)} sessions -> {args.out}")
+
+if __name__ == "__main__":
+    main()
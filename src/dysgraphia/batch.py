@@ -0,0 +1,205 @@
+"""
+Batch dysgraphia screening over folders of handwriting scans.
+
+    earlymind-dysgraphia-batch scans/ --out results.csv --workers 8
+    earlymind-dysgraphia-batch manifest.txt --out results.jsonl --resume
+
+The input is a directory (searched recursively for images) or a manifest:
+a .txt file with one path per line, or a .csv with a `path` column.
+Relative manifest paths are relative to the manifest. Images are screened
+in a process pool and every result is appended to the output (CSV or
+JSONL, by extension) as soon as it is ready. With --resume, images already
+in the output are skipped, so a crashed run continues where it stopped
+(with --retry-errors failed images are screened again; their new row is
+appended after the old one).
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff"}
+
+FIELDS = [
+    "path", "status", "spacing_cv", "size_cv", "ocr_score", "ocr_status", "total_risk_score", "verdict",
+    "median_letter_height", "letters", "lines", "words", "seconds", "error",
+]
+
+
+# ---------------- INPUTS ----------------
+
+def find_images(directory):
+    """Image files under `directory`, in a stable order."""
+    return sorted(
+        str(p) for p in Path(directory).rglob("*")
+        if p.suffix.lower() in IMAGE_EXTENSIONS and p.is_file()
+    )
+
+def read_manifest(path):
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="") as f:
+            entries = [row["path"] for row in csv.DictReader(f) if row.get("path")]
+    else:
+        with open(path) as f:
+            entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [str(p if Path(p).is_absolute() else path.parent / p) for p in entries]
+
+def list_inputs(source):
+    return find_images(source) if Path(source).is_dir() else read_manifest(source)
+
+
+# ---------------- WORKER ----------------
+
+def _init_worker(ocr=True):
+    import cv2
+
+    from dysgraphia.screening import warm_ocr
+    # One OpenCV thread per process; the pool already uses every core
+    cv2.setNumThreads(1)
+    if ocr:
+        # The worker's Tesseract instance lives as long as the worker
+        warm_ocr()
+
+def screen_file(path, ocr=True):
+    """One output row for an image file. Never raises, so one bad scan can't stop a batch."""
+    import cv2
+
+    from dysgraphia.screening import NoTextFound, screen_image
+
+    row = {"path": path}
+    start = time.perf_counter()
+    try:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            row.update(status="unreadable", error="Could not read image")
+        else:
+            metrics = screen_image(image, ocr=ocr)
+            row.update({k: metrics[k] for k in FIELDS if k in metrics})
+            row.update(status="ok", words=len(metrics["word_boxes"]))
+    except NoTextFound as e:
+        row.update(status="no_text", error=str(e))
+    except Exception as e:
+        row.update(status="error", error=f"{type(e).__name__}: {e}")
+    row["seconds"] = round(time.perf_counter() - start, 4)
+    return row
+
+
+# ---------------- OUTPUT ----------------
+
+def _truncate_torn_line(path):
+    """Drops a partial last line left by a crash mid-write."""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+def done_paths(out, retry_errors=False):
+    """Paths already in the output (only successful ones with retry_errors)."""
+    if not out.exists() or out.stat().st_size == 0:
+        return set()
+    _truncate_torn_line(out)
+    with open(out, newline="") as f:
+        if out.suffix == ".jsonl":
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        return {r["path"] for r in rows if not retry_errors or r["status"] == "ok"}
+
+class ResultWriter:
+    """Appends rows to a CSV or JSONL file, flushed per row."""
+
+    def __init__(self, out):
+        self.jsonl = out.suffix == ".jsonl"
+        new = not out.exists() or out.stat().st_size == 0
+        out.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(out, "a", newline="")
+        if not self.jsonl:
+            self.csv = csv.DictWriter(self.file, fieldnames=FIELDS)
+            if new:
+                self.csv.writeheader()
+
+    def write(self, row):
+        if self.jsonl:
+            self.file.write(json.dumps({k: row.get(k) for k in FIELDS}) + "\n")
+        else:
+            self.csv.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+# ---------------- RUN ----------------
+
+def run(paths, out, workers=1, ocr=True, progress_every=100):
+    """Screens `paths` into `out`. Returns {status: count}."""
+    writer = ResultWriter(out)
+    counts = {}
+    start = time.perf_counter()
+
+    def record(row, done):
+        writer.write(row)
+        counts[row["status"]] = counts.get(row["status"], 0) + 1
+        if progress_every and done % progress_every == 0:
+            rate = done / (time.perf_counter() - start)
+            print(f"{done}/{len(paths)} images ({rate:.1f}/s)", file=sys.stderr)
+
+    try:
+        if workers <= 1:
+            _init_worker(ocr)
+            for i, path in enumerate(paths, 1):
+                record(screen_file(path, ocr), i)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ocr,)) as pool:
+                # A few images per worker in flight: results stream out, memory stays bounded
+                window = 4 * workers
+                pending = set()
+                next_i = done = 0
+                while next_i < len(paths) or pending:
+                    while next_i < len(paths) and len(pending) < window:
+                        pending.add(pool.submit(screen_file, paths[next_i], ocr))
+                        next_i += 1
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done += 1
+                        record(future.result(), done)
+    finally:
+        writer.close()
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch dysgraphia screening of handwriting scans")
+    parser.add_argument("source", help="directory of images, or a .txt / .csv manifest of paths")
+    parser.add_argument("--out", type=Path, default=Path("dysgraphia_results.csv"), help=".csv or .jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--resume", action="store_true", help="skip images already in --out")
+    parser.add_argument("--retry-errors", action="store_true", help="with --resume, screen failed images again")
+    parser.add_argument("--no-ocr", action="store_true", help="skip the Tesseract legibility check")
+    args = parser.parse_args(argv)
+
+    if args.out.suffix not in (".csv", ".jsonl"):
+        parser.error("--out must end in .csv or .jsonl")
+    if args.out.exists() and args.out.stat().st_size and not args.resume:
+        parser.error(f"{args.out} exists; pass --resume to continue it")
+
+    paths = list_inputs(args.source)
+    if args.resume:
+        done = done_paths(args.out, args.retry_errors)
+        paths = [p for p in paths if p not in done]
+        print(f"Resuming: {len(done)} already screened, {len(paths)} to go", file=sys.stderr)
+
+    start = time.perf_counter()
+    counts = run(paths, args.out, workers=args.workers, ocr=not args.no_ocr)
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items())) or "nothing to do"
+    print(f"✓ Screened {len(paths)} images in {elapsed:.1f}s ({summary}) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
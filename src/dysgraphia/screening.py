@@ -0,0 +1,294 @@
+"""
+Headless dysgraphia screening (the v8 text-only pipeline).
+
+    metrics = screen_image(cv2.imread("sample.jpg"))
+
+Preprocessing, auto-calibration on letter components, word segmentation,
+spacing/size variability, OCR legibility and the weighted risk score,
+with no file dialogs or windows, so it can run in batch jobs and servers.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Scans are resized to this width before anything is measured
+TARGET_WIDTH = 1000
+# Components touching this margin are page borders or scan edges
+BORDER_MARGIN = 5
+# Letter components: aspect ratio and height limits (ruled lines are very wide)
+MIN_ASPECT, MAX_ASPECT = 0.2, 5.0
+MIN_LETTER_H, MAX_LETTER_H = 4, 400
+MIN_LETTER_AREA = 10
+# Word boxes whose vertical centres differ by more than this many letter
+# heights are on different lines (handwriting baselines drift, so not 0.5)
+LINE_GAP = 0.8
+
+# Risk points: (threshold, points) from the highest threshold down
+SPACING_RISK = ((0.60, 2.5), (0.45, 1.0))
+SIZE_RISK = ((0.30, 2.5), (0.20, 1.0))
+OCR_RISK = ((50, 2.0), (70, 1.0))   # confidence below the threshold
+HIGH_RISK_SCORE = 5.0
+MODERATE_RISK_SCORE = 2.5
+
+# OCR runs on the text lines only, cut out with this padding (px) and
+# stacked with LINE_SPACING px of white between them
+OCR_PAD = 6
+OCR_LINE_SPACING = 12
+# Legibility results kept per process, keyed by a hash of the OCR input
+OCR_CACHE_SIZE = 1024
+
+
+class NoTextFound(ValueError):
+    """No component in the image looks like handwriting."""
+
+
+def ocr_engine():
+    """
+    The Tesseract binding to use, or None (OCR legibility is then reported
+    as unavailable). tesserocr is preferred: it keeps one Tesseract instance
+    per thread, where pytesseract starts a tesseract process per call.
+    """
+    try:
+        import tesserocr
+        return tesserocr
+    except ImportError:
+        pass
+    try:
+        import pytesseract
+    except ImportError:
+        return None
+    return pytesseract
+
+
+# ---------------- PIPELINE ----------------
+
+def to_bgr(image):
+    """Accepts grayscale, BGR or BGRA arrays, as cv2.imread returns them."""
+    image = np.asarray(image)
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+    return image
+
+def resize(image):
+    """BGR copy of the image scaled to TARGET_WIDTH."""
+    img = to_bgr(image)
+    h, w = img.shape[:2]
+    scale = TARGET_WIDTH / w
+    return cv2.resize(img, (TARGET_WIDTH, int(h * scale)), interpolation=cv2.INTER_AREA)
+
+def preprocess(image):
+    """(resized BGR image, binary ink mask) with ink as 255."""
+    img = resize(image)
+    gray_inv = cv2.bitwise_not(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+    _, thresh = cv2.threshold(gray_inv, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    return img, thresh
+
+def letter_components(thresh):
+    """
+    Heights and areas (int arrays) of the components that look like letters:
+    not touching the border, not line-shaped, within the size limits.
+    """
+    _, _, stats, _ = cv2.connectedComponentsWithStats(thresh)
+    h_img, w_img = thresh.shape
+    # Row 0 is the background
+    x, y, w_c, h_c, area = stats[1:, :5].T
+
+    inside = (x > BORDER_MARGIN) & (y > BORDER_MARGIN) & \
+             (x + w_c < w_img - BORDER_MARGIN) & (y + h_c < h_img - BORDER_MARGIN)
+    aspect = w_c / h_c.astype(np.float64)
+    letter_shaped = (aspect >= MIN_ASPECT) & (aspect <= MAX_ASPECT)
+    letter_sized = (h_c > MIN_LETTER_H) & (h_c < MAX_LETTER_H) & (area > MIN_LETTER_AREA)
+
+    keep = inside & letter_shaped & letter_sized
+    return h_c[keep], area[keep]
+
+def word_boxes(thresh, median_h, median_area):
+    """
+    Word bounding boxes as an (n, 4) int array of x, y, w, h: letters merged
+    by a dilation scaled to the letter height, small specks dropped.
+    """
+    k_w = max(3, int(median_h * 0.8))
+    k_h = max(2, int(median_h * 0.25))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (k_w, k_h))
+    dilated = cv2.dilate(thresh, kernel, iterations=1)
+
+    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    boxes = np.array([cv2.boundingRect(c) for c in contours], dtype=np.int64).reshape(-1, 4)
+    return boxes[boxes[:, 2] * boxes[:, 3] > median_area * 0.5]
+
+def group_lines(boxes, median_h):
+    """
+    Sorts word boxes into reading order. Returns (boxes, line numbers):
+    a box starts a new text line when its vertical centre is more than
+    LINE_GAP letter heights below the previous one's; within a line boxes
+    run left to right.
+    """
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    centres = boxes[:, 1] + boxes[:, 3] / 2
+    order = np.argsort(centres, kind="stable")
+    breaks = np.diff(centres[order]) > LINE_GAP * median_h
+    lines = np.empty(len(boxes), dtype=np.int64)
+    lines[order] = np.concatenate(([0], np.cumsum(breaks)))[:len(boxes)]
+    reading = np.lexsort((boxes[:, 0], lines))
+    return boxes[reading], lines[reading]
+
+def spacing_cv(boxes, lines):
+    """
+    Coefficient of variation of the positive gaps between neighbouring
+    words on the same line (boxes and lines as returned by group_lines).
+    """
+    gaps = boxes[1:, 0] - (boxes[:-1, 0] + boxes[:-1, 2])
+    gaps = gaps[(lines[1:] == lines[:-1]) & (gaps > 0)]
+    return float(gaps.std() / gaps.mean()) if gaps.size else 0.0
+
+def line_strip(img, boxes, lines):
+    """
+    Grayscale image of just the text lines: each line's bounding box (padded)
+    cut out of `img` and stacked top to bottom. None when there are no boxes.
+    """
+    if not len(boxes):
+        return None
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    h_img, w_img = gray.shape
+    starts = np.flatnonzero(np.r_[True, lines[1:] != lines[:-1]])
+    x0 = np.maximum(np.minimum.reduceat(boxes[:, 0], starts) - OCR_PAD, 0)
+    y0 = np.maximum(np.minimum.reduceat(boxes[:, 1], starts) - OCR_PAD, 0)
+    x1 = np.minimum(np.maximum.reduceat(boxes[:, 0] + boxes[:, 2], starts) + OCR_PAD, w_img)
+    y1 = np.minimum(np.maximum.reduceat(boxes[:, 1] + boxes[:, 3], starts) + OCR_PAD, h_img)
+
+    width = int((x1 - x0).max())
+    strip = np.full((int((y1 - y0).sum()) + OCR_LINE_SPACING * (len(starts) + 1), width), 255, np.uint8)
+    top = OCR_LINE_SPACING
+    for a, b, c, d in zip(x0, y0, x1, y1):
+        strip[top:top + d - b, :c - a] = gray[b:d, a:c]
+        top += d - b + OCR_LINE_SPACING
+    return strip
+
+_tess = threading.local()
+
+def _word_confidences(engine, strip):
+    """Tesseract word confidences (0-100) for a grayscale image."""
+    if engine.__name__ == "tesserocr":
+        api = getattr(_tess, "api", None)
+        if api is None:
+            api = _tess.api = engine.PyTessBaseAPI(psm=engine.PSM.SINGLE_BLOCK)
+        h, w = strip.shape
+        api.SetImageBytes(strip.tobytes(), w, h, 1, w)
+        api.Recognize()
+        return [float(c) for c in api.AllWordConfidences()]
+    data = engine.image_to_data(strip, config="--psm 6", output_type=engine.Output.DICT)
+    return [float(c) for c in data["conf"] if float(c) >= 0]
+
+def warm_ocr():
+    """Starts this thread's Tesseract instance ahead of the first image (worker initializers)."""
+    engine = ocr_engine()
+    if engine is not None and engine.__name__ == "tesserocr":
+        _word_confidences(engine, np.full((32, 32), 255, np.uint8))
+
+_ocr_cache = OrderedDict()
+_ocr_cache_lock = threading.Lock()
+
+def ocr_legibility(img, boxes, lines):
+    """
+    (mean Tesseract word confidence, status) over the text lines of `img`.
+    Status is "ok", "no_words" (nothing recognised: confidence 0, or None
+    without any word boxes), "unavailable" (no Tesseract binding) or
+    "failed" (confidence None). Results are cached by a hash of the line
+    strip, so repeated scans are only recognised once per process.
+    """
+    engine = ocr_engine()
+    if engine is None:
+        return None, "unavailable"
+    strip = line_strip(img, boxes, lines)
+    if strip is None:
+        return None, "no_words"
+
+    key = (strip.shape, hashlib.blake2b(strip.tobytes(), digest_size=16).digest())
+    with _ocr_cache_lock:
+        if key in _ocr_cache:
+            _ocr_cache.move_to_end(key)
+            return _ocr_cache[key]
+
+    try:
+        confs = _word_confidences(engine, strip)
+    except Exception:
+        log.warning("OCR failed", exc_info=True)
+        return None, "failed"
+    result = (float(np.mean(confs)), "ok") if confs else (0.0, "no_words")
+
+    with _ocr_cache_lock:
+        _ocr_cache[key] = result
+        if len(_ocr_cache) > OCR_CACHE_SIZE:
+            _ocr_cache.popitem(last=False)
+    return result
+
+def _points(value, table, below=False):
+    for threshold, points in table:
+        if (value < threshold) if below else (value > threshold):
+            return points
+    return 0.0
+
+def risk_score(spacing, size, ocr):
+    """(total risk score, verdict) from the three metrics; `ocr` None adds no points."""
+    total = _points(spacing, SPACING_RISK) + _points(size, SIZE_RISK)
+    if ocr is not None:
+        total += _points(ocr, OCR_RISK, below=True)
+    if total >= HIGH_RISK_SCORE:
+        verdict = "HIGH RISK"
+    elif total >= MODERATE_RISK_SCORE:
+        verdict = "MODERATE RISK"
+    else:
+        verdict = "LOW RISK"
+    return total, verdict
+
+def screen_image(image, ocr=True):
+    """
+    Screens one handwriting sample (a NumPy image array). Returns a dict of
+    metrics: spacing_cv, size_cv, ocr_score, total_risk_score, verdict,
+    plus ocr_status (see ocr_legibility; "skipped" with ocr=False and
+    ocr_score None), median_letter_height, letters, lines, and word_boxes (x, y, w, h
+    in the image resized to TARGET_WIDTH, in reading order). Raises
+    NoTextFound for blank pages.
+    """
+    img, thresh = preprocess(image)
+    letter_heights, letter_areas = letter_components(thresh)
+    if not letter_heights.size:
+        raise NoTextFound("No valid text detected after filtering")
+
+    median_h = float(np.median(letter_heights))
+    median_area = float(np.median(letter_areas))
+    boxes, lines = group_lines(word_boxes(thresh, median_h, median_area), median_h)
+
+    spacing = spacing_cv(boxes, lines)
+    size = float(letter_heights.std() / letter_heights.mean())
+    ocr_score, ocr_status = ocr_legibility(img, boxes, lines) if ocr else (None, "skipped")
+    total, verdict = risk_score(spacing, size, ocr_score)
+
+    return {
+        "spacing_cv": spacing,
+        "size_cv": size,
+        "ocr_score": ocr_score,
+        "ocr_status": ocr_status,
+        "total_risk_score": total,
+        "verdict": verdict,
+        "median_letter_height": median_h,
+        "letters": int(letter_heights.size),
+        "lines": int(lines.max()) + 1 if lines.size else 0,
+        "word_boxes": [tuple(int(v) for v in b) for b in boxes],
+    }
+
+def draw_boxes(image, boxes):
+    """The image resized like screen_image does, with the word boxes drawn."""
+    img = resize(image)
+    for x, y, w, h in boxes:
+        cv2.rectangle(img, (x, y), (x + w, y + h), (255, 0, 0), 2)
+    return img
@@ -1,133 +1,259 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
-from pathlib import Path
 
 # Reproducibility
-np.random.seed(42)
+SEED = 42
 
 # Output path
 DATA_PATH = Path("data")
-DATA_PATH.mkdir(exist_ok=True)
 
 OUTPUT_FILE = DATA_PATH / "synthetic_dyslexia.csv"
 
+COLUMNS = [
+    # Timed Word Reading
+    "avg_word_time_ms", "reading_speed_wpm", "word_error_rate", "pause_count", "self_correction_count",
+    # Sound–Letter Matching
+    "phoneme_accuracy", "confusable_error_rate", "reaction_time_ms", "skipped_trials", "repeated_attempts",
+]
+
+# Share of each case type in every chunk (the rest are borderline cases)
+LOW_RISK_SHARE = 0.4
+HIGH_RISK_SHARE = 0.4
+
+# Column distributions per profile: (distribution, param1, param2)
+
+# Typical readers with realistic variance
+LOW_RISK = {
+    "avg_word_time_ms": ("normal", 550, 180),
+    "reading_speed_wpm": ("normal", 140, 35),
+    "word_error_rate": ("uniform", 0.0, 0.15),
+    "pause_count": ("poisson", 2, None),
+    "self_correction_count": ("poisson", 1.5, None),
+    "phoneme_accuracy": ("uniform", 0.82, 1.00),
+    "confusable_error_rate": ("uniform", 0.00, 0.18),
+    "reaction_time_ms": ("normal", 900, 300),
+    "skipped_trials": ("poisson", 1, None),
+    "repeated_attempts": ("poisson", 1.5, None),
+}
+
+# Dyslexia-risk patterns with realistic variance
+HIGH_RISK = {
+    "avg_word_time_ms": ("normal", 950, 280),
+    "reading_speed_wpm": ("normal", 100, 25),
+    "word_error_rate": ("uniform", 0.12, 0.45),
+    "pause_count": ("poisson", 3.5, None),
+    "self_correction_count": ("poisson", 2.5, None),
+    "phoneme_accuracy": ("uniform", 0.60, 0.85),
+    "confusable_error_rate": ("uniform", 0.15, 0.55),
+    "reaction_time_ms": ("normal", 1500, 400),
+    "skipped_trials": ("poisson", 2.5, None),
+    "repeated_attempts": ("poisson", 3.5, None),
+}
+
+# Borderline: low risk with some difficulties
+BORDERLINE_LOW = {
+    "avg_word_time_ms": ("normal", 750, 150),
+    "reading_speed_wpm": ("normal", 115, 25),
+    "word_error_rate": ("uniform", 0.10, 0.20),
+    "pause_count": ("poisson", 2.5, None),
+    "self_correction_count": ("poisson", 2, None),
+    "phoneme_accuracy": ("uniform", 0.78, 0.90),
+    "confusable_error_rate": ("uniform", 0.12, 0.25),
+    "reaction_time_ms": ("normal", 1150, 250),
+    "skipped_trials": ("poisson", 1.5, None),
+    "repeated_attempts": ("poisson", 2, None),
+}
+
+# Borderline: high risk with some strengths
+BORDERLINE_HIGH = {
+    "avg_word_time_ms": ("normal", 800, 180),
+    "reading_speed_wpm": ("normal", 110, 20),
+    "word_error_rate": ("uniform", 0.15, 0.28),
+    "pause_count": ("poisson", 3, None),
+    "self_correction_count": ("poisson", 2.5, None),
+    "phoneme_accuracy": ("uniform", 0.70, 0.86),
+    "confusable_error_rate": ("uniform", 0.18, 0.35),
+    "reaction_time_ms": ("normal", 1350, 300),
+    "skipped_trials": ("poisson", 2, None),
+    "repeated_attempts": ("poisson", 3, None),
+}
+
+
+def draw(rng, spec, n):
+    """Draws n values of one column in a single call"""
+    dist, a, b = spec
+    if dist == "normal":
+        return rng.normal(a, b, n)
+    if dist == "uniform":
+        return rng.uniform(a, b, n)
+    return rng.poisson(a, n)
+
 
-def generate_low_risk(n):
-    """Typical readers with realistic variance"""
-    return pd.DataFrame({
-        # Timed Word Reading
-        "avg_word_time_ms": np.random.normal(550, 180, n),
-        "reading_speed_wpm": np.random.normal(140, 35, n),
-        "word_error_rate": np.random.uniform(0.0, 0.15, n),
-        "pause_count": np.random.poisson(2, n),
-        "self_correction_count": np.random.poisson(1.5, n),
-
-        # Sound–Letter Matching
-        "phoneme_accuracy": np.random.uniform(0.82, 1.00, n),
-        "confusable_error_rate": np.random.uniform(0.00, 0.18, n),
-        "reaction_time_ms": np.random.normal(900, 300, n),
-        "skipped_trials": np.random.poisson(1, n),
-        "repeated_attempts": np.random.poisson(1.5, n),
-
-        "label": 0  # Low risk
-    })
-
-
-def generate_high_risk(n):
-    """Dyslexia-risk patterns with realistic variance"""
-    return pd.DataFrame({
-        # Timed Word Reading
-        "avg_word_time_ms": np.random.normal(950, 280, n),
-        "reading_speed_wpm": np.random.normal(100, 25, n),
-        "word_error_rate": np.random.uniform(0.12, 0.45, n),
-        "pause_count": np.random.poisson(3.5, n),
-        "self_correction_count": np.random.poisson(2.5, n),
-
-        # Sound–Letter Matching
-        "phoneme_accuracy": np.random.uniform(0.60, 0.85, n),
-        "confusable_error_rate": np.random.uniform(0.15, 0.55, n),
-        "reaction_time_ms": np.random.normal(1500, 400, n),
-        "skipped_trials": np.random.poisson(2.5, n),
-        "repeated_attempts": np.random.poisson(3.5, n),
-
-        "label": 1  # High risk
-    })
-
-
-def generate_borderline_cases(n):
+def generate_profile(rng, profile, n, label):
+    """All columns of one profile, one array per column"""
+    columns = {col: draw(rng, profile[col], n) for col in COLUMNS}
+    columns["label"] = np.full(n, label, dtype=np.int64)
+    return columns
+
+
+def generate_low_risk(rng, n):
+    return generate_profile(rng, LOW_RISK, n, 0)
+
+
+def generate_high_risk(rng, n):
+    return generate_profile(rng, HIGH_RISK, n, 1)
+
+
+def generate_borderline_cases(rng, n):
     """Cases that are harder to classify - mix of both patterns"""
     # Randomly assign true labels
-    labels = np.random.choice([0, 1], n)
-    
-    data = []
-    for label in labels:
-        if label == 0:  # Low risk with some difficulties
-            row = {
-                "avg_word_time_ms": np.random.normal(750, 150, 1)[0],
-                "reading_speed_wpm": np.random.normal(115, 25, 1)[0],
-                "word_error_rate": np.random.uniform(0.10, 0.20, 1)[0],
-                "pause_count": np.random.poisson(2.5, 1)[0],
-                "self_correction_count": np.random.poisson(2, 1)[0],
-                "phoneme_accuracy": np.random.uniform(0.78, 0.90, 1)[0],
-                "confusable_error_rate": np.random.uniform(0.12, 0.25, 1)[0],
-                "reaction_time_ms": np.random.normal(1150, 250, 1)[0],
-                "skipped_trials": np.random.poisson(1.5, 1)[0],
-                "repeated_attempts": np.random.poisson(2, 1)[0],
-                "label": label
-            }
-        else:  # High risk with some strengths
-            row = {
-                "avg_word_time_ms": np.random.normal(800, 180, 1)[0],
-                "reading_speed_wpm": np.random.normal(110, 20, 1)[0],
-                "word_error_rate": np.random.uniform(0.15, 0.28, 1)[0],
-                "pause_count": np.random.poisson(3, 1)[0],
-                "self_correction_count": np.random.poisson(2.5, 1)[0],
-                "phoneme_accuracy": np.random.uniform(0.70, 0.86, 1)[0],
-                "confusable_error_rate": np.random.uniform(0.18, 0.35, 1)[0],
-                "reaction_time_ms": np.random.normal(1350, 300, 1)[0],
-                "skipped_trials": np.random.poisson(2, 1)[0],
-                "repeated_attempts": np.random.poisson(3, 1)[0],
-                "label": label
-            }
-        data.append(row)
-    
-    return pd.DataFrame(data)
-
-
-def add_label_noise(df, noise_rate=0.03):
+    labels = rng.integers(0, 2, n)
+    high = labels == 1
+    n_high = int(high.sum())
+
+    columns = {}
+    for col in COLUMNS:
+        low_values = draw(rng, BORDERLINE_LOW[col], n - n_high)
+        values = np.empty(n, dtype=low_values.dtype)
+        values[~high] = low_values
+        values[high] = draw(rng, BORDERLINE_HIGH[col], n_high)
+        columns[col] = values
+    columns["label"] = labels.astype(np.int64)
+    return columns
+
+
+def add_label_noise(rng, labels, noise_rate=0.03):
     """Flip labels for a small percentage of cases to simulate real-world mislabeling"""
-    n_flip = int(len(df) * noise_rate)
-    flip_indices = np.random.choice(df.index, n_flip, replace=False)
-    df.loc[flip_indices, 'label'] = 1 - df.loc[flip_indices, 'label']
-    return df
+    n_flip = int(len(labels) * noise_rate)
+    flip_indices = rng.choice(len(labels), n_flip, replace=False)
+    labels[flip_indices] = 1 - labels[flip_indices]
+    return labels
 
 
-def main():
-    # Generate different types of cases
-    low_risk = generate_low_risk(400)
-    high_risk = generate_high_risk(400)
-    borderline = generate_borderline_cases(200)  # 20% borderline cases
-    
-    # Combine all cases
-    df = pd.concat([low_risk, high_risk, borderline], ignore_index=True)
-    
+def generate_chunk(n, seed_seq, noise_rate=0.03):
+    """
+    One shuffled chunk of n rows with the usual case mix.
+
+    Every chunk has its own seed sequence, so the output only depends on
+    the seed and the chunk size, not on how many workers produced it.
+    """
+    rng = np.random.default_rng(seed_seq)
+    n_low = int(n * LOW_RISK_SHARE)
+    n_high = int(n * HIGH_RISK_SHARE)
+
+    parts = [
+        generate_low_risk(rng, n_low),
+        generate_high_risk(rng, n_high),
+        generate_borderline_cases(rng, n - n_low - n_high),
+    ]
+    columns = {col: np.concatenate([p[col] for p in parts]) for col in COLUMNS + ["label"]}
+
     # Clean up invalid values
-    df = df.clip(lower=0)
-    
-    # Add small amount of label noise (3%)
-    df = add_label_noise(df, noise_rate=0.03)
-    
-    # Shuffle the dataset
-    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
-    
-    # Save dataset
-    df.to_csv(OUTPUT_FILE, index=False)
+    for col in COLUMNS:
+        np.maximum(columns[col], 0, out=columns[col])
+
+    add_label_noise(rng, columns["label"], noise_rate)
+
+    # Shuffle the chunk
+    order = rng.permutation(n)
+    return pd.DataFrame({col: values[order] for col, values in columns.items()})
+
+
+def _generate_chunk(args):
+    return generate_chunk(*args)
+
+
+def chunk_sizes(n_rows, chunk_size):
+    sizes = [chunk_size] * (n_rows // chunk_size)
+    if n_rows % chunk_size:
+        sizes.append(n_rows % chunk_size)
+    return sizes
+
+
+def generate_chunks(n_rows, chunk_size=100_000, seed=SEED, workers=1, noise_rate=0.03):
+    """
+    Yields DataFrame chunks in order.
+
+    With workers > 1 chunks are built in a process pool; at most two
+    chunks per worker are in flight, so memory stays bounded.
+    """
+    sizes = chunk_sizes(n_rows, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(size, seq, noise_rate) for size, seq in zip(sizes, seeds)]
+
+    if workers <= 1:
+        for job in jobs:
+            yield generate_chunk(*job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = 2 * workers
+        futures = [pool.submit(_generate_chunk, job) for job in jobs[:window]]
+        next_job = len(futures)
+        for i in range(len(jobs)):
+            yield futures[i].result()
+            futures[i] = None
+            if next_job < len(jobs):
+                futures.append(pool.submit(_generate_chunk, jobs[next_job]))
+                next_job += 1
+
+
+def write_dataset(chunks, output_file):
+    """Streams chunks to CSV or Parquet (by extension). Returns (rows, positives)."""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    rows = positives = 0
+
+    if output_file.suffix == ".parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for df in chunks:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_file, table.schema)
+                writer.write_table(table)
+                rows += len(df)
+                positives += int(df["label"].sum())
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows, positives
+
+    with open(output_file, "w", newline="") as f:
+        for i, df in enumerate(chunks):
+            df.to_csv(f, header=(i == 0), index=False)
+            rows += len(df)
+            positives += int(df["label"].sum())
+    return rows, positives
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the synthetic dyslexia dataset")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--out", default=str(OUTPUT_FILE), help=".csv or .parquet")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    chunks = generate_chunks(args.rows, args.chunk_size, seed=args.seed, workers=args.workers)
+    rows, positives = write_dataset(chunks, args.out)
+    elapsed = time.perf_counter() - start
 
     print("✓ Synthetic dataset created successfully!")
-    print(f"Shape: {df.shape}")
-    print(f"Class distribution:\n{df['label'].value_counts()}")
-    print(f"Saved to: {OUTPUT_FILE}")
+    print(f"Rows: {rows} ({len(COLUMNS) + 1} columns) in {elapsed:.2f}s")
+    print(f"Class distribution:\n  0: {rows - positives}\n  1: {positives}")
+    print(f"Saved to: {args.out}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,411 @@
+import os
+import re
+import threading
+import time
+import weakref
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "conclave-ai")
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LLMError(Exception):
+    pass
+
+
+class CircuitOpenError(LLMError):
+    """Raised without touching the network while the breaker is open."""
+    pass
+
+
+class LLMBusyError(LLMError):
+    """Raised when every concurrency slot stayed taken for the whole timeout."""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open, calls
+    fail immediately; after `reset_timeout` seconds one trial call is let
+    through (half-open) and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # half-open: exactly one trial call
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def cancel_trial(self):
+        """Gives back a half-open trial that never reached the server."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class LatencyHistogram:
+    """Cumulative-style latency histogram (counts per upper bound, plus +Inf)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._sum += seconds
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self._counts[i] += 1
+                    return
+            self._counts[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = [str(b) for b in self.buckets] + ["+Inf"]
+            return {
+                "buckets": dict(zip(labels, self._counts)),
+                "count": self._count,
+                "sum": round(self._sum, 4),
+            }
+
+
+class _ClientBase:
+    """Breaker, latency histogram, counters and payload shared by both clients."""
+
+    def __init__(self, url, model, timeout, retries, backoff, failure_threshold, reset_timeout):
+        self.url = url
+        self.model = model
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = LatencyHistogram()
+
+        self._counters = {"calls": 0, "failures": 0, "retries": 0, "short_circuited": 0, "busy": 0}
+        self._counter_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def _payload(self, prompt, temperature):
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": False,
+            "options": {"temperature": temperature}
+        }
+
+    @staticmethod
+    def _parse(data):
+        if "response" not in data:
+            # Retrying won't fix a malformed answer
+            raise ValueError("Invalid LLM response")
+        return data["response"]
+
+    @staticmethod
+    def _batch_prompt(prompt, k):
+        return prompt + f"\nOutput {k} different words separated by commas. No numbering.\n"
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self._counters)
+        return {
+            "counters": counters,
+            "circuit": self.breaker.state,
+            "latency_seconds": self.latency.snapshot(),
+        }
+
+
+class LLMClient(_ClientBase):
+    """
+    Shared Ollama client.
+
+    - One pooled `requests.Session` for every call (keep-alive connections).
+    - At most `max_concurrency` calls in flight; extra callers wait up to
+      `timeout` and then fail fast instead of piling onto a slow server.
+    - `retries` extra attempts with exponential back-off on connection errors
+      and 5xx responses.
+    - A circuit breaker that skips straight to the caller's fallback after
+      `failure_threshold` consecutive failures.
+    """
+
+    def __init__(
+        self,
+        url=OLLAMA_URL,
+        model=OLLAMA_MODEL,
+        timeout=5.0,
+        max_concurrency=4,
+        retries=1,
+        backoff=0.2,
+        failure_threshold=3,
+        reset_timeout=30.0
+    ):
+        super().__init__(url, model, timeout, retries, backoff, failure_threshold, reset_timeout)
+
+        # requests is imported here, not at module level, so importing the
+        # generators doesn't pay for it until the LLM is actually used
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._retryable = (requests.ConnectionError, LLMError)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def generate(self, prompt, temperature=0.7, timeout=None):
+        """Sends one prompt and returns the raw response text."""
+        timeout = self.timeout if timeout is None else timeout
+
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError("LLM circuit open, skipping call")
+
+        if not self._slots.acquire(timeout=timeout):
+            self._count("busy")
+            # Not the server's fault, so don't count it against the breaker
+            self.breaker.cancel_trial()
+            raise LLMBusyError("All LLM slots busy")
+
+        self._count("calls")
+        start = time.perf_counter()
+        try:
+            text = self._post_with_retries(prompt, temperature, timeout)
+        except Exception:
+            self._count("failures")
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - start)
+            self._slots.release()
+
+        self.breaker.record_success()
+        return text
+
+    def _post_with_retries(self, prompt, temperature, timeout):
+        payload = self._payload(prompt, temperature)
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(self.url, json=payload, timeout=timeout)
+                if response.status_code >= 500:
+                    raise LLMError(f"LLM server error {response.status_code}")
+                return self._parse(response.json())
+            except self._retryable:
+                if attempt == self.retries:
+                    raise
+                self._count("retries")
+                time.sleep(self.backoff * (2 ** attempt))
+
+    def generate_words(self, prompt, k, temperature=0.7, timeout=None):
+        """
+        Batch mode: asks for `k` candidate words in one prompt and returns
+        the cleaned, de-duplicated words (may be fewer than `k`).
+        """
+        raw = self.generate(self._batch_prompt(prompt, k), temperature=temperature, timeout=timeout)
+        return parse_words(raw)[:k]
+
+
+class AsyncLLMClient(_ClientBase):
+    """
+    asyncio counterpart of LLMClient for the async server (httpx).
+
+    Same slots, retries and circuit breaker, but a call waiting on Ollama
+    only holds a coroutine, not a thread. `timeout` bounds the whole call
+    (slot wait, retries and back-off included); when it expires, or the
+    awaiting task is cancelled because the client went away, the HTTP
+    request is cancelled with it.
+
+    The httpx client and semaphore belong to the event loop that created
+    them; use get_async_client() to get the one for the running loop.
+    """
+
+    def __init__(
+        self,
+        url=OLLAMA_URL,
+        model=OLLAMA_MODEL,
+        timeout=5.0,
+        max_concurrency=4,
+        retries=1,
+        backoff=0.2,
+        failure_threshold=3,
+        reset_timeout=30.0
+    ):
+        super().__init__(url, model, timeout, retries, backoff, failure_threshold, reset_timeout)
+
+        import asyncio
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        )
+        self._retryable = (httpx.TransportError, LLMError)
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def generate(self, prompt, temperature=0.7, timeout=None):
+        """Sends one prompt and returns the raw response text."""
+        import asyncio
+
+        timeout = self.timeout if timeout is None else timeout
+
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError("LLM circuit open, skipping call")
+
+        deadline = time.monotonic() + timeout
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self._count("busy")
+            self.breaker.cancel_trial()
+            raise LLMBusyError("All LLM slots busy")
+        except asyncio.CancelledError:
+            self.breaker.cancel_trial()
+            raise
+
+        self._count("calls")
+        start = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(
+                self._post_with_retries(prompt, temperature, timeout),
+                max(0.0, deadline - time.monotonic())
+            )
+        except asyncio.CancelledError:
+            # The caller gave up; that says nothing about the server
+            self.breaker.cancel_trial()
+            raise
+        except Exception:
+            self._count("failures")
+            self.breaker.record_failure()
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - start)
+            self._slots.release()
+
+        self.breaker.record_success()
+        return text
+
+    async def _post_with_retries(self, prompt, temperature, timeout):
+        import asyncio
+
+        payload = self._payload(prompt, temperature)
+
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.client.post(self.url, json=payload, timeout=timeout)
+                if response.status_code >= 500:
+                    raise LLMError(f"LLM server error {response.status_code}")
+                return self._parse(response.json())
+            except self._retryable:
+                if attempt == self.retries:
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def generate_words(self, prompt, k, temperature=0.7, timeout=None):
+        """Batch mode, see LLMClient.generate_words."""
+        raw = await self.generate(self._batch_prompt(prompt, k), temperature=temperature, timeout=timeout)
+        return parse_words(raw)[:k]
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def parse_words(raw):
+    """Splits an LLM answer into lower-case words, dropping punctuation and numbering."""
+    words = []
+    for token in re.split(r"[,\n;]+", raw):
+        token = re.sub(r"[^a-zA-Z\s]", "", token).strip().lower()
+        if not token:
+            continue
+        # "The word is cat" -> "cat"
+        word = token.split()[-1]
+        if word not in words:
+            words.append(word)
+    return words
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client shared by both generators and the test runner."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    The AsyncLLMClient of the running event loop. Breaker state is per loop,
+    which is per process under an ASGI server.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncLLMClient()
+    return client
+
+
+async def close_async_client():
+    """Closes the running loop's AsyncLLMClient, if one was created."""
+    import asyncio
+
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,282 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from risk_model import METADATA_PATH, MODEL_DIR, MODEL_PATH, SCALER_PATH, RiskModel
+
+log = logging.getLogger(__name__)
+
+REGISTRY_PATH = MODEL_DIR / "registry"
+
+# Rows of params.npy
+COEF, MEAN, SCALE = 0, 1, 2
+
+FORMAT_VERSION = 1
+
+
+class ArtifactError(ValueError):
+    pass
+
+
+def _checksum(params_bytes, features, intercept):
+    h = hashlib.sha256(params_bytes)
+    h.update(json.dumps({"features": features, "intercept": intercept}, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts that load without sklearn.
+
+    Each version is a directory under models/registry/ with
+
+        params.npy      float64 (3, n_features): coef, scaler mean, scaler scale
+        manifest.json   version, features, intercept, sha256 checksum, metadata
+
+    and the file ACTIVE names the version the server uses. Activation
+    rewrites ACTIVE through a rename, so readers never see a half-written
+    pointer and a rollback is a single rename.
+    """
+
+    def __init__(self, root=REGISTRY_PATH):
+        self.root = Path(root)
+
+    # ---------------- VERSIONS ----------------
+
+    def versions(self):
+        if not self.root.exists():
+            return []
+        found = [p.name for p in self.root.iterdir() if (p / "manifest.json").exists()]
+        # v2 before v10
+        return sorted(found, key=lambda v: [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", v)])
+
+    def next_version(self):
+        numbers = [int(v[1:]) for v in self.versions() if re.fullmatch(r"v\d+", v)]
+        return f"v{max(numbers, default=0) + 1}"
+
+    def active_version(self):
+        try:
+            return (self.root / "ACTIVE").read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def manifest(self, version):
+        path = self.root / version / "manifest.json"
+        if not path.exists():
+            raise ArtifactError(f"Unknown model version: {version}")
+        with open(path) as f:
+            return json.load(f)
+
+    # ---------------- EXPORT ----------------
+
+    def publish(self, coef, intercept, mean, scale, features, metadata=None, version=None, activate=False):
+        """Writes a new version. Returns its name."""
+        version = version or self.next_version()
+        version_dir = self.root / version
+        if version_dir.exists():
+            raise ArtifactError(f"Version {version} already exists")
+
+        params = np.vstack([coef, mean, scale]).astype(np.float64)
+        if params.shape != (3, len(features)):
+            raise ArtifactError(f"Expected {len(features)} coefficients, got {params.shape[1]}")
+
+        # Write to a temp dir and rename, so a version is either complete or absent
+        tmp_dir = self.root / f".{version}.tmp"
+        tmp_dir.mkdir(parents=True)
+        np.save(tmp_dir / "params.npy", params)
+        params_bytes = (tmp_dir / "params.npy").read_bytes()
+
+        intercept = float(intercept)
+        manifest = {
+            "format": FORMAT_VERSION,
+            "version": version,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "features": list(features),
+            "intercept": intercept,
+            "sha256": _checksum(params_bytes, list(features), intercept),
+            "metadata": metadata or {}
+        }
+        with open(tmp_dir / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(tmp_dir, version_dir)
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def publish_sklearn(self, model, scaler, metadata, **kwargs):
+        coef = model.coef_.ravel()
+        mean = scaler.mean_ if scaler.with_mean else np.zeros_like(coef)
+        scale = scaler.scale_ if scaler.with_std else np.ones_like(coef)
+        return self.publish(coef, model.intercept_[0], mean, scale, metadata["features"], metadata=metadata, **kwargs)
+
+    # ---------------- LOAD ----------------
+
+    def load(self, version=None):
+        """Loads a version (default: the active one) as a RiskModel, checksum verified."""
+        version = version or self.active_version()
+        if version is None:
+            raise ArtifactError("No active model version")
+        manifest = self.manifest(version)
+        path = self.root / version / "params.npy"
+
+        params = np.load(path, mmap_mode="r")
+        expected = _checksum(path.read_bytes(), manifest["features"], manifest["intercept"])
+        if expected != manifest["sha256"]:
+            raise ArtifactError(f"Checksum mismatch for model version {version}")
+        if params.shape != (3, len(manifest["features"])):
+            raise ArtifactError(f"Corrupt params for model version {version}")
+
+        return RiskModel.from_arrays(
+            params[COEF], manifest["intercept"], params[MEAN], params[SCALE],
+            manifest["features"], version=version
+        )
+
+    # ---------------- ACTIVATION ----------------
+
+    def activate(self, version):
+        """Points ACTIVE at version after checking that it loads."""
+        self.load(version)
+        self.root.mkdir(parents=True, exist_ok=True)
+        _write_atomic(self.root / "ACTIVE", f"{version}\n".encode())
+
+    def rollback(self):
+        """Activates the version before the active one. Returns its name."""
+        versions = self.versions()
+        active = self.active_version()
+        if active not in versions or versions.index(active) == 0:
+            raise ArtifactError("No earlier version to roll back to")
+        previous = versions[versions.index(active) - 1]
+        self.activate(previous)
+        return previous
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+
+class ActiveModelWatcher:
+    """
+    Keeps a process's model in step with the registry's ACTIVE pointer.
+
+    `current()` re-reads the pointer at most every `interval` seconds and
+    loads the new version when it changes, so activating or rolling back
+    from the CLI reaches every running server process without a restart.
+    """
+
+    def __init__(self, registry, model, interval=5.0, on_swap=None):
+        self.registry = registry
+        self.interval = interval
+        self.on_swap = on_swap
+        self._model = model
+        self._checked = time.monotonic()
+        self._lock = threading.Lock()
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._checked >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                self._checked = now
+                self._refresh()
+            finally:
+                self._lock.release()
+        return self._model
+
+    def _refresh(self):
+        version = self.registry.active_version()
+        if version is None or version == self._model.version:
+            return
+        try:
+            model = self.registry.load(version)
+        except ArtifactError as e:
+            log.warning("Model swap to %s failed, keeping %s: %s", version, self._model.version, e,
+                        extra={"version": version, "kept_version": self._model.version})
+            return
+        self.swap(model)
+
+    def swap(self, model):
+        log.info("Active model: %s -> %s", self._model.version, model.version,
+                 extra={"previous_version": self._model.version, "version": model.version})
+        self._model = model
+        if self.on_swap:
+            self.on_swap(model)
+
+
+# ---------------- CLI ----------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Model registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    publish = sub.add_parser("publish", help="export a pickled model and scaler")
+    publish.add_argument("--from", dest="source", type=Path, default=MODEL_DIR,
+                         help="directory with logistic_dyslexia.pkl, scaler.pkl and model_metadata.json")
+    publish.add_argument("--version", default=None)
+    publish.add_argument("--activate", action="store_true")
+
+    sub.add_parser("list")
+    activate = sub.add_parser("activate")
+    activate.add_argument("version")
+    sub.add_parser("rollback")
+    verify = sub.add_parser("verify")
+    verify.add_argument("version", nargs="?")
+
+    args = parser.parse_args()
+    try:
+        run(args, get_registry())
+    except ArtifactError as e:
+        raise SystemExit(f"Error: {e}")
+
+
+def run(args, registry):
+    if args.command == "publish":
+        import joblib
+
+        model = joblib.load(args.source / MODEL_PATH.name)
+        scaler = joblib.load(args.source / SCALER_PATH.name)
+        with open(args.source / METADATA_PATH.name) as f:
+            metadata = json.load(f)
+        version = registry.publish_sklearn(model, scaler, metadata, version=args.version, activate=args.activate)
+        print(f"Published {version}" + (" (active)" if args.activate else ""))
+    elif args.command == "list":
+        active = registry.active_version()
+        for v in registry.versions():
+            m = registry.manifest(v)
+            auc = m["metadata"].get("roc_auc")
+            auc = f"{auc:.4f}" if auc is not None else "-"
+            print(f"{'*' if v == active else ' '} {v:<8} {m['created']}  roc_auc={auc}")
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Active: {args.version}")
+    elif args.command == "rollback":
+        print(f"Active: {registry.rollback()}")
+    elif args.command == "verify":
+        model = registry.load(args.version)
+        print(f"{model.version}: OK ({len(model.features)} features)")
+
+
+if __name__ == "__main__":
+    main()
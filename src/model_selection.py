@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import itertools
+import json
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.metrics import accuracy_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from train_model import DATA_PATH, MODEL_FILE, MODEL_PATH, SCALER_FILE, publish
+
+# Scaled fold matrices are cached here, keyed by data checksum, k and seed
+CACHE_PATH = Path("data/cv_cache")
+RESULTS_FILE = MODEL_PATH / "model_selection.json"
+SEED = 42
+
+# ---------------------------
+# Search space
+# ---------------------------
+# Only linear families: the deployed RiskModel folds the scaler into the
+# coefficients, so the winner must expose coef_/intercept_ to be picked up
+# by predict.py unchanged.
+C_GRID = [0.01, 0.1, 1.0, 10.0, 100.0]
+ALPHA_GRID = [1e-5, 1e-4, 1e-3, 1e-2]
+CLASS_WEIGHTS = [None, "balanced"]
+
+
+def candidate_grid():
+    candidates = []
+    for C, cw in itertools.product(C_GRID, CLASS_WEIGHTS):
+        candidates.append({"family": "logistic_l2", "C": C, "class_weight": cw})
+    for C, cw in itertools.product(C_GRID, CLASS_WEIGHTS):
+        candidates.append({"family": "logistic_l1", "C": C, "class_weight": cw})
+    for alpha, cw in itertools.product(ALPHA_GRID, CLASS_WEIGHTS):
+        candidates.append({"family": "sgd_logistic", "alpha": alpha, "class_weight": cw})
+    return candidates
+
+
+# scikit-learn 1.8 deprecated `penalty` in favour of l1_ratio; older versions
+# ignore l1_ratio unless penalty="elasticnet", which liblinear doesn't support
+if tuple(int(re.match(r"\d+", p).group()) for p in sklearn.__version__.split(".")[:2]) >= (1, 8):
+    L1_PENALTY = {"l1_ratio": 1.0}
+else:
+    L1_PENALTY = {"penalty": "l1"}
+
+
+def build_model(params):
+    family = params["family"]
+    if family == "logistic_l2":
+        return LogisticRegression(C=params["C"], class_weight=params["class_weight"], max_iter=1000, random_state=SEED)
+    if family == "logistic_l1":
+        return LogisticRegression(
+            C=params["C"], class_weight=params["class_weight"], solver="liblinear",
+            max_iter=1000, random_state=SEED, **L1_PENALTY
+        )
+    if family == "sgd_logistic":
+        return SGDClassifier(
+            loss="log_loss", alpha=params["alpha"], class_weight=params["class_weight"],
+            max_iter=1000, tol=1e-4, random_state=SEED
+        )
+    raise ValueError(f"Unknown model family: {family}")
+
+
+def describe(params):
+    return ", ".join(f"{k}={v}" for k, v in params.items())
+
+
+# ---------------------------
+# Fold cache
+# ---------------------------
+
+def file_checksum(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_dataset(path):
+    df = pd.read_csv(path).dropna()
+    feature_cols = [c for c in df.columns if c != "label"]
+    return df[feature_cols].to_numpy(dtype=np.float64), df["label"].to_numpy(), feature_cols
+
+
+def prepare_folds(X, y, k, cache_dir):
+    """
+    Fits a scaler per training fold and saves the scaled matrices as .npy
+    files once. Workers memory-map them, so no candidate rescales a fold
+    and no fold is pickled through the pool.
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    if (cache_dir / "done").exists():
+        print(f"Using cached folds in {cache_dir}")
+        return
+
+    skf = StratifiedKFold(n_splits=k, shuffle=True, random_state=SEED)
+    for i, (train_idx, test_idx) in enumerate(skf.split(X, y)):
+        scaler = StandardScaler().fit(X[train_idx])
+        np.save(cache_dir / f"fold{i}_X_train.npy", scaler.transform(X[train_idx]))
+        np.save(cache_dir / f"fold{i}_y_train.npy", y[train_idx])
+        np.save(cache_dir / f"fold{i}_X_test.npy", scaler.transform(X[test_idx]))
+        np.save(cache_dir / f"fold{i}_y_test.npy", y[test_idx])
+    (cache_dir / "done").touch()
+    print(f"Scaled {k} folds into {cache_dir}")
+
+
+def load_fold(cache_dir, i):
+    def load(name):
+        return np.load(cache_dir / f"fold{i}_{name}.npy", mmap_mode="r")
+    return load("X_train"), load("y_train"), load("X_test"), load("y_test")
+
+
+def evaluate(task):
+    """Fits one candidate on one fold. Runs in a worker process."""
+    cache_dir, cand_id, params, fold = task
+    X_train, y_train, X_test, y_test = load_fold(cache_dir, fold)
+    start = time.perf_counter()
+    model = build_model(params).fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+    auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+    return cand_id, fold, auc, fit_time
+
+
+# ---------------------------
+# Search
+# ---------------------------
+
+def run_search(cache_dir, candidates, k, workers):
+    tasks = [(cache_dir, cid, params, fold) for cid, params in enumerate(candidates) for fold in range(k)]
+    aucs = [[None] * k for _ in candidates]
+    times = [0.0] * len(candidates)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(evaluate, t) for t in tasks]):
+            cid, fold, auc, fit_time = future.result()
+            aucs[cid][fold] = auc
+            times[cid] += fit_time
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for cid, params in enumerate(candidates):
+        results.append({
+            "params": params,
+            "roc_auc_mean": float(np.mean(aucs[cid])),
+            "roc_auc_std": float(np.std(aucs[cid])),
+            "fold_roc_auc": aucs[cid],
+            "fit_seconds": times[cid]
+        })
+    # Best mean AUC first; the more stable candidate wins a tie
+    results.sort(key=lambda r: (-r["roc_auc_mean"], r["roc_auc_std"]))
+    return results, elapsed
+
+
+def print_results(results, top):
+    print("-" * 30)
+    print("CROSS-VALIDATION RESULTS")
+    print("-" * 30)
+    print(f"{'ROC-AUC':>8} {'std':>7} {'fit s':>7}  candidate")
+    for r in results[:top]:
+        print(f"{r['roc_auc_mean']:8.4f} {r['roc_auc_std']:7.4f} {r['fit_seconds']:7.2f}  {describe(r['params'])}")
+
+
+def save_winner(X, y, feature_cols, best, k, activate=False):
+    """
+    Refits the winner on the usual 80/20 split and writes it to models/
+    with the same metadata fields as train_model.py.
+    """
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=SEED, stratify=y
+    )
+    scaler = StandardScaler().fit(X_train)
+    X_train_scaled = scaler.transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    model = build_model(best["params"]).fit(X_train_scaled, y_train)
+
+    metadata = {
+        "train_accuracy": model.score(X_train_scaled, y_train),
+        "test_accuracy": accuracy_score(y_test, model.predict(X_test_scaled)),
+        "roc_auc": roc_auc_score(y_test, model.predict_proba(X_test_scaled)[:, 1]),
+        "features": feature_cols,
+        "n_samples_train": len(X_train),
+        "n_samples_test": len(X_test),
+        "model_params": best["params"],
+        "cv_folds": k,
+        "cv_roc_auc_mean": best["roc_auc_mean"],
+        "cv_roc_auc_std": best["roc_auc_std"]
+    }
+
+    joblib.dump(scaler, SCALER_FILE)
+    joblib.dump(model, MODEL_FILE)
+    with open(MODEL_PATH / "model_metadata.json", "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    print(f"\nTest Accuracy: {metadata['test_accuracy']:.4f}")
+    print(f"ROC-AUC Score: {metadata['roc_auc']:.4f}")
+    print(f"Model saved to {MODEL_FILE}")
+    publish(model, scaler, metadata, activate=activate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated model selection for the risk model")
+    parser.add_argument("--data", type=Path, default=DATA_PATH)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--top", type=int, default=10, help="candidates to print")
+    parser.add_argument("--no-save", action="store_true", help="report only, keep models/ unchanged")
+    parser.add_argument("--activate", action="store_true", help="make the winner the model the server loads")
+    args = parser.parse_args()
+
+    X, y, feature_cols = load_dataset(args.data)
+    key = hashlib.sha1(f"{file_checksum(args.data)}:{args.folds}:{SEED}".encode()).hexdigest()[:16]
+    cache_dir = CACHE_PATH / key
+    prepare_folds(X, y, args.folds, cache_dir)
+
+    candidates = candidate_grid()
+    print(f"Evaluating {len(candidates)} candidates x {args.folds} folds")
+    results, elapsed = run_search(cache_dir, candidates, args.folds, args.workers)
+    print_results(results, args.top)
+    print(f"\nSearch wall-clock: {elapsed:.2f}s")
+
+    with open(RESULTS_FILE, "w") as f:
+        json.dump({"folds": args.folds, "data": str(args.data), "results": results}, f, indent=2)
+    print(f"Full results saved to {RESULTS_FILE}")
+
+    best = results[0]
+    print(f"\nBest: {describe(best['params'])} (ROC-AUC {best['roc_auc_mean']:.4f} ± {best['roc_auc_std']:.4f})")
+    if not args.no_save:
+        save_winner(X, y, feature_cols, best, args.folds, activate=args.activate)
+
+
+if __name__ == "__main__":
+    main()
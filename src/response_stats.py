@@ -0,0 +1,91 @@
+"""
+Exact running statistics over trial responses, shared by the test1 and
+test2 analyzers (each adds its own error classes and risk scoring).
+"""
+
+# Reaction times are accumulated as exact integers in units of 2**-RT_SHIFT.
+# Every float is an exact multiple of 2**-1074, so running sums never round.
+RT_SHIFT = 1074
+
+def _fixed(x):
+    num, den = float(x).as_integer_ratio()
+    return num * ((1 << RT_SHIFT) // den)
+
+class ResponseStats:
+    """
+    Counts, running sums of reaction times and their squares, and error
+    counters per confusion class, so adding a response is O(1).
+
+    The sums are exact (see RT_SHIFT), so like statistics.mean and
+    statistics.pvariance the mean and variance are correctly rounded and
+    a test's reaction-time thresholds never flip on float noise.
+
+    Subclasses set ERROR_CLASSES (class name -> anything), count errors
+    per class in count_error() and build the analysis in result().
+    """
+
+    ERROR_CLASSES = {}
+
+    def __init__(self):
+        self.n = 0
+        self.correct = 0
+        self.sum_rt = 0      # sum of reaction times, fixed point
+        self.sum_sq_rt = 0   # sum of squared reaction times, fixed point squared
+        self.errors_by_class = {c: 0 for c in self.ERROR_CLASSES}
+
+    def update(self, response):
+        """Adds one response and returns the analysis so far."""
+        self.add(response)
+        return self.result()
+
+    def add(self, response):
+        """Adds one response without building the result (for bulk replay)."""
+        self.n += 1
+        if response["correct"]:
+            self.correct += 1
+        else:
+            self.count_error(response)
+
+        rt = _fixed(response["reaction_time"])
+        self.sum_rt += rt
+        self.sum_sq_rt += rt * rt
+
+    def count_error(self, response):
+        """Increments errors_by_class for an incorrect response."""
+
+    def result(self):
+        raise NotImplementedError
+
+    # int / int true division is correctly rounded, same as the
+    # exact-fraction conversion in the statistics module
+
+    def mean(self):
+        return self.sum_rt / (self.n << RT_SHIFT)
+
+    def pvariance(self):
+        """Population variance, like statistics.pvariance."""
+        n = self.n
+        return (n * self.sum_sq_rt - self.sum_rt * self.sum_rt) / ((n * n) << (2 * RT_SHIFT))
+
+    def copy(self):
+        return type(self).from_state(self.to_state())
+
+    def to_state(self):
+        """JSON-serializable state, for session stores."""
+        return {
+            "n": self.n,
+            "correct": self.correct,
+            "sum_rt": self.sum_rt,
+            "sum_sq_rt": self.sum_sq_rt,
+            "errors_by_class": dict(self.errors_by_class)
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        analyzer = cls()
+        analyzer.n = state["n"]
+        analyzer.correct = state["correct"]
+        analyzer.sum_rt = state["sum_rt"]
+        analyzer.sum_sq_rt = state["sum_sq_rt"]
+        analyzer.errors_by_class.update(state["errors_by_class"])
+        return analyzer
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+# Paths (MODEL_DIR can point elsewhere when the package isn't installed in place)
+MODEL_DIR = Path(os.environ.get("MODEL_DIR", Path(__file__).resolve().parent.parent / "models"))
+MODEL_PATH = MODEL_DIR / "logistic_dyslexia.pkl"
+SCALER_PATH = MODEL_DIR / "scaler.pkl"
+METADATA_PATH = MODEL_DIR / "model_metadata.json"
+
+
+def _sigmoid(z):
+    # exp(-log(1 + exp(-z))) doesn't overflow for large |z|
+    return np.exp(-np.logaddexp(0.0, -z))
+
+
+class RiskModel:
+    """
+    Logistic risk model with the StandardScaler folded into its weights.
+
+    ((x - mean) / scale) . coef + b  ==  x . (coef / scale) + (b - sum(coef * mean / scale))
+
+    so scoring is one dot product per row with plain NumPy, for a single
+    feature dict or a batch of millions of rows.
+    """
+
+    def __init__(self, weights, bias, features, threshold=0.5, version=None):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.features = list(features)
+        self.threshold = threshold
+        self.version = version
+
+    @classmethod
+    def from_arrays(cls, coef, intercept, mean, scale, features, version=None):
+        """From raw logistic coefficients and scaler statistics."""
+        coef = np.asarray(coef, dtype=np.float64)
+        scale = np.asarray(scale, dtype=np.float64)
+        weights = coef / scale
+        bias = intercept - np.dot(coef, np.asarray(mean, dtype=np.float64) / scale)
+        return cls(weights, bias, features, version=version)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, features):
+        coef = model.coef_.ravel()
+        mean = scaler.mean_ if scaler.with_mean else np.zeros_like(coef)
+        scale = scaler.scale_ if scaler.with_std else np.ones_like(coef)
+        return cls.from_arrays(coef, model.intercept_[0], mean, scale, features)
+
+    @classmethod
+    def load(cls, model_path=MODEL_PATH, scaler_path=SCALER_PATH, metadata_path=METADATA_PATH):
+        """Loads the pickled sklearn model and scaler once and folds them."""
+        import joblib
+
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        return cls.from_sklearn(model, scaler, metadata["features"])
+
+    # ---------------- SCORING ----------------
+
+    def to_matrix(self, rows):
+        """Feature dicts -> (n, n_features) array in model feature order."""
+        return np.array([[row[f] for f in self.features] for row in rows], dtype=np.float64)
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return X @ self.weights + self.bias
+
+    def predict_proba(self, X):
+        """Probability of the high-risk class for each row of X."""
+        return _sigmoid(self.decision_function(X))
+
+    def predict(self, X):
+        return (self.predict_proba(X) > self.threshold).astype(np.int64)
+
+    def score(self, features):
+        """Scores one feature dict. Returns (pred_class, pred_prob)."""
+        x = np.fromiter((features[f] for f in self.features), dtype=np.float64, count=len(self.features))
+        prob = float(_sigmoid(x @ self.weights + self.bias))
+        return int(prob > self.threshold), prob
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def load_default():
+    """The registry's active version if there is one, else the pickles."""
+    from model_registry import get_registry
+
+    registry = get_registry()
+    if registry.active_version() is not None:
+        return registry.load()
+    return RiskModel.load()
+
+
+def get_model():
+    """Process-wide model, loaded on first use."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_default()
+    return _model
+
+
+def set_model(model):
+    """Swaps the process-wide model. Callers already holding the old one keep it."""
+    global _model
+    _model = model
+
+
+# ---------------- MICRO-BATCHING ----------------
+
+class MicroBatcher:
+    """
+    Collects single-row requests from many threads and scores them together.
+
+    A worker waits for the first row, then gathers more for up to `max_wait`
+    seconds or `max_batch` rows, and scores the whole batch in one call.
+    Assigning `model` swaps it atomically: each batch uses the model that
+    was current when the batch started.
+    """
+
+    def __init__(self, model, max_batch=256, max_wait=0.002):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name="predict-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, features):
+        """Queues one feature dict; the Future resolves to (pred_class, pred_prob)."""
+        future = Future()
+        self._queue.put((features, future))
+        return future
+
+    def predict(self, features, timeout=1.0):
+        return self.submit(features).result(timeout=timeout)
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            model = self.model
+            rows, futures = [], []
+            for features, future in batch:
+                try:
+                    rows.append([float(features[f]) for f in model.features])
+                    futures.append(future)
+                except (KeyError, TypeError, ValueError) as e:
+                    future.set_exception(ValueError(f"Invalid features: {e}"))
+            if not rows:
+                continue
+
+            try:
+                probs = model.predict_proba(np.array(rows))
+            except Exception as e:
+                for f in futures:
+                    f.set_exception(e)
+                continue
+            for f, p in zip(futures, probs):
+                f.set_result((int(p > model.threshold), float(p)))
+
+
+# ---------------- BENCHMARK ----------------
+
+def benchmark(n_rows):
+    import joblib
+    import pandas as pd
+
+    model = joblib.load(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    with open(METADATA_PATH) as f:
+        feature_cols = json.load(f)["features"]
+    risk_model = RiskModel.from_sklearn(model, scaler, feature_cols)
+
+    rng = np.random.default_rng(42)
+    X = np.abs(rng.normal(800, 300, (n_rows, len(feature_cols))))
+    rows = [dict(zip(feature_cols, x)) for x in X.tolist()]
+
+    # Current path: one-row DataFrame per word
+    n_single = min(n_rows, 2000)
+    start = time.perf_counter()
+    ref = []
+    for row in rows[:n_single]:
+        X_row = scaler.transform(pd.DataFrame([row])[feature_cols])
+        ref.append(model.predict_proba(X_row)[0][1])
+    df_time = (time.perf_counter() - start) / n_single
+
+    start = time.perf_counter()
+    single = [risk_model.score(row)[1] for row in rows[:n_single]]
+    single_time = (time.perf_counter() - start) / n_single
+
+    start = time.perf_counter()
+    batch = risk_model.predict_proba(X)
+    batch_time = (time.perf_counter() - start) / n_rows
+
+    max_diff = max(np.max(np.abs(np.array(ref) - np.array(single))), np.max(np.abs(np.array(ref) - batch[:n_single])))
+
+    print(f"DataFrame per row:    {df_time * 1e6:10.2f} us/row")
+    print(f"RiskModel.score:      {single_time * 1e6:10.2f} us/row ({df_time / single_time:.0f}x)")
+    print(f"RiskModel batch {n_rows}: {batch_time * 1e6:10.4f} us/row ({df_time / batch_time:.0f}x)")
+    print(f"Max |prob diff| vs sklearn: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Risk model inference")
+    parser.add_argument("command", choices=["benchmark"])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    benchmark(args.rows)
@@ -1,9 +1,13 @@
+import logging
+import queue
 import random
-import requests
-import re
+import threading
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
-OLLAMA_MODEL = "conclave-ai"
+from llm_client import get_client
+
+from .pair_index import get_index
+
+log = logging.getLogger(__name__)
 
 # Static fallback pairs (last-resort only)
 FALLBACKS = {
@@ -16,9 +20,24 @@ FALLBACKS = {
         "audio_word": "pat",
         "options": ["pat", "qat"],
         "correct_index": 0
+    },
+    "m/n": {
+        "audio_word": "man",
+        "options": ["man", "nan"],
+        "correct_index": 0
     }
 }
 
+# Ask the LLM for new words in the background to grow the pair index.
+# Trials are always served from the index, never from a blocking LLM call.
+LLM_ENRICHMENT = True
+# Candidate words requested per LLM call
+ENRICH_BATCH_SIZE = 5
+
+_enrich_jobs = queue.Queue(maxsize=1)
+_enrich_thread = None
+_enrich_lock = threading.Lock()
+
 def infer_focus(prompt_hints):
     phonemes = prompt_hints.get("target_phonemes", [])
 
@@ -26,110 +45,94 @@ def infer_focus(prompt_hints):
         return "b/d"
     if set(phonemes) == {"p", "q"}:
         return "p/q"
+    if set(phonemes) == {"m", "n"}:
+        return "m/n"
 
     return "b/d"
 
+def request_llm_words(focus, exclude_words, k=ENRICH_BATCH_SIZE):
+    """
+    Asks the LLM for `k` child-friendly words for the focus phonemes in one call.
+    Blocking; only called from the enrichment thread.
+    """
+    prompt = f"""
+Task: Generate simple words for a sound-matching test.
+
+Constraints:
+- Focus phonemes: {focus.replace('/', ' and ')}
+- Word length: 3 to 4 letters
+- Child-friendly words
+- No punctuation
+- Output ONLY the words (no sentence, no explanation)
+- DO NOT use these words: {', '.join(exclude_words)}
+"""
+
+    words = get_client().generate_words(prompt, k, temperature=0.7, timeout=5)
+    if not words:
+        raise ValueError("Empty response")
+    return words
+
+def _enrich_worker():
+    index = get_index()
+    while True:
+        focus, exclude_words = _enrich_jobs.get()
+        try:
+            for word in request_llm_words(focus, exclude_words):
+                if index.add_word(word):
+                    log.info("Added LLM word to pair index: %s", word, extra={"word": word})
+        except Exception as e:
+            log.warning("LLM enrichment failed: %s", e)
+
+def enrich_async(focus, exclude_words):
+    """
+    Queues one LLM enrichment request. Dropped if one is already pending,
+    so a slow or missing Ollama never builds up a backlog.
+    """
+    global _enrich_thread
+    with _enrich_lock:
+        if _enrich_thread is None:
+            _enrich_thread = threading.Thread(target=_enrich_worker, name="pair-enrichment", daemon=True)
+            _enrich_thread.start()
+    try:
+        _enrich_jobs.put_nowait((focus, sorted(exclude_words)))
+    except queue.Full:
+        pass
+
 def generate_pair(prompt_hints, exclude_words=None):
     """
-    Generates a minimal-pair task using GenAI.
-    Falls back to static pairs if generation fails.
+    Generates a minimal-pair task from the precomputed pair index.
+    Falls back to static pairs if every indexed word is excluded.
     exclude_words: list of words to avoid generating.
     """
     if exclude_words is None:
         exclude_words = []
     
     # Normalize exclude list
-    exclude_words = [w.lower().strip() for w in exclude_words]
+    exclude_words = set(w.lower().strip() for w in exclude_words)
 
     focus = infer_focus(prompt_hints)
 
-    # ---- Build prompt ----
-    prompt = f"""
-Task: Generate ONE simple word for a sound-matching test.
+    if LLM_ENRICHMENT:
+        enrich_async(focus, exclude_words)
 
-Constraints:
-- Focus phonemes: {focus.replace('/', ' and ')}
-- Word length: 3 to 4 letters
-- Child-friendly word
-- No punctuation
-- Output ONLY the word (no sentence, no explanation)
-- DO NOT use these words: {', '.join(exclude_words)}
-"""
+    picked = get_index().pick(focus, exclude_words)
 
-    try:
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7 
-                }
-            },
-            timeout=5
-        )
-
-        data = response.json()
-
-        if "response" not in data:
-            raise ValueError("Invalid LLM response")
-
-        raw_response = data["response"].strip()
-        
-        # ---- Clean up response (handling accidental sentences) ----
-        # 1. Remove punctuation
-        clean_response = re.sub(r'[^\w\s]', '', raw_response)
-        # 2. Split by whitespace
-        words = clean_response.split()
-        
-        # 3. If multiple words, try to pick the most likely candidate 
-        # (e.g., last word often contains the object, or just the first valid one)
-        # For safety, let's take the last word if it's short, assuming "The word is cat" format.
-        if len(words) > 1:
-            # simple heuristic: take the last word that matches length constraints
-            valid_words = [w for w in words if 3 <= len(w) <= 5]
-            if valid_words:
-                word = valid_words[-1].lower()
-            else:
-                word = words[-1].lower() # fallback
-        elif len(words) == 1:
-            word = words[0].lower()
-        else:
-            raise ValueError("Empty response")
-
-        # Check against exclude list
-        if word in exclude_words:
-             print(f"⚠️ Generated excluded word '{word}', retrying logic or fallback...")
-             # In a real retry loop we'd go again, for now fallback or modify
-             # Let's try to flip it? No, just rely on fallback or hope shuffling fixes it.
-             # Actually, if we hit an excluded word, we might want to return a fallback 
-             # that ISN'T the same one if possible. 
-             pass # For now, proceed, but it's not ideal.
-
-        # ---- Build minimal pair ----
-        if focus == "b/d":
-            options = [word.replace("b", "d"), word] if "b" in word else [word, word.replace("d", "b")]
-        elif focus == "p/q":
-            options = [word.replace("p", "q"), word] if "p" in word else [word, word.replace("q", "p")]
-        else:
-            raise ValueError("Unknown focus")
-
-        random.shuffle(options)
-
-        return {
-            "audio_word": word,
-            "options": options,
-            "correct_index": options.index(word)
-        }
-
-    except Exception as e:
+    if picked is None:
         # ---- SAFE FALLBACK ----
-        print("⚠️ Falling back due to:", e)
-        # Try to return a fallback that isn't in exclude list if possible
-        fallback = FALLBACKS.get(focus)
-        if fallback and fallback["audio_word"] not in exclude_words:
-            return fallback
-        # If fallback is also excluded, strictly speaking we are stuck, 
-        # but returning it is better than crashing.
-        return fallback
+        log.warning("Pair index exhausted for %s, using fallback", focus, extra={"focus": focus})
+        # Copy so callers can annotate the pair without mutating FALLBACKS.
+        # If the fallback is also excluded, returning it is better than crashing.
+        fallback = FALLBACKS.get(focus, FALLBACKS["b/d"])
+        return dict(fallback, options=list(fallback["options"]), source="fallback")
+
+    word, distractor = picked
+    options = [word, distractor]
+    random.shuffle(options)
+
+    return {
+        "audio_word": word,
+        "options": options,
+        "correct_index": options.index(word),
+        # Where the pair came from, for the server's metrics (not sent to clients)
+        "source": "index"
+    }
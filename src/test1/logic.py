@@ -1,20 +1,24 @@
-import statistics
+from response_stats import ResponseStats
 
 SUSPECT_THRESHOLD = 0.5
 LOW_RISK_THRESHOLD = 0.35
 
-def analyze_responses(responses):
-    accuracy = sum(r["correct"] for r in responses) / len(responses)
-
-    reaction_times = [r["reaction_time"] for r in responses]
-    avg_rt = statistics.mean(reaction_times)
-    var_rt = statistics.pvariance(reaction_times)
+# Risk rule cut-offs (also read by bulk_scoring, so changes apply to both)
+PHONEME_ERRORS_MIN = 2
+LOW_ACCURACY = 0.8
+SLOW_RT = 1.6
+VERY_SLOW_RT = 1.8
+HIGH_ACCURACY = 0.85
+HIGH_VAR_RT = 0.5
+VERY_HIGH_VAR_RT = 0.8
 
-    phoneme_errors = sum(
-        1 for r in responses
-        if not r["correct"] and r["audio"] in ["bed", "bad", "dad"]
-    )
+# Words whose errors count as phoneme errors, per confusion class
+PHONEME_CLASS_WORDS = {
+    "b/d": {"bed", "bad", "dad"},
+}
 
+def score(accuracy, avg_rt, var_rt, phoneme_errors):
+    """Applies the risk rules to the aggregate statistics of a session."""
     scores = {
         "phonological": 0.0,
         "fluency": 0.0,
@@ -22,21 +26,21 @@ def analyze_responses(responses):
     }
 
     # phonological
-    if phoneme_errors >= 2:
+    if phoneme_errors >= PHONEME_ERRORS_MIN:
         scores["phonological"] += 0.5
-    if accuracy < 0.8:
+    if accuracy < LOW_ACCURACY:
         scores["phonological"] += 0.3
 
     # fluency
-    if avg_rt > 1.6:
+    if avg_rt > SLOW_RT:
         scores["fluency"] += 0.4
-    if accuracy >= 0.85 and avg_rt > 1.8:
+    if accuracy >= HIGH_ACCURACY and avg_rt > VERY_SLOW_RT:
         scores["fluency"] += 0.3
 
     # attention
-    if var_rt > 0.5:
+    if var_rt > HIGH_VAR_RT:
         scores["attention"] += 0.5
-    if var_rt > 0.8:
+    if var_rt > VERY_HIGH_VAR_RT:
         scores["attention"] += 0.2
 
     issues = []
@@ -69,3 +73,42 @@ def analyze_responses(responses):
         "assessment": label,
         "prompt_hints": prompt_hints
     }
+
+class IncrementalAnalyzer(ResponseStats):
+    """
+    Running version of analyze_responses: `update(response)` is O(1) and
+    returns the same dict as analyze_responses over all responses so far.
+    Errors on PHONEME_CLASS_WORDS count as phoneme errors.
+    """
+
+    ERROR_CLASSES = PHONEME_CLASS_WORDS
+
+    def count_error(self, response):
+        word = response.get("audio")
+        for c, words in PHONEME_CLASS_WORDS.items():
+            if word in words:
+                self.errors_by_class[c] += 1
+
+    def result(self):
+        if self.n == 0:
+            return {
+                "accuracy": 0.0,
+                "avg_rt": 0.0,
+                "var_rt": 0.0,
+                "risk_scores": {"phonological": 0.0, "fluency": 0.0, "attention": 0.0},
+                "assessment": "insufficient data",
+                "prompt_hints": {"target_phonemes": [], "task_length": "normal", "difficulty": "normal"}
+            }
+
+        return score(
+            self.correct / self.n,
+            self.mean(),
+            self.pvariance(),
+            self.errors_by_class["b/d"]
+        )
+
+def analyze_responses(responses):
+    analyzer = IncrementalAnalyzer()
+    for r in responses:
+        analyzer.add(r)
+    return analyzer.result()
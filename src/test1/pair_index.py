@@ -0,0 +1,124 @@
+import os
+import random
+import threading
+
+WORDS_FILE = os.path.join(os.path.dirname(__file__), "words.txt")
+
+# Letter confusion classes used to build distractors
+CONFUSION_CLASSES = {
+    "b/d": ("b", "d"),
+    "p/q": ("p", "q"),
+    "m/n": ("m", "n"),
+}
+
+MIN_WORD_LEN = 3
+MAX_WORD_LEN = 4
+
+
+def load_words(path=WORDS_FILE):
+    with open(path) as f:
+        return [
+            line.strip().lower() for line in f
+            if line.strip() and not line.startswith("#")
+        ]
+
+
+def make_distractor(word, focus):
+    """
+    Swaps the first letter of `word` that belongs to the focus class
+    ("bed" -> "ded", "dog" -> "bog"). Returns None if nothing to swap.
+    """
+    a, b = CONFUSION_CLASSES[focus]
+    for i, ch in enumerate(word):
+        if ch == a:
+            return word[:i] + b + word[i + 1:]
+        if ch == b:
+            return word[:i] + a + word[i + 1:]
+    return None
+
+
+class MinimalPairIndex:
+    """
+    Precomputed word -> distractor pairs per confusion class.
+
+    `pick(focus, exclude)` answers "give me an unused word for focus X"
+    from memory, so trial generation never waits on the LLM. New words
+    (e.g. from the LLM) can be added at any time with `add_word`.
+    Real-word distractors ("dog" / "bog") are preferred over made-up ones.
+    """
+
+    def __init__(self, words=(), classes=CONFUSION_CLASSES):
+        self.classes = classes
+        # focus -> [(word, distractor)], split by whether the distractor is a real word
+        self._real = {focus: [] for focus in classes}
+        self._pseudo = {focus: [] for focus in classes}
+        self._words = set()
+        self._lock = threading.Lock()
+
+        words = [w for w in words if self._valid(w)]
+        self._words.update(words)
+        for word in sorted(set(words)):
+            self._add_pairs(word)
+
+    @staticmethod
+    def _valid(word):
+        return word.isalpha() and MIN_WORD_LEN <= len(word) <= MAX_WORD_LEN
+
+    def _add_pairs(self, word):
+        for focus in self.classes:
+            distractor = make_distractor(word, focus)
+            if distractor is None:
+                continue
+            if distractor in self._words:
+                self._real[focus].append((word, distractor))
+            else:
+                self._pseudo[focus].append((word, distractor))
+
+    def add_word(self, word):
+        """Adds a word at runtime. Returns False if it was invalid or already indexed."""
+        word = word.lower().strip()
+        if not self._valid(word):
+            return False
+        with self._lock:
+            if word in self._words:
+                return False
+            self._words.add(word)
+            self._add_pairs(word)
+        return True
+
+    def __contains__(self, word):
+        return word in self._words
+
+    def count(self, focus):
+        return len(self._real.get(focus, [])) + len(self._pseudo.get(focus, []))
+
+    def pick(self, focus, exclude=(), rng=random):
+        """
+        Returns an unused (word, distractor) pair for `focus`, or None when
+        every indexed word has been excluded.
+        """
+        for pairs in (self._real.get(focus), self._pseudo.get(focus)):
+            if not pairs:
+                continue
+            # Scan from a random start so trials vary between sessions
+            n = len(pairs)
+            start = rng.randrange(n)
+            for i in range(n):
+                word, distractor = pairs[(start + i) % n]
+                if word not in exclude:
+                    return word, distractor
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Shared index built from the bundled word list on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = MinimalPairIndex(load_words())
+    return _index
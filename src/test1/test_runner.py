@@ -1,13 +1,11 @@
 import time
-import requests
+from llm_client import get_client
 from .baseline import BASELINE_PAIRS
 from .generator import generate_pair
 from .logic import analyze_responses
 from .prompt_builder import build_prompt
 
 MAX_TRIALS = 10
-OLLAMA_URL = "http://localhost:11434/api/generate"
-OLLAMA_MODEL = "conclave-ai"
 
 
 def simulate_user_choice(pair):
@@ -28,16 +26,7 @@ def generate_adaptive_question(prompt_hints):
     """
     prompt = build_prompt(prompt_hints)
 
-    response = requests.post(
-        OLLAMA_URL,
-        json={
-            "model": OLLAMA_MODEL,
-            "prompt": prompt,
-            "stream": False
-        }
-    )
-
-    return response.json()["response"]
+    return get_client().generate(prompt)
 
 
 def run_test():
@@ -1,23 +1,21 @@
+import logging
 import random
-import requests
 import re
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
-OLLAMA_MODEL = "conclave-ai"
+from llm_client import get_async_client, get_client
+
+log = logging.getLogger(__name__)
 
 FALLBACK_WORDS = ["bear", "pear", "deal", "real", "fan", "van"]
 
-def generate_pair(prompt_hints, exclude_words=None):
-    if exclude_words is None:
-        exclude_words = []
-    
+def build_prompt(prompt_hints, exclude_words):
     target_phonemes = prompt_hints.get("target_phonemes", [])
     
     # Simple fallback if no specific phoneme target (e.g. fluency/attention risk only)
     if not target_phonemes:
         target_phonemes = ["b", "p"] # default to common confusers
 
-    prompt = f"""
+    return f"""
 Task: Generate ONE simple word for a reading test.
 Constraints:
 - Must contain one of these letters: {', '.join(target_phonemes)}
@@ -28,29 +26,17 @@ Constraints:
 Output ONLY the word.
 """
 
-    try:
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.8}
-            },
-            timeout=3
-        )
-        data = response.json()
-        raw_word = data.get("response", "").strip().lower()
-        word = re.sub(r'[^\w]', '', raw_word)
-        
-        if not word or word in exclude_words:
-            raise ValueError("Invalid word generated")
+def clean_word(raw_word, exclude_words):
+    word = re.sub(r'[^\w]', '', raw_word.strip().lower())
+    if not word or word in exclude_words:
+        raise ValueError("Invalid word generated")
+    return word
 
-    except Exception as e:
-        print(f"Gen error: {e}. Using fallback.")
-        available = [w for w in FALLBACK_WORDS if w not in exclude_words]
-        word = random.choice(available) if available else "cat"
+def fallback_word(exclude_words):
+    available = [w for w in FALLBACK_WORDS if w not in exclude_words]
+    return random.choice(available) if available else "cat"
 
+def make_pair(word, source):
     # Create a distractor
     # Quick heuristic: change 1 letter to make a distractor 
     # (or use a rhyme if we had a phonetic dictionary, here we fake it)
@@ -70,5 +56,43 @@ Output ONLY the word.
     return {
         "audio_word": word,
         "options": options,
-        "correct_index": options.index(word)
+        "correct_index": options.index(word),
+        # "llm" or "fallback", for the server's metrics (not sent to clients)
+        "source": source
     }
+
+def generate_pair(prompt_hints, exclude_words=None):
+    if exclude_words is None:
+        exclude_words = []
+
+    prompt = build_prompt(prompt_hints, exclude_words)
+
+    try:
+        # Shared client: pooled connection, and an open circuit breaker
+        # skips straight to the fallback instead of waiting out the timeout.
+        word = clean_word(get_client().generate(prompt, temperature=0.8, timeout=3), exclude_words)
+    except Exception as e:
+        log.warning("Gen error: %s. Using fallback.", e)
+        return make_pair(fallback_word(exclude_words), "fallback")
+
+    return make_pair(word, "llm")
+
+async def generate_pair_async(prompt_hints, exclude_words=None, timeout=3):
+    """
+    generate_pair for the async server: the LLM call only suspends the
+    coroutine, and gives up after `timeout` seconds. Cancelling the caller
+    cancels the request to Ollama.
+    """
+    if exclude_words is None:
+        exclude_words = []
+
+    prompt = build_prompt(prompt_hints, exclude_words)
+
+    try:
+        raw_word = await get_async_client().generate(prompt, temperature=0.8, timeout=timeout)
+        word = clean_word(raw_word, exclude_words)
+    except Exception as e:
+        log.warning("Gen error: %s. Using fallback.", e)
+        return make_pair(fallback_word(exclude_words), "fallback")
+
+    return make_pair(word, "llm")
@@ -1,24 +1,23 @@
-import statistics
+from response_stats import ResponseStats
 
 SUSPECT_THRESHOLD = 0.5
 LOW_RISK_THRESHOLD = 0.35
 
-def analyze_responses(responses):
-    if not responses:
-        return {
-            "accuracy": 0.0,
-            "avg_rt": 0.0,
-            "var_rt": 0.0,
-            "risk_scores": {"phonological": 0.0, "fluency": 0.0, "attention": 0.0},
-            "assessment": "insufficient data",
-            "prompt_hints": {}
-        }
-
-    accuracy = sum(r["correct"] for r in responses) / len(responses)
-    reaction_times = [r["reaction_time"] for r in responses]
-    avg_rt = statistics.mean(reaction_times)
-    var_rt = statistics.pvariance(reaction_times) if len(reaction_times) > 1 else 0.0
+# Risk rule cut-offs (also read by bulk_scoring, so changes apply to both)
+SLOW_RT = 1.5
+VERY_SLOW_RT = 1.8
+HIGH_ACCURACY = 0.9
+HIGH_VAR_RT = 0.4
+
+# Confusable letter classes tracked for errors (informational; every
+# error counts towards the phonological score in test2)
+PHONEME_CLASSES = {
+    "b/d": ("b", "d"),
+    "p/q": ("p", "q"),
+}
 
+def score(accuracy, avg_rt, var_rt, phoneme_errors):
+    """Applies the risk rules to the aggregate statistics of a session."""
     # Custom logic for "zconditions" (risk factors)
     # Using similar heuristic as test1 for now
     scores = {
@@ -29,22 +28,18 @@ def analyze_responses(responses):
 
     # Phonological checks (e.g., error on similarity)
     # Here we assume specific pairs target p/b/d confusability
-    phoneme_errors = sum(
-        1 for r in responses
-        if not r["correct"] # Simplified check compared to test1 which checked specific audio words
-    )
-    
+    # (every error counts, simplified compared to test1 which checked specific audio words)
     if phoneme_errors >= 1: # stricter for "pinpointing"
          scores["phonological"] += 0.5 * phoneme_errors
 
     # Fluency checks
-    if avg_rt > 1.5:
+    if avg_rt > SLOW_RT:
         scores["fluency"] += 0.4
-    if accuracy >= 0.9 and avg_rt > 1.8: # high accuracy but slow
+    if accuracy >= HIGH_ACCURACY and avg_rt > VERY_SLOW_RT: # high accuracy but slow
         scores["fluency"] += 0.3
 
     # Attention checks
-    if var_rt > 0.4:
+    if var_rt > HIGH_VAR_RT:
         scores["attention"] += 0.5
 
     # Normalize max score to 1.0 for now for safety
@@ -83,3 +78,47 @@ def analyze_responses(responses):
         "assessment": label,
         "prompt_hints": prompt_hints
     }
+
+class IncrementalAnalyzer(ResponseStats):
+    """
+    Running version of analyze_responses: `update(response)` is O(1) and
+    returns the same dict as analyze_responses over all responses so far.
+    Every error counts towards the phonological score; errors_by_class
+    only records which confusable letters the missed words contained.
+    """
+
+    ERROR_CLASSES = PHONEME_CLASSES
+
+    def count_error(self, response):
+        word = response.get("text_word", response.get("audio")) or ""
+        for c, letters in PHONEME_CLASSES.items():
+            if any(ch in word for ch in letters):
+                self.errors_by_class[c] += 1
+
+    @property
+    def errors(self):
+        return self.n - self.correct
+
+    def result(self):
+        if self.n == 0:
+            return {
+                "accuracy": 0.0,
+                "avg_rt": 0.0,
+                "var_rt": 0.0,
+                "risk_scores": {"phonological": 0.0, "fluency": 0.0, "attention": 0.0},
+                "assessment": "insufficient data",
+                "prompt_hints": {}
+            }
+
+        return score(
+            self.correct / self.n,
+            self.mean(),
+            self.pvariance(),   # 0.0 for a single response
+            self.errors
+        )
+
+def analyze_responses(responses):
+    analyzer = IncrementalAnalyzer()
+    for r in responses:
+        analyzer.add(r)
+    return analyzer.result()
@@ -1,11 +1,17 @@
+import argparse
+import json
+import os
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, roc_auc_score
 import joblib
 
+from model_registry import ModelRegistry
+
 # Paths
 DATA_PATH = Path("data/synthetic_dyslexia.csv")
 MODEL_PATH = Path("models")
@@ -13,10 +19,23 @@ MODEL_PATH.mkdir(exist_ok=True)
 
 MODEL_FILE = MODEL_PATH / "logistic_dyslexia.pkl"
 SCALER_FILE = MODEL_PATH / "scaler.pkl"
+CHECKPOINT_FILE = MODEL_PATH / "checkpoint.pkl"
+REGISTRY_PATH = MODEL_PATH / "registry"
 
-def main():
+def publish(model, scaler, metadata, activate=False):
+    """
+    Adds the model to the registry. It only becomes the version the server
+    loads with `activate` (--activate), or once activated after review.
+    """
+    version = ModelRegistry(REGISTRY_PATH).publish_sklearn(model, scaler, metadata, activate=activate)
+    if activate:
+        print(f"Published to model registry as {version} (active)")
+    else:
+        print(f"Published to model registry as {version}; activate with: python src/model_registry.py activate {version}")
+
+def train_in_memory(data_path=DATA_PATH, activate=False):
     # Load dataset
-    df = pd.read_csv(DATA_PATH)
+    df = pd.read_csv(data_path)
     
     # Check for missing values
     if df.isnull().sum().sum() > 0:
@@ -107,9 +126,220 @@ def main():
         'n_samples_test': len(X_test)
     }
     
-    import json
     with open(MODEL_PATH / "model_metadata.json", 'w') as f:
         json.dump(metadata, f, indent=2)
+    publish(model, scaler, metadata, activate=activate)
+
+
+# ---------------------------
+# Out-of-core training
+# ---------------------------
+# The dataset is read in chunks and never held in memory at once:
+#   pass 1      running StandardScaler (partial_fit) + class counts
+#   epochs      SGD logistic regression (partial_fit) on scaled chunks
+#   final pass  train/test metrics
+# A checkpoint is written to models/ after every epoch (and every
+# --checkpoint-every chunks), so an interrupted run picks up where it
+# stopped with --resume.
+
+TEST_SIZE = 0.2
+SEED = 42
+
+def read_chunks(path, chunk_size):
+    """Yields DataFrame chunks of a CSV or Parquet file, or a directory of Parquet partitions."""
+    path = Path(path)
+    if path.is_dir():
+        import pyarrow.dataset as ds
+        # Partition directories (date=...) are not turned into feature columns
+        for batch in ds.dataset(path, format="parquet").to_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+def is_test_row(row_index, test_size=TEST_SIZE):
+    """
+    Deterministic hold-out split by global row number, so the split is
+    the same for every pass, every chunk size and every resumed run.
+    """
+    h = (row_index.astype(np.uint64) + np.uint64(SEED)) * np.uint64(0x9E3779B97F4A7C15)
+    return (h >> np.uint64(40)) < np.uint64(int(test_size * (1 << 24)))
+
+def iter_split(path, chunk_size, feature_cols=None):
+    """Yields (X, y, test_mask) per chunk with rows containing NaN dropped."""
+    start = 0
+    for df in read_chunks(path, chunk_size):
+        row_index = np.arange(start, start + len(df))
+        start += len(df)
+        keep = ~df.isnull().any(axis=1).to_numpy()
+        df = df[keep]
+        cols = feature_cols or [c for c in df.columns if c != "label"]
+        yield df[cols].to_numpy(dtype=np.float64), df["label"].to_numpy(), is_test_row(row_index[keep]), cols
+
+def save_checkpoint(state):
+    tmp = CHECKPOINT_FILE.with_suffix(".tmp")
+    joblib.dump(state, tmp)
+    os.replace(tmp, CHECKPOINT_FILE)
+
+def new_checkpoint(args):
+    return {
+        "data": str(args.data),
+        "chunk_size": args.chunk_size,
+        "stage": "scaler",      # scaler -> sgd
+        "scaler": StandardScaler(),
+        "class_counts": np.zeros(2, dtype=np.int64),
+        "features": None,
+        "model": None,
+        "epoch": 0,             # completed epochs
+        "chunk": 0,             # completed chunks in the current epoch
+    }
+
+def load_checkpoint(args):
+    if not CHECKPOINT_FILE.exists():
+        print("No checkpoint found, starting from scratch.")
+        return new_checkpoint(args)
+
+    state = joblib.load(CHECKPOINT_FILE)
+    if state["data"] != str(args.data) or state["chunk_size"] != args.chunk_size:
+        raise SystemExit(
+            f"Checkpoint was made for {state['data']} with chunk size {state['chunk_size']}; "
+            "use the same --data and --chunk-size or start without --resume."
+        )
+    print(f"Resuming from {CHECKPOINT_FILE}: stage={state['stage']}, epoch={state['epoch']}, chunk={state['chunk']}")
+    return state
+
+def train_streaming(args):
+    state = load_checkpoint(args) if args.resume else new_checkpoint(args)
+
+    # ---------------------------
+    # Pass 1: scaler statistics
+    # ---------------------------
+    if state["stage"] == "scaler":
+        print("-" * 30)
+        print("PASS 1: SCALER")
+        print("-" * 30)
+        scaler = state["scaler"]
+        for X, y, test, cols in iter_split(args.data, args.chunk_size):
+            state["features"] = cols
+            train = ~test
+            if train.any():
+                scaler.partial_fit(X[train])
+                state["class_counts"] += np.bincount(y[train], minlength=2)
+        n_train = int(state["class_counts"].sum())
+        print(f"Training rows: {n_train} (class counts {state['class_counts'].tolist()})")
+
+        # Same weighting as class_weight='balanced', which partial_fit can't compute itself
+        counts = state["class_counts"]
+        class_weight = {c: n_train / (2 * counts[c]) for c in (0, 1) if counts[c]}
+        state["model"] = SGDClassifier(
+            loss="log_loss",
+            alpha=args.alpha,
+            learning_rate="optimal",
+            class_weight=class_weight,
+            random_state=SEED
+        )
+        state["stage"] = "sgd"
+        save_checkpoint(state)
+
+    scaler = state["scaler"]
+    model = state["model"]
+    feature_cols = state["features"]
+
+    # ---------------------------
+    # SGD epochs
+    # ---------------------------
+    rng = np.random.default_rng(SEED)
+    while state["epoch"] < args.epochs:
+        print(f"Epoch {state['epoch'] + 1}/{args.epochs}")
+        for i, (X, y, test, _) in enumerate(iter_split(args.data, args.chunk_size, feature_cols)):
+            if i < state["chunk"]:
+                continue   # already trained before the restart
+            train = ~test
+            if train.any():
+                order = rng.permutation(int(train.sum()))
+                model.partial_fit(scaler.transform(X[train])[order], y[train][order], classes=np.array([0, 1]))
+            state["chunk"] = i + 1
+            if args.checkpoint_every and state["chunk"] % args.checkpoint_every == 0:
+                save_checkpoint(state)
+        state["epoch"] += 1
+        state["chunk"] = 0
+        save_checkpoint(state)
+
+    # ---------------------------
+    # Model Evaluation
+    # ---------------------------
+    print("\n" + "-" * 30)
+    print("MODEL EVALUATION")
+    print("-" * 30)
+    n_train = n_test = train_correct = 0
+    cm = np.zeros((2, 2), dtype=np.int64)
+    test_labels, test_probs = [], []
+    for X, y, test, _ in iter_split(args.data, args.chunk_size, feature_cols):
+        X_scaled = scaler.transform(X)
+        y_pred = model.predict(X_scaled)
+        n_train += int((~test).sum())
+        train_correct += int((y_pred[~test] == y[~test]).sum())
+        if test.any():
+            n_test += int(test.sum())
+            np.add.at(cm, (y[test], y_pred[test]), 1)
+            test_labels.append(y[test])
+            test_probs.append(model.predict_proba(X_scaled[test])[:, 1].astype(np.float32))
+
+    train_acc = train_correct / n_train
+    test_acc = np.trace(cm) / n_test
+    roc_auc = roc_auc_score(np.concatenate(test_labels), np.concatenate(test_probs))
+
+    print(f"Training Accuracy: {train_acc:.4f}")
+    print(f"Test Accuracy: {test_acc:.4f}")
+    print(f"ROC-AUC Score: {roc_auc:.4f}")
+
+    print("-" * 30)
+    print("CONFUSION MATRIX")
+    print("-" * 30)
+    print(cm)
+    print(f"\nTrue Negatives: {cm[0,0]}, False Positives: {cm[0,1]}")
+    print(f"False Negatives: {cm[1,0]}, True Positives: {cm[1,1]}")
+
+    # ---------------------------
+    # Save trained model
+    # ---------------------------
+    joblib.dump(scaler, SCALER_FILE)
+    joblib.dump(model, MODEL_FILE)
+
+    metadata = {
+        'train_accuracy': train_acc,
+        'test_accuracy': float(test_acc),
+        'roc_auc': float(roc_auc),
+        'features': feature_cols,
+        'n_samples_train': n_train,
+        'n_samples_test': n_test
+    }
+
+    with open(MODEL_PATH / "model_metadata.json", 'w') as f:
+        json.dump(metadata, f, indent=2)
+    print(f"\nModel saved to {MODEL_FILE}")
+    publish(model, scaler, metadata, activate=args.activate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the dyslexia risk model")
+    parser.add_argument("--stream", action="store_true", help="out-of-core training in chunks (SGD)")
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help=".csv, .parquet or a directory of Parquet partitions")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--alpha", type=float, default=1e-4, help="SGD L2 penalty")
+    parser.add_argument("--checkpoint-every", type=int, default=50, help="chunks between checkpoints (0 = per epoch only)")
+    parser.add_argument("--resume", action="store_true", help="continue from models/checkpoint.pkl")
+    parser.add_argument("--activate", action="store_true", help="make the new model the one the server loads")
+    args = parser.parse_args()
+
+    if args.stream:
+        train_streaming(args)
+    else:
+        train_in_memory(args.data, activate=args.activate)
 
 
 if __name__ == "__main__":
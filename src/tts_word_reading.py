@@ -1,17 +1,11 @@
-import pyttsx3
 import time
 import Levenshtein
-import pandas as pd
-import joblib
 from pathlib import Path
-import json
 import os
 
-# ---------------- PATHS ----------------
-MODEL_PATH = Path("models/logistic_dyslexia.pkl")
-SCALER_PATH = Path("models/scaler.pkl")
-METADATA_PATH = Path("models/model_metadata.json")
+from risk_model import load_default
 
+# ---------------- PATHS ----------------
 DATA_PATH = Path("data")
 AUDIO_PATH = Path("audio")
 
@@ -21,19 +15,15 @@ AUDIO_PATH.mkdir(exist_ok=True)
 OUTPUT_CSV = DATA_PATH / "tts_word_reading_features.csv"
 
 # ---------------- LOAD MODEL ----------------
-model = joblib.load(MODEL_PATH)
-scaler = joblib.load(SCALER_PATH)
-
-with open(METADATA_PATH) as f:
-    metadata = json.load(f)
-
-feature_cols = metadata["features"]
+model = load_default()
 
 # ---------------- WORD LIST ----------------
 words = ["apple", "banana", "orange", "grape", "pineapple"]
 
 # ---------------- TTS FUNCTION ----------------
 def speak_and_save(word):
+    import pyttsx3  # first use only; the engine import is slow
+
     engine = pyttsx3.init()
     engine.setProperty("rate", 150)
 
@@ -45,6 +35,12 @@ def speak_and_save(word):
     time.sleep(0.4)  # ensure file is flushed
     os.system(f'start "" "{audio_file}"')  # Windows playback
 
+# ---------------- SAVE FUNCTION ----------------
+def save_results(rows):
+    import pandas as pd  # only needed once the test is over
+
+    pd.DataFrame(rows).to_csv(OUTPUT_CSV, index=False)
+
 # ---------------- TEST START ----------------
 print("\n--- Timed Word Reading Test ---")
 print("Type the word you hear. Press Enter when done.\n")
@@ -78,11 +74,7 @@ for word in words:
     }
 
     # ---------------- PREDICTION ----------------
-    X = pd.DataFrame([features])[feature_cols]
-    X_scaled = scaler.transform(X)
-
-    pred_class = model.predict(X_scaled)[0]
-    pred_prob = model.predict_proba(X_scaled)[0][1]
+    pred_class, pred_prob = model.score(features)
 
     label = "High Risk" if pred_class == 1 else "Low Risk"
     print(f"\nPrediction: {label} (Risk Probability: {pred_prob:.2f})")
@@ -95,7 +87,6 @@ for word in words:
     data.append(features)
 
 # ---------------- SAVE RESULTS ----------------
-df = pd.DataFrame(data)
-df.to_csv(OUTPUT_CSV, index=False)
+save_results(data)
 
 print("Test complete!")
@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_client import LLMClient, CircuitOpenError
+
+# Behaviour of the fake server, switched by the checks below
+MODE = {"name": "ok"}
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for Ollama's /api/generate."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length))
+
+        if MODE["name"] == "error":
+            self.send_response(500)
+            self.end_headers()
+            return
+        if MODE["name"] == "slow":
+            time.sleep(1.0)
+
+        if "separated by commas" in body["prompt"]:
+            answer = "bud, dab, bib, 4. den, Bed."
+        else:
+            answer = "The word is bed."
+
+        payload = json.dumps({"response": answer}).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except BrokenPipeError:
+            pass  # client already timed out
+
+    def log_message(self, *args):
+        pass
+
+
+def run_verify():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOllamaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/generate"
+    print(f"Fake Ollama listening on {url}")
+
+    client = LLMClient(url=url, timeout=0.5, retries=1, backoff=0.01, failure_threshold=2, reset_timeout=0.5)
+
+    # 1. Single and batch generation
+    assert client.generate("word?").strip() == "The word is bed."
+    words = client.generate_words("words?", k=5)
+    assert words == ["bud", "dab", "bib", "den", "bed"], words
+    print("  generate / generate_words OK:", words)
+
+    # 2. Failures open the breaker, then calls short-circuit without waiting
+    MODE["name"] = "slow"
+    for _ in range(2):
+        try:
+            client.generate("word?")
+        except Exception as e:
+            print("  expected failure:", type(e).__name__)
+    assert client.breaker.state == "open", client.breaker.state
+
+    start = time.perf_counter()
+    try:
+        client.generate("word?")
+        raise AssertionError("breaker should be open")
+    except CircuitOpenError:
+        pass
+    elapsed = time.perf_counter() - start
+    assert elapsed < 0.05, elapsed
+    print(f"  short-circuited in {elapsed * 1000:.2f} ms")
+
+    # 3. Half-open trial closes the breaker once the server recovers
+    MODE["name"] = "ok"
+    time.sleep(0.6)
+    client.generate("word?")
+    assert client.breaker.state == "closed"
+    print("  breaker recovered")
+
+    print("Stats:", json.dumps(client.stats(), indent=2))
+    server.shutdown()
+    print("\nSUCCESS: LLM client behaves as expected.")
+
+
+if __name__ == "__main__":
+    run_verify()